@@ -0,0 +1,287 @@
+"""
+End-to-end benchmark: drives run_app against fake VK and Telegram backends.
+
+    uv run python -m benchmarks.e2e --bindings 20 --posts 10 --photos 3 --videos 1
+
+Reports posts/sec, per-stage latency percentiles, peak RSS and file-descriptor usage.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from collections.abc import Callable
+from pathlib import Path
+from types import CoroutineType
+from typing import Any, ParamSpec, TypeVar
+
+import psutil
+import yaml
+
+ROOT = Path(__file__).resolve().parent.parent
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+class StageTimer:
+    """Collects wall-clock samples per pipeline stage."""
+
+    def __init__(self) -> None:
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.calls: dict[str, int] = defaultdict(int)
+        self._changed = asyncio.Condition()
+
+    def wrap(self, stage: str, fn: Callable[P, CoroutineType[Any, Any, R]]) -> Callable[P, CoroutineType[Any, Any, R]]:
+        async def timed(*args: P.args, **kwargs: P.kwargs) -> R:
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                self.samples[stage].append(time.perf_counter() - started)
+                self.calls[stage] += 1
+                async with self._changed:
+                    self._changed.notify_all()
+
+        return timed
+
+    async def wait_for_calls(self, stage: str, count: int) -> None:
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.calls[stage] >= count)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        result: dict[str, dict[str, float]] = {}
+        for stage, values in self.samples.items():
+            ordered = sorted(values)
+            result[stage] = {
+                "count": len(ordered),
+                "p50": percentile(ordered, 50),
+                "p90": percentile(ordered, 90),
+                "p99": percentile(ordered, 99),
+                "max": ordered[-1],
+                "mean": statistics.fmean(ordered),
+            }
+        return result
+
+
+class ResourceSampler:
+    """Samples RSS and open file descriptors of the current process in the background."""
+
+    def __init__(self, interval: float = 0.05) -> None:
+        self.interval = interval
+        self.process = psutil.Process()
+        self.peak_rss = 0
+        self.peak_fds = 0
+        self.start_fds = self._fds()
+
+    def _fds(self) -> int:
+        return self.process.num_fds() if hasattr(self.process, "num_fds") else self.process.num_handles()
+
+    def sample(self) -> None:
+        self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+        self.peak_fds = max(self.peak_fds, self._fds())
+
+    async def run(self) -> None:
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+
+def percentile(ordered: list[float], pct: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def write_config(workdir: Path, args: argparse.Namespace) -> None:
+    bindings = [
+        {
+            "vk": {"domain": f"bench{i}", "post_count": args.posts, "post_source": "wall"},
+            "telegram": {"channel_ids": [f"@bench_channel{i}_{c}" for c in range(args.channels)]},
+        }
+        for i in range(args.bindings)
+    ]
+    config = {
+        "app": {"wait_time_seconds": 3600, "state_file": str(workdir / "state.yaml"), "session_name": "bench"},
+        "telegram_sessions": [{"session_name": f"bench{i}"} for i in range(args.sessions)],
+        "bindings": bindings,
+        "downloader": {
+            "browser": "firefox",
+            "output_path": str(workdir / "videos"),
+            "retries": {"count": 1, "delay_seconds": 0},
+            "yt_dlp_opts": {"bench_video_bytes": args.video_bytes, "bench_bandwidth": args.download_bandwidth},
+        },
+    }
+    (workdir / "config.yaml").write_text(yaml.safe_dump(config, allow_unicode=True), encoding="utf-8")
+    (workdir / ".env").write_text("VK_SERVICE_TOKEN=bench\nTELEGRAM_API_ID=1\nTELEGRAM_API_HASH=bench\n")
+
+
+async def run_benchmark(args: argparse.Namespace) -> dict[str, Any]:
+    # src.config reads config.yaml and .env from the working directory at import time
+    import src.app as app
+    import src.managers.ytdlp_worker as ytdlp_worker
+    from src.config import TelegramSessionConfig
+    from src.managers.circuit_breaker import CircuitBreaker
+    from src.managers.download_space_manager import DownloadSpaceManager
+    from src.managers.fake_telegram_client import FakeTelegramClient
+    from src.managers.shard_manager import ShardManager
+    from src.managers.telegram_client_manager import TelegramClientManager
+    from src.managers.vk_client_manager import VKClientManager
+    from src.managers.ytdlp_manager import YtDlpManager
+    from src.printer import setup_logging, stop_logging
+
+    from .fakes import FakeVKAPI, StubVideoProcessor, stub_ytdlp_worker
+
+    setup_logging("DEBUG" if args.verbose else "CRITICAL")
+    timer = StageTimer()
+    sampler = ResourceSampler()
+    fake_vk = FakeVKAPI(args.posts, args.photos, args.videos, args.photo_bytes, latency=args.vk_latency)
+    fake_clients: list[FakeTelegramClient] = []
+
+    def client_factory(session: TelegramSessionConfig) -> FakeTelegramClient:
+        client = FakeTelegramClient(
+            session.session_name,
+            bandwidth=args.upload_bandwidth or None,
+            flood_every=args.flood_every,
+            flood_seconds=args.flood_seconds,
+        )
+        fake_clients.append(client)
+        return client
+
+    shutdown_event = asyncio.Event()
+    vk_manager = VKClientManager(shutdown_event, transport=fake_vk.transport())
+    tg_manager = TelegramClientManager(shutdown_event, client_factory=client_factory)
+    ytdlp_manager = YtDlpManager(shutdown_event)
+    video_processor = StubVideoProcessor(shutdown_event)
+    space_manager = DownloadSpaceManager(shutdown_event)
+    shard_manager = ShardManager(shutdown_event)
+    circuit_breaker = CircuitBreaker()
+
+    ytdlp_worker.download = stub_ytdlp_worker
+    vk_manager.get_vk_wall = timer.wrap("vk_fetch", vk_manager.get_vk_wall)
+    vk_manager.download_photo = timer.wrap("photo_download", vk_manager.download_photo)
+    ytdlp_manager.download_video = timer.wrap("video_download", ytdlp_manager.download_video)
+    tg_manager.send_media = timer.wrap("upload", tg_manager.send_media)
+    app.process_post = timer.wrap("post", app.process_post)
+
+    expected_posts = args.bindings * args.posts
+    sampler_task = asyncio.create_task(sampler.run())
+    await vk_manager.start()
+    await tg_manager.start()
+    await ytdlp_manager.start()
+    await space_manager.start()
+    await shard_manager.start()
+    started = time.perf_counter()
+    run_task = asyncio.create_task(
+        app.run_app(
+            shutdown_event,
+            vk_manager,
+            tg_manager,
+            ytdlp_manager,
+            video_processor,
+            space_manager,
+            shard_manager,
+            circuit_breaker,
+        )
+    )
+    try:
+        waiter = asyncio.create_task(timer.wait_for_calls("post", expected_posts))
+        await asyncio.wait({waiter, run_task}, return_when=asyncio.FIRST_COMPLETED)
+        waiter.cancel()
+        elapsed = time.perf_counter() - started
+    finally:
+        shutdown_event.set()
+        run_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await run_task
+        await shard_manager.stop()
+        await space_manager.stop()
+        await ytdlp_manager.stop()
+        await tg_manager.stop()
+        await vk_manager.stop()
+        sampler.sample()
+        sampler_task.cancel()
+        stop_logging()
+
+    posts = timer.calls["post"]
+    return {
+        "posts": posts,
+        "elapsed_seconds": elapsed,
+        "posts_per_second": posts / elapsed if elapsed else 0.0,
+        "vk_requests": fake_vk.requests,
+        "uploaded_bytes": sum(c.uploaded_bytes for c in fake_clients),
+        "peak_rss_mb": max(sampler.peak_rss, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024) / 2**20,
+        "fds_start": sampler.start_fds,
+        "fds_peak": sampler.peak_fds,
+        "stages": timer.summary(),
+    }
+
+
+def print_report(result: dict[str, Any]) -> None:
+    print(f"posts:            {result['posts']} in {result['elapsed_seconds']:.2f} s")
+    print(f"throughput:       {result['posts_per_second']:.2f} posts/s")
+    print(f"vk requests:      {result['vk_requests']}")
+    print(f"uploaded:         {result['uploaded_bytes'] / 2**20:.1f} MB")
+    print(f"peak RSS:         {result['peak_rss_mb']:.1f} MB")
+    print(f"fds start / peak: {result['fds_start']} / {result['fds_peak']}")
+    print()
+    print(f"{'stage':<16}{'count':>7}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for stage, stats in result["stages"].items():
+        print(
+            f"{stage:<16}{stats['count']:>7.0f}{stats['p50'] * 1000:>10.1f}{stats['p90'] * 1000:>10.1f}"
+            f"{stats['p99'] * 1000:>10.1f}{stats['max'] * 1000:>10.1f}"
+        )
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="postbridge end-to-end benchmark with fake backends")
+    parser.add_argument("--bindings", type=int, default=10)
+    parser.add_argument("--posts", type=int, default=5, help="new posts per binding")
+    parser.add_argument("--photos", type=int, default=2, help="photos per post")
+    parser.add_argument("--videos", type=int, default=0, help="videos per post")
+    parser.add_argument("--channels", type=int, default=1, help="channels per binding")
+    parser.add_argument("--sessions", type=int, default=1, help="Telegram sessions in the pool")
+    parser.add_argument("--photo-bytes", type=int, default=200_000)
+    parser.add_argument("--video-bytes", type=int, default=5 * 2**20)
+    parser.add_argument("--vk-latency", type=float, default=0.0, help="seconds per VK request")
+    parser.add_argument("--download-bandwidth", type=float, default=0.0, help="video bytes/s, 0 = unlimited")
+    parser.add_argument("--upload-bandwidth", type=float, default=0.0, help="bytes/s, 0 = unlimited")
+    parser.add_argument("--flood-every", type=int, default=0, help="FloodWait on every n-th upload")
+    parser.add_argument("--flood-seconds", type=int, default=1)
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="keep the application output")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    json_path = args.json.resolve() if args.json else None
+    sys.path.insert(0, str(ROOT))
+    with tempfile.TemporaryDirectory(prefix="postbridge-bench-") as tmp:
+        workdir = Path(tmp)
+        write_config(workdir, args)
+        os.chdir(workdir)
+        # tqdm progress bars write to stderr directly
+        with contextlib.redirect_stderr(sys.stderr if args.verbose else io.StringIO()):
+            result = asyncio.run(run_benchmark(args))
+        os.chdir(ROOT)
+
+    print_report(result)
+    if json_path:
+        from .fakes import dump_json
+
+        dump_json(result, json_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Synthetic backends for benchmarks: VK API and CDN, yt-dlp worker and video post-processing."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+import zlib
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+from src.dto import VideoMeta
+from src.managers.video_processor import VideoProcessor
+
+POST_TEXT = "Новый пост 🔥 [club1|Наш клуб] и [https://example.com/page|ссылка] https://vk.com/wall-1_1 👍🏻\n"
+
+
+class FakeVKAPI:
+    """Serves synthetic `wall.get` responses and photo bytes through an httpx.MockTransport."""
+
+    def __init__(
+        self,
+        posts_per_domain: int,
+        photos_per_post: int,
+        videos_per_post: int,
+        photo_bytes: int,
+        latency: float = 0.0,
+        text_repeat: int = 5,
+    ) -> None:
+        self.posts_per_domain = posts_per_domain
+        self.photos_per_post = photos_per_post
+        self.videos_per_post = videos_per_post
+        self.photo_payload = b"\xff" * photo_bytes
+        self.latency = latency
+        self.text = POST_TEXT * text_repeat
+        self.requests = 0
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if request.url.path == "/method/wall.get":
+            domain = request.url.params["domain"]
+            count = int(request.url.params.get("count", "10"))
+            return httpx.Response(200, json={"response": {"items": self.wall(domain, count)}})
+        if request.url.path.endswith(".jpg"):
+            return httpx.Response(200, content=self.photo_payload, headers={"Content-Type": "image/jpeg"})
+        return httpx.Response(404, json={"error": {"error_msg": "not found"}})
+
+    def wall(self, domain: str, count: int) -> list[dict[str, Any]]:
+        owner_id = -(zlib.crc32(domain.encode()) % 10**8 + 1)
+        last = self.posts_per_domain
+        return [self.post(domain, owner_id, post_id) for post_id in range(last, max(0, last - count), -1)]
+
+    def post(self, domain: str, owner_id: int, post_id: int) -> dict[str, Any]:
+        attachments: list[dict[str, Any]] = []
+        for i in range(self.photos_per_post):
+            url = f"https://sun9-1.userapi.com/{domain}/{post_id}_{i}.jpg"
+            sizes = [{"type": "x", "url": url, "width": 1280, "height": 720}]
+            attachments.append(
+                {"type": "photo", "photo": {"id": post_id * 100 + i, "owner_id": owner_id, "sizes": sizes}}
+            )
+        for i in range(self.videos_per_post):
+            video = {"id": post_id * 100 + i, "owner_id": owner_id, "title": "video", "duration": 60}
+            attachments.append({"type": "video", "video": video})
+        return {
+            "id": post_id,
+            "owner_id": owner_id,
+            "from_id": owner_id,
+            "date": int(time.time()),
+            "text": self.text,
+            "attachments": attachments,
+        }
+
+
+def stub_ytdlp_worker(url: str, opts: dict[str, Any], out: Connection) -> None:
+    """Stands in for ytdlp_worker.download: writes `bench_video_bytes` at `bench_bandwidth` bytes/s."""
+    size = int(opts.get("bench_video_bytes", 1024 * 1024))
+    bandwidth = float(opts.get("bench_bandwidth", 0))
+    video_id = url.rsplit("video", 1)[-1].split("?", 1)[0]
+    path = Path(str(opts["outtmpl"]).replace("%(id)s", video_id).replace("%(ext)s", "mp4"))
+    chunk = b"\0" * (1024 * 1024)
+    with open(path, "wb") as f:
+        written = 0
+        while written < size:
+            part = chunk[: min(len(chunk), size - written)]
+            f.write(part)
+            written += len(part)
+            if bandwidth:
+                time.sleep(len(part) / bandwidth)
+                out.send(("progress", written, size))
+    out.send(("done", str(path)))
+
+
+class StubVideoProcessor(VideoProcessor):
+    """Skips ffmpeg: synthetic videos are not decodable, so metadata is made up."""
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def process(self, path: Path) -> VideoMeta | None:
+        return VideoMeta(path=path, width=1280, height=720, duration=60)
+
+
+def dump_json(data: dict[str, Any], path: Path) -> None:
+    path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
@@ -0,0 +1,155 @@
+"""
+Startup benchmark: how long it takes to import everything main() needs before the first VK request.
+
+    uv run python -m benchmarks.startup --budget-ms 750
+
+Runs the imports in fresh interpreters, reports the best wall-clock time and the slowest modules
+from `python -X importtime`, and exits with status 1 when the time exceeds the budget or when a
+heavy dependency (moviepy, pyrogram, yt-dlp, psutil, emoji, ...) is imported eagerly.
+"""
+
+from __future__ import annotations
+
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def startup_modules(source: Path = ROOT / "main.py") -> tuple[str, ...]:
+    """
+    The project modules main.py imports at module level and unconditionally in main(), read from its source
+    so the list follows main.py; imports under a branch (--record, --replay) are left out.
+    """
+    tree = ast.parse(source.read_text(encoding="utf-8"))
+    statements = list(tree.body)
+    for node in tree.body:
+        if isinstance(node, ast.AsyncFunctionDef | ast.FunctionDef) and node.name == "main":
+            statements += node.body
+    modules: list[str] = ["main"]
+    for node in statements:
+        names = [node.module] if isinstance(node, ast.ImportFrom) and node.module else []
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        modules += [name for name in names if name.split(".")[0] == "src" and name not in modules]
+    return tuple(modules)
+
+
+# What main() imports before starting the managers
+STARTUP_MODULES = startup_modules()
+# Imported on first use only; none of them may show up at startup
+HEAVY_MODULES = ("moviepy", "numpy", "imageio", "pyrogram", "yt_dlp", "psutil", "emoji", "tqdm")
+
+MARKER = "--- postbridge startup ---"
+
+
+def probe_code(modules: tuple[str, ...]) -> str:
+    """Python source that imports `modules` and prints the elapsed time and the heavy modules loaded."""
+    imports = "; ".join(f"import {name}" for name in modules)
+    return (
+        "import json, sys, time\n"
+        f"sys.stderr.write({MARKER!r} + '\\n'); sys.stderr.flush()\n"
+        "started = time.perf_counter()\n"
+        f"{imports}\n"
+        "elapsed = time.perf_counter() - started\n"
+        f"heavy = sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)\n"
+        "print(json.dumps({'seconds': elapsed, 'heavy': heavy}))\n"
+    )
+
+
+def run_probe(modules: tuple[str, ...], importtime: bool = False) -> tuple[dict[str, Any], str]:
+    """Runs the imports in a fresh interpreter; returns its report and stderr."""
+    env = dict(os.environ)
+    # src.config validates credentials at import time; dummy values are enough to load it
+    env.setdefault("VK_SERVICE_TOKEN", "bench")
+    env.setdefault("TELEGRAM_API_ID", "1")
+    env.setdefault("TELEGRAM_API_HASH", "bench")
+    cmd = [sys.executable, *(["-X", "importtime"] if importtime else []), "-c", probe_code(modules)]
+    proc = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int]]:
+    """(module, self µs, cumulative µs) for every import after the marker."""
+    _, _, tail = stderr.partition(MARKER)
+    rows: list[tuple[str, int, int]] = []
+    for line in tail.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line.removeprefix("import time:").split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        rows.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+    return rows
+
+
+def measure(repeat: int, top: int) -> dict[str, Any]:
+    timings: list[float] = []
+    heavy: list[str] = []
+    for _ in range(repeat):
+        report, _ = run_probe(STARTUP_MODULES)
+        timings.append(report["seconds"])
+        heavy = report["heavy"]
+
+    _, stderr = run_probe(STARTUP_MODULES, importtime=True)
+    rows = sorted(parse_importtime(stderr), key=lambda row: row[1], reverse=True)
+    return {
+        "best_seconds": min(timings),
+        "median_seconds": sorted(timings)[len(timings) // 2],
+        "heavy_modules": heavy,
+        "modules_imported": len(rows),
+        "slowest": [
+            {"module": name, "self_ms": own / 1000, "cumulative_ms": cum / 1000} for name, own, cum in rows[:top]
+        ],
+    }
+
+
+def print_report(result: dict[str, Any], budget_ms: float) -> None:
+    best_ms, median_ms = result["best_seconds"] * 1000, result["median_seconds"] * 1000
+    print(f"startup imports:  best {best_ms:.0f} ms, median {median_ms:.0f} ms")
+    print(f"budget:           {budget_ms:.0f} ms")
+    print(f"modules imported: {result['modules_imported']}")
+    print(f"heavy modules:    {', '.join(result['heavy_modules']) or 'none'}")
+    print()
+    print(f"{'module':<48}{'self ms':>10}{'cum ms':>10}")
+    for row in result["slowest"]:
+        print(f"{row['module']:<48}{row['self_ms']:>10.1f}{row['cumulative_ms']:>10.1f}")
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="postbridge startup import-time benchmark")
+    parser.add_argument("--budget-ms", type=float, default=750, help="fail when the best import time exceeds this")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters to time")
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to list")
+    parser.add_argument("--json", type=Path, default=None, help="also write the results as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    result = measure(max(1, args.repeat), args.top)
+    print_report(result, args.budget_ms)
+    if args.json:
+        from .fakes import dump_json
+
+        dump_json(result, args.json)
+
+    failures: list[str] = []
+    if result["heavy_modules"]:
+        failures.append(f"heavy modules imported at startup: {', '.join(result['heavy_modules'])}")
+    if result["best_seconds"] * 1000 > args.budget_ms:
+        failures.append(f"startup imports took {result['best_seconds'] * 1000:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,15 +3,31 @@ import asyncio
 import multiprocessing
 import signal
 import sys
+from functools import partial
+from pathlib import Path
+from typing import Any
 
-from src.app import run_app
-from src.managers.telegram_client_manager import TelegramClientManager
-from src.managers.vk_client_manager import VKClientManager
-from src.managers.ytdlp_manager import YtDlpManager
-from src.printer import log
+from src.printer import log, setup_logging, stop_logging
 
 
-async def main(log_level: str) -> None:
+async def main(args: argparse.Namespace) -> None:
+    # Imported here rather than at module level: spawned worker processes re-import this module,
+    # and loading the config and the managers there would only slow them down.
+    from src.app import run_app
+    from src.cancellation import run_with_grace
+    from src.config import settings
+    from src.config_reloader import ConfigReloader
+    from src.managers.binding_manager import BindingManager
+    from src.managers.circuit_breaker import CircuitBreaker
+    from src.managers.download_space_manager import DownloadSpaceManager
+    from src.managers.shard_manager import ShardManager
+    from src.managers.telegram_client_manager import TelegramClientManager
+    from src.managers.video_processor import VideoProcessor
+    from src.managers.vk_client_manager import VKClientManager
+    from src.managers.ytdlp_manager import YtDlpManager
+    from src.metrics import MetricsServer
+    from src.profiler import profiler
+
     shutdown_event = asyncio.Event()
 
     # On Linux/macOS, you can use signals
@@ -19,25 +35,104 @@ async def main(log_level: str) -> None:
         loop = asyncio.get_running_loop()
         loop.add_signal_handler(signal.SIGINT, shutdown_event.set)
         loop.add_signal_handler(signal.SIGTERM, shutdown_event.set)
+        loop.add_signal_handler(signal.SIGUSR2, profiler.toggle)
+
+    vk_options: dict[str, Any] = {}
+    tg_options: dict[str, Any] = {}
+    ytdlp_options: dict[str, Any] = {}
+    if args.record:
+        from src.traffic_archive import RecordingTransport, TrafficArchive
+
+        archive = TrafficArchive(args.record, args.record_max_bytes)
+        archive.save_state(settings.app.state_file)
+        if settings.binding_store.enabled:
+            archive.save_binding_store(settings.binding_store.path)
+        vk_options["transport"] = RecordingTransport(archive)
+        ytdlp_options["recorder"] = archive.record_video
+        log(f"⏺️ Записываю трафик VK в {args.record}")
+    elif args.replay:
+        from src.managers.fake_telegram_client import FakeTelegramClient
+        from src.traffic_archive import ReplayTransport, TrafficArchive, replay_video
+
+        archive = TrafficArchive(args.replay)
+        # Replays never touch the real position, and each one starts where the capture did
+        settings.app.state_file = args.replay / "replay-state.yaml"
+        settings.sharding.enabled = False
+        archive.restore_state(settings.app.state_file)
+        if settings.binding_store.enabled:
+            settings.binding_store.path = args.replay / "replay-bindings.db"
+            archive.restore_binding_store(settings.binding_store.path)
+        settings.circuit_breaker.state_file = args.replay / "replay-circuit_breakers.json"
+        settings.circuit_breaker.state_file.unlink(missing_ok=True)
+        # Peers resolved by the fake client must not end up in the real cache
+        settings.peer_cache.state_file = args.replay / "replay-peers.json"
+        settings.peer_cache.state_file.unlink(missing_ok=True)
+        vk_options["transport"] = ReplayTransport(archive, args.replay_speed)
+        tg_options["client_factory"] = lambda session: FakeTelegramClient(session.session_name)
+        ytdlp_options["worker"] = partial(replay_video, str(args.replay), args.replay_speed)
+        log(f"⏯️ Воспроизвожу трафик из {args.replay} (скорость {args.replay_speed}), Telegram не используется")
 
     # Initialization of managers
-    vk_manager = VKClientManager(shutdown_event)
-    tg_manager = TelegramClientManager(shutdown_event)
-    ytdlp_manager = YtDlpManager(shutdown_event)
+    vk_manager = VKClientManager(shutdown_event, **vk_options)
+    tg_manager = TelegramClientManager(shutdown_event, **tg_options)
+    ytdlp_manager = YtDlpManager(shutdown_event, **ytdlp_options)
+    video_processor = VideoProcessor(shutdown_event)
+    space_manager = DownloadSpaceManager(shutdown_event)
+    binding_manager = BindingManager()
+    shard_manager = ShardManager(shutdown_event, bindings=binding_manager)
+    circuit_breaker = CircuitBreaker()
+    config_reloader = ConfigReloader(shutdown_event)
+    metrics_server = MetricsServer(settings.metrics.host, settings.metrics.port) if settings.metrics.enabled else None
+
+    if args.profile:
+        profiler.directory = args.profile
+        profiler.enable()
 
     try:
+        if metrics_server:
+            await metrics_server.start()
         await vk_manager.start()
         await tg_manager.start()
         await ytdlp_manager.start()
-        await run_app(shutdown_event, vk_manager, tg_manager, ytdlp_manager, log_level)
+        await video_processor.start()
+        await space_manager.start()
+        await binding_manager.start()
+        await shard_manager.start()
+        await circuit_breaker.start()
+        await config_reloader.start()
+        await run_with_grace(
+            run_app(
+                shutdown_event,
+                vk_manager,
+                tg_manager,
+                ytdlp_manager,
+                video_processor,
+                space_manager,
+                shard_manager,
+                circuit_breaker,
+                config_reloader.changed,
+                binding_manager,
+            ),
+            shutdown_event,
+            settings.app.shutdown_grace_seconds,
+        )
     except (KeyboardInterrupt, asyncio.CancelledError):
         log("\n🧹 Завершение по Ctrl+C или другому прерыванию.")
         shutdown_event.set()
     finally:
         log("🛑 Останавливаю сервисы...")
+        await config_reloader.stop()
+        await circuit_breaker.stop()
+        await shard_manager.stop()
+        await binding_manager.stop()
+        await space_manager.stop()
+        await video_processor.stop()
         await ytdlp_manager.stop()
         await tg_manager.stop()
         await vk_manager.stop()
+        if metrics_server:
+            await metrics_server.stop()
+        await profiler.disable()
         log("✅ Завершено.")
 
 
@@ -48,9 +143,46 @@ if __name__ == "__main__":
         "--log-level",
         type=str,
         choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
-        default="WARNING",
+        default="INFO",
         help="Set the logging level",
     )
+    parser.add_argument(
+        "--log-format",
+        type=str,
+        choices=["human", "json"],
+        default="human",
+        help="Console output with emoji, or one JSON object per line with binding/post/channel fields",
+    )
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        metavar="DIR",
+        help="Write per-cycle profiling reports to DIR (SIGUSR2 toggles profiling at runtime, into ./profiles)",
+    )
+    traffic = parser.add_mutually_exclusive_group()
+    traffic.add_argument("--record", type=Path, metavar="DIR", help="Capture VK responses and videos to DIR")
+    traffic.add_argument(
+        "--replay",
+        type=Path,
+        metavar="DIR",
+        help="Serve VK traffic captured in DIR instead of the network; uploads go to a fake Telegram client",
+    )
+    parser.add_argument(
+        "--record-max-bytes",
+        type=int,
+        default=0,
+        help="Store at most this many bytes of each photo or video (replayed padded to full size); 0 = all",
+    )
+    parser.add_argument(
+        "--replay-speed",
+        type=float,
+        default=1.0,
+        help="Replay the recorded timeline this many times faster; 0 = no delays, responses in recorded order",
+    )
     args = parser.parse_args()
 
-    asyncio.run(main(log_level=args.log_level))
+    setup_logging(args.log_level, args.log_format)
+    try:
+        asyncio.run(main(args))
+    finally:
+        stop_logging()
@@ -1,20 +1,29 @@
 import asyncio
 import logging
-import os
+import time
+from collections.abc import Awaitable, Callable
 from datetime import datetime
 from pathlib import Path
 from typing import TypedDict, cast
 
-import httpx
 from pydantic import HttpUrl
 
+from .cancellation import wait_event_or_shutdown
 from .config import settings
-from .dto import Post
+from .dto import Post, VideoMeta
+from .growing_file import GrowingFile
+from .lane_scheduler import LaneScheduler, PostJob
+from .managers.binding_manager import BindingManager
+from .managers.circuit_breaker import CircuitBreaker
+from .managers.download_space_manager import DownloadSpaceManager
+from .managers.shard_manager import ShardManager
 from .managers.telegram_client_manager import TelegramClientManager
+from .managers.video_processor import VideoProcessor
 from .managers.vk_client_manager import VKClientManager
 from .managers.ytdlp_manager import YtDlpManager
-from .printer import log
-from .state_manager import get_last_post_id, set_last_post_id
+from .metrics import CYCLE_DURATION, POSTS_BEHIND, QUEUE_DEPTH
+from .printer import log, log_context
+from .profiler import profiler
 
 
 class VideoItem(TypedDict):
@@ -35,59 +44,170 @@ async def run_app(
     vk_manager: VKClientManager,
     tg_manager: TelegramClientManager,
     ytdlp_manager: YtDlpManager,
-    log_level: str,
+    video_processor: VideoProcessor,
+    space_manager: DownloadSpaceManager,
+    shard_manager: ShardManager,
+    circuit_breaker: CircuitBreaker,
+    config_changed: asyncio.Event | None = None,
+    bindings: BindingManager | None = None,
 ) -> None:
-    log_level_int = getattr(logging, log_level.upper(), logging.WARNING)
-    logging.basicConfig(level=log_level_int, format="%(asctime)s - %(levelname)s - %(message)s")
-
+    """`bindings` lists the bindings to poll: config.yaml's by default, or the binding store's once started."""
     log("🚀 Запускаю бота vk-to-tg...")
+    bindings = bindings or BindingManager()
+
+    async def publish(job: PostJob, wait_turn: Callable[[str], Awaitable[None]]) -> None:
+        if await bindings.get(job.domain) is None:
+            log(f"➖ Binding {job.domain} удалён из конфигурации, останавливаюсь.", indent=2)
+            scheduler.drop(job.domain)
+            return
+        with log_context(post=job.post.id):
+            await process_post(
+                job.post,
+                job.domain,
+                job.channel_ids,
+                shutdown_event,
+                vk_manager,
+                ytdlp_manager,
+                tg_manager,
+                video_processor,
+                space_manager,
+                wait_turn,
+            )
+
+    scheduler = LaneScheduler(shutdown_event, shard_manager, publish)
+    await scheduler.start()
+    # Bindings already polled in the current cycle; a reload that adds bindings wakes the loop
+    # early and only the new ones are polled before the pause continues.
+    polled: set[str] = set()
+    next_cycle_at = 0.0
     try:
         while not shutdown_event.is_set():
-            log(f"🔍 {datetime.now().strftime('%H:%M:%S %Y-%m-%d')} | Начинаю новый цикл проверки...", padding_top=1)
-            for binding in settings.bindings:
+            full_cycle = time.monotonic() >= next_cycle_at
+            if full_cycle:
+                log(
+                    f"🔍 {datetime.now().strftime('%H:%M:%S %Y-%m-%d')} | Начинаю новый цикл проверки...",
+                    padding_top=1,
+                )
+                polled.clear()
+                profiler.cycle_started()
+            cycle_started = time.perf_counter()
+            async for binding in bindings.iterate():
+                domain = binding.vk.domain
+                if domain in polled:
+                    continue
+                if shutdown_event.is_set():
+                    break
+                polled.add(domain)
                 vk_config = binding.vk
                 telegram_config = binding.telegram
-                domain = vk_config.domain
                 post_count = vk_config.post_count
                 post_source = vk_config.post_source
                 channel_ids = telegram_config.channel_ids
 
-                last_known_id = await get_last_post_id(domain)
-                log(f"📄 Проверяю группу {domain}...", indent=1, padding_top=1)
-
-                try:
-                    wall_posts = await vk_manager.get_vk_wall(domain, post_count, post_source)
-                except httpx.ConnectTimeout:
-                    log(f"❌ Ошибка подключения к VK API при проверке {domain}. Пропускаю итерацию.", indent=2)
-                    continue
-
-                new_posts = [p for p in wall_posts if p.id > last_known_id]
+                with log_context(binding=domain):
+                    if not await shard_manager.acquire(binding) or not circuit_breaker.allow(domain):
+                        continue
+                    last_known_id = await shard_manager.last_post_id(domain)
+                    log(f"📄 Проверяю группу {domain}...", indent=1, padding_top=1)
 
-                if new_posts:
-                    log(f"✅ Найдено {len(new_posts)} новых постов в {domain}.", indent=2)
                     try:
-                        for post in sorted(new_posts, key=lambda p: p.id):
-                            await process_post(
-                                post, domain, channel_ids, shutdown_event, vk_manager, ytdlp_manager, tg_manager
-                            )
-                            await set_last_post_id(domain, post.id)
-                            last_known_id = post.id
+                        wall_posts = await vk_manager.get_vk_wall(domain, post_count, post_source)
+                    except asyncio.CancelledError:
+                        raise
                     except Exception as e:
+                        error_class = await circuit_breaker.record_failure(domain, e)
                         log(
-                            f"❌ Ошибка обработки для {binding.vk.domain}: {e}. Пропускаю этот binding.",
-                            indent=1,
+                            f"❌ Ошибка VK API при проверке {domain} ({error_class}): {e}. Пропускаю итерацию.",
+                            indent=2,
+                            level=logging.ERROR,
                         )
                         continue
+                    await circuit_breaker.record_success(domain)
+
+                    new_posts = [p for p in wall_posts if p.id > last_known_id]
+                    POSTS_BEHIND.labels(domain=domain).set(len(new_posts))
+                    held = scheduler.held(domain)
+                    new_posts = [p for p in new_posts if p.id not in held]
+
+                    if new_posts:
+                        log(f"✅ Найдено {len(new_posts)} новых постов в {domain}.", indent=2)
+                        for post in sorted(new_posts, key=lambda p: p.id):
+                            # Later posts wait too, so that the binding's position never skips one
+                            if not scheduler.submit(domain, post, channel_ids):
+                                break
 
-            log(f"🏁 Цикл завершен. Пауза {settings.app.wait_time_seconds} секунд...", padding_top=1)
+            if full_cycle:
+                CYCLE_DURATION.observe(time.perf_counter() - cycle_started)
+                log(f"🏁 Цикл завершен. Пауза {settings.app.wait_time_seconds} секунд...", padding_top=1)
+                next_cycle_at = time.monotonic() + settings.app.wait_time_seconds
+                await profiler.cycle_finished()
 
             try:
-                await asyncio.sleep(settings.app.wait_time_seconds)
+                await _wait_for_next_cycle(next_cycle_at, config_changed, shutdown_event)
             except asyncio.CancelledError:
                 break
 
     except asyncio.CancelledError:
         log("🛑 Получен сигнал на завершение — выходим из run_app.", padding_top=1)
+    finally:
+        await scheduler.stop()
+
+
+async def _wait_for_next_cycle(
+    deadline: float, config_changed: asyncio.Event | None, shutdown_event: asyncio.Event
+) -> None:
+    """Sleeps until the next cycle or until a config reload is applied; raises CancelledError on shutdown."""
+    changed = config_changed or asyncio.Event()
+    await wait_event_or_shutdown(changed, deadline - time.monotonic(), shutdown_event)
+    changed.clear()
+
+
+class StreamedUpload:
+    """Sends the only video of a post to its first channel while the video is still downloading."""
+
+    def __init__(
+        self,
+        tg_manager: TelegramClientManager,
+        video_processor: VideoProcessor,
+        channel_id: str,
+        caption: str,
+        wait_turn: Callable[[str], Awaitable[None]] | None,
+    ) -> None:
+        self.tg_manager = tg_manager
+        self.video_processor = video_processor
+        self.channel_id = channel_id
+        self.caption = caption
+        self.wait_turn = wait_turn
+        self.meta: asyncio.Future[VideoMeta | None] = asyncio.get_running_loop().create_future()
+        self.task: asyncio.Task[bool] | None = None
+
+    def start(self, growing: GrowingFile) -> None:
+        """on_stream callback of YtDlpManager.download_video."""
+        with log_context(channel=self.channel_id):
+            self.task = asyncio.create_task(self._send(growing))
+
+    def processed(self, meta: VideoMeta | None) -> None:
+        if not self.meta.done():
+            self.meta.set_result(meta)
+
+    async def sent(self) -> bool:
+        """Whether the video reached the channel; if not, it is sent there the usual way."""
+        return await self.task if self.task else False
+
+    def cancel(self) -> None:
+        if self.task and not self.task.done():
+            self.task.cancel()
+
+    async def _send(self, growing: GrowingFile) -> bool:
+        if await self.video_processor.must_remux(growing):
+            return False
+        return await self.tg_manager.send_streamed_video(
+            self.channel_id, growing, self.caption, self.meta, before_send=self._before_send
+        )
+
+    async def _before_send(self) -> None:
+        if self.wait_turn:
+            await self.wait_turn(self.channel_id)
 
 
 async def process_post(
@@ -98,7 +218,11 @@ async def process_post(
     vk_manager: VKClientManager,
     ytdlp_manager: YtDlpManager,
     tg_manager: TelegramClientManager,
+    video_processor: VideoProcessor,
+    space_manager: DownloadSpaceManager,
+    wait_turn: Callable[[str], Awaitable[None]] | None = None,
 ) -> None:
+    """`wait_turn(channel_id)` is awaited before sending to each channel; it keeps the channel's publish order."""
     log(f"📄 Обрабатываю пост ID: {post.id} из {domain}...", indent=2, padding_top=1)
     post_text: str = post.text or ""
 
@@ -120,46 +244,81 @@ async def process_post(
         log(f"🖼️ Найдено {photo_count} фото и {video_count} видео в посте.", indent=3)
 
         downloaded_files: list[Path] = []
-        for item in media_items:
-            try:
-                if shutdown_event.is_set():
-                    raise asyncio.CancelledError()
-
-                downloaded_file_path = None
-                if item["type"] == "video":
-                    video_item = cast(VideoItem, item)
-                    log(f"📹 Скачиваю видео: {video_item['url']}", indent=4)
-                    downloaded_file_path = await ytdlp_manager.download_video(video_item["url"])
-                elif item["type"] == "photo":
-                    photo_item = cast(PhotoItem, item)
-                    log(f"📸 Скачиваю фото: {photo_item['url']}", indent=4)
-                    downloaded_file_path = await vk_manager.download_photo(photo_item["url"])
-
-                if downloaded_file_path:
-                    downloaded_files.append(downloaded_file_path)
-                else:
-                    raise RuntimeError(f"Не удалось скачать медиафайл: {item['url']}")
+        video_meta: dict[Path, VideoMeta] = {}
+        # Lane workers run posts concurrently, so each post adds its own items to the gauges and takes them off
+        downloads_queue = QUEUE_DEPTH.labels(queue="downloads")
+        uploads_queue = QUEUE_DEPTH.labels(queue="uploads")
+        downloads_left = len(media_items)
+        uploads_left = 0
+        downloads_queue.inc(downloads_left)
+        owner = (domain, post.id)
+        streamed: StreamedUpload | None = None
+        if settings.downloader.stream_upload.enabled and len(media_items) == 1 and media_items[0]["type"] == "video":
+            streamed = StreamedUpload(tg_manager, video_processor, channel_ids[0], post_text, wait_turn)
+        try:
+            for item in media_items:
+                try:
+                    if shutdown_event.is_set():
+                        raise asyncio.CancelledError()
+                    await space_manager.wait_for_room(owner)
 
-            except asyncio.CancelledError:
-                log("⏹️ Загрузка прервана пользователем.", indent=4)
-                raise
+                    downloaded_file_path = None
+                    if item["type"] == "video":
+                        video_item = cast(VideoItem, item)
+                        log(f"📹 Скачиваю видео: {video_item['url']}", indent=4, level=logging.DEBUG)
+                        downloaded_file_path = await ytdlp_manager.download_video(
+                            video_item["url"], on_stream=streamed.start if streamed else None
+                        )
+                        meta = await video_processor.process(downloaded_file_path) if downloaded_file_path else None
+                        if streamed:
+                            streamed.processed(meta)
+                        if meta:
+                            downloaded_file_path = meta.path
+                            video_meta[meta.path] = meta
+                            if meta.thumb:
+                                await space_manager.track(owner, meta.thumb)
+                    elif item["type"] == "photo":
+                        photo_item = cast(PhotoItem, item)
+                        log(f"📸 Скачиваю фото: {photo_item['url']}", indent=4, level=logging.DEBUG)
+                        downloaded_file_path = await vk_manager.download_photo(photo_item["url"])
+
+                    downloads_queue.dec()
+                    downloads_left -= 1
+                    if downloaded_file_path:
+                        await space_manager.track(owner, downloaded_file_path)
+                        downloaded_files.append(downloaded_file_path)
+                    else:
+                        raise RuntimeError(f"Не удалось скачать медиафайл: {item['url']}")
 
-        if downloaded_files:
-            for channel_id in channel_ids:
-                try:
-                    await tg_manager.send_media(channel_id, downloaded_files, post_text)
                 except asyncio.CancelledError:
-                    log("⏹️ Отправка прервана пользователем.", indent=4, padding_top=1)
+                    log("⏹️ Загрузка прервана пользователем.", indent=4)
                     raise
 
-            log("🗑️ Удаляю временные файлы...", indent=4, padding_top=1)
-            for file_path in downloaded_files:
-                try:
-                    await asyncio.to_thread(os.remove, file_path)
-                    log(f"✅ Файл {file_path} удален.", indent=4)
-                except FileNotFoundError:
-                    log(f"⚠️ Файл {file_path} уже удалён или не найден.", indent=4)
-                except Exception as e:
-                    log(f"❌ Ошибка удаления файла {file_path}: {e}", indent=4)
+            if downloaded_files:
+                uploads_left = len(channel_ids)
+                uploads_queue.inc(uploads_left)
+                for channel_id in channel_ids:
+                    try:
+                        if streamed and channel_id == streamed.channel_id and await streamed.sent():
+                            uploads_queue.dec()
+                            uploads_left -= 1
+                            continue
+                        if wait_turn:
+                            await wait_turn(channel_id)
+                        with log_context(channel=channel_id):
+                            await tg_manager.send_media(channel_id, downloaded_files, post_text, video_meta=video_meta)
+                        uploads_queue.dec()
+                        uploads_left -= 1
+                    except asyncio.CancelledError:
+                        log("⏹️ Отправка прервана пользователем.", indent=4, padding_top=1)
+                        raise
+        finally:
+            # Items of a failed or interrupted post are not waiting anymore
+            downloads_queue.dec(downloads_left)
+            uploads_queue.dec(uploads_left)
+            if streamed:
+                streamed.cancel()
+            # Sent or not, the files of this post are not needed anymore; a retry downloads them again
+            await space_manager.release(owner)
     else:
         log("🤷‍♂️ Медиа в посте не найдено, пропускаю.", indent=3)
@@ -0,0 +1,197 @@
+"""
+SQLite store of bindings for setups with thousands of them, and the CLI that manages it:
+
+    python -m src.binding_store add somechannel --channel @someid --channel @secondid --post-count 10
+    python -m src.binding_store remove somechannel
+    python -m src.binding_store list [--channel @someid]
+    python -m src.binding_store import
+"""
+
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import sys
+import threading
+import time
+from collections.abc import Generator
+from contextlib import contextmanager
+from pathlib import Path
+
+from pydantic import ValidationError
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bindings (
+    domain TEXT PRIMARY KEY,
+    config TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS binding_channels (
+    channel_id TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    PRIMARY KEY (channel_id, domain)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS binding_channels_domain ON binding_channels (domain);
+CREATE TABLE IF NOT EXISTS post_state (
+    domain TEXT PRIMARY KEY,
+    last_post_id INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+class BindingStore:
+    """
+    Bindings keyed by VK domain, stored as the JSON of their config and validated by the reader,
+    with an index of the channels they post to, and the last post ID of each binding.
+    Every method is a short transaction; call them from a worker thread.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Generator[sqlite3.Connection]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def put(self, domain: str, config: str, channel_ids: list[str], now: float) -> bool:
+        """Adds or replaces a binding; True if it is new."""
+        with self._transaction() as conn:
+            exists = conn.execute("SELECT 1 FROM bindings WHERE domain = ?", (domain,)).fetchone() is not None
+            conn.execute(
+                "INSERT INTO bindings (domain, config, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(domain) DO UPDATE SET config = excluded.config, updated_at = excluded.updated_at",
+                (domain, config, now),
+            )
+            conn.execute("DELETE FROM binding_channels WHERE domain = ?", (domain,))
+            conn.executemany(
+                "INSERT OR IGNORE INTO binding_channels (channel_id, domain) VALUES (?, ?)",
+                [(channel_id, domain) for channel_id in channel_ids],
+            )
+            return not exists
+
+    def remove(self, domain: str) -> bool:
+        """Deletes a binding; its last post ID is kept, so adding it back continues from there."""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM binding_channels WHERE domain = ?", (domain,))
+            return conn.execute("DELETE FROM bindings WHERE domain = ?", (domain,)).rowcount == 1
+
+    def get(self, domain: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute("SELECT config FROM bindings WHERE domain = ?", (domain,)).fetchone()
+            return row[0] if row else None
+
+    def page(self, after: str, limit: int) -> list[tuple[str, str]]:
+        """(domain, config) of up to `limit` bindings whose domain sorts after `after`."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT domain, config FROM bindings WHERE domain > ? ORDER BY domain LIMIT ?", (after, limit)
+            )
+            return [(row[0], row[1]) for row in rows]
+
+    def domains_for_channel(self, channel_id: str) -> list[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT domain FROM binding_channels WHERE channel_id = ? ORDER BY domain", (channel_id,)
+            )
+            return [row[0] for row in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM bindings").fetchone()[0]
+
+    def last_post_id(self, domain: str) -> int | None:
+        with self._lock:
+            row = self._conn.execute("SELECT last_post_id FROM post_state WHERE domain = ?", (domain,)).fetchone()
+            return row[0] if row else None
+
+    def seed_last_post_id(self, domain: str, post_id: int) -> None:
+        """Imports a position from state.yaml unless the store already has one."""
+        with self._transaction() as conn:
+            conn.execute("INSERT OR IGNORE INTO post_state (domain, last_post_id) VALUES (?, ?)", (domain, post_id))
+
+    def set_last_post_id(self, domain: str, post_id: int) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO post_state (domain, last_post_id) VALUES (?, ?) "
+                "ON CONFLICT(domain) DO UPDATE SET last_post_id = excluded.last_post_id",
+                (domain, post_id),
+            )
+
+
+def main(argv: list[str] | None = None) -> int:
+    from .config import BindingConfig, settings
+
+    parser = argparse.ArgumentParser(prog="python -m src.binding_store", description="Manage the binding store")
+    parser.add_argument("--path", type=Path, help="Store file (binding_store.path from config.yaml by default)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="Add a binding or replace the one with the same domain")
+    add.add_argument("domain", help="Short name or ID of the VK community")
+    add.add_argument("--channel", action="append", required=True, help="Telegram channel (repeat for several)")
+    add.add_argument("--post-count", type=int, default=10, help="Posts fetched in each check")
+    add.add_argument("--post-source", choices=["wall", "donut"], default="wall")
+    add.add_argument("--instance", help="Sharding instance that serves the binding")
+    remove = commands.add_parser("remove", help="Remove bindings")
+    remove.add_argument("domain", nargs="+")
+    listing = commands.add_parser("list", help="List bindings")
+    listing.add_argument("--channel", help="Only the bindings that post to this channel")
+    commands.add_parser("import", help="Copy the bindings of config.yaml into the store")
+    args = parser.parse_args(argv)
+
+    store = BindingStore(args.path or settings.binding_store.path)
+    try:
+        if args.command == "add":
+            raw = {
+                "vk": {"domain": args.domain, "post_count": args.post_count, "post_source": args.post_source},
+                "telegram": {"channel_ids": args.channel},
+                "instance": args.instance,
+            }
+            try:
+                binding = BindingConfig.model_validate(raw)
+                settings.check_binding(binding)
+            except (ValidationError, ValueError) as e:
+                print(f"❌ Некорректный binding {args.domain}: {e}", file=sys.stderr)
+                return 2
+            added = store.put(args.domain, binding.model_dump_json(), binding.telegram.channel_ids, time.time())
+            print(f"{'➕ Добавлен' if added else '✏️ Обновлён'} binding {args.domain}")
+        elif args.command == "remove":
+            missing = [domain for domain in args.domain if not store.remove(domain)]
+            for domain in missing:
+                print(f"⚠️ Binding {domain} не найден", file=sys.stderr)
+            return 1 if missing else 0
+        elif args.command == "list" and args.channel:
+            for domain in store.domains_for_channel(args.channel):
+                print(f"{domain}\t{store.get(domain)}")
+        elif args.command == "list":
+            after = ""
+            while page := store.page(after, 500):
+                for domain, config in page:
+                    print(f"{domain}\t{config}")
+                after = page[-1][0]
+        else:
+            for binding in settings.bindings:
+                domain = binding.vk.domain
+                store.put(domain, binding.model_dump_json(), binding.telegram.channel_ids, time.time())
+            print(f"✅ Перенесено bindings: {len(settings.bindings)}")
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+from collections.abc import Awaitable, Callable, Coroutine
+from typing import Any, TypeVar
+
+from .printer import log
+
+T = TypeVar("T")
+
+
+async def sleep_or_shutdown(seconds: float, shutdown_event: asyncio.Event) -> None:
+    """Sleeps for `seconds` in a single await; raises CancelledError as soon as shutdown_event is set."""
+    if shutdown_event.is_set():
+        raise asyncio.CancelledError()
+    if seconds <= 0:
+        return
+    with contextlib.suppress(TimeoutError):
+        await asyncio.wait_for(shutdown_event.wait(), timeout=seconds)
+    if shutdown_event.is_set():
+        raise asyncio.CancelledError()
+
+
+def shutdown_sleeper(shutdown_event: asyncio.Event) -> Callable[[float], Awaitable[None]]:
+    """sleep_or_shutdown bound to an event, for code that takes a `sleep` callable."""
+
+    async def sleep(seconds: float) -> None:
+        await sleep_or_shutdown(seconds, shutdown_event)
+
+    return sleep
+
+
+async def wait_event_or_shutdown(event: asyncio.Event, seconds: float, shutdown_event: asyncio.Event) -> bool:
+    """Waits for `event` up to `seconds`; returns whether it was set. Raises CancelledError on shutdown."""
+    waiters = {asyncio.ensure_future(event.wait()), asyncio.ensure_future(shutdown_event.wait())}
+    try:
+        await asyncio.wait(waiters, timeout=max(0.0, seconds), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for waiter in waiters:
+            waiter.cancel()
+    if shutdown_event.is_set():
+        raise asyncio.CancelledError()
+    return event.is_set()
+
+
+async def until_shutdown(aw: Awaitable[T], shutdown_event: asyncio.Event) -> T:  # noqa: UP047 - CI still runs 3.11
+    """Awaits `aw`, cancelling it and raising CancelledError as soon as shutdown_event is set."""
+    if shutdown_event.is_set():
+        raise asyncio.CancelledError()
+    task = asyncio.ensure_future(aw)
+    stop = asyncio.ensure_future(shutdown_event.wait())
+    try:
+        await asyncio.wait({task, stop}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        stop.cancel()
+        if not task.done():
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+    if task.cancelled():
+        raise asyncio.CancelledError()
+    return task.result()
+
+
+async def run_with_grace(main: Coroutine[Any, Any, None], shutdown_event: asyncio.Event, grace: float) -> None:
+    """
+    Runs `main` until it returns. Once shutdown_event is set, `main` has `grace` seconds to wind down
+    (waits inside it stop at once, an upload in progress may finish) before it is cancelled.
+    """
+    task = asyncio.ensure_future(main)
+    stop = asyncio.ensure_future(shutdown_event.wait())
+    try:
+        await asyncio.wait({task, stop}, return_when=asyncio.FIRST_COMPLETED)
+        if not task.done():
+            log(f"⏳ Жду завершения текущих операций (до {grace:.0f} с)...", padding_top=1)
+            await asyncio.wait({task}, timeout=grace)
+    finally:
+        stop.cancel()
+        if not task.done():
+            log("⏹️ Время ожидания истекло, прерываю.", padding_top=1)
+            task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
@@ -2,8 +2,6 @@ import re
 from re import Match
 from urllib.parse import urlparse
 
-import emoji
-
 PATTERN_BRACKET_LINK = r"\[([^\]|]+)\|([^\]]+)\]"
 PATTERN_PROTOCOL_URL = r"https?://[^\s\]]+"
 
@@ -13,6 +11,8 @@ def normalize_links(text: str) -> str:
 
     def insert_zwsp_after_emoji_sequences(s: str) -> str:
         """Insert a zero-width space after emoji sequences to prevent them from sticking."""
+        import emoji
+
         emjs = emoji.emoji_list(s)
         if not emjs:
             return s
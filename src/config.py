@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import re
+from collections.abc import Callable
 from pathlib import Path
 from typing import Any, Final, Literal, cast
 
@@ -14,6 +15,10 @@ from pydantic_settings import (
 
 # --- Constants ---
 CHANNEL_ID_RE: Final[re.Pattern[str]] = re.compile(r"^(@[A-Za-z0-9_]+|\d+)$")
+CONFIG_PATH: Final[Path] = Path("config.yaml")
+
+# Kinds of wall.get failures tracked by separate circuit breakers
+ErrorClass = Literal["auth", "not_found", "rate_limit", "network", "other"]
 
 
 # --- Models for YAML ---
@@ -21,6 +26,10 @@ class AppConfig(BaseModel):
     wait_time_seconds: int = Field(default=600, ge=1)
     state_file: Path = Field(default=Path("state.yaml"))
     session_name: str = Field(default="user_session")
+    # On shutdown, an upload in progress gets this long to finish before it is interrupted
+    shutdown_grace_seconds: int = Field(default=10, ge=0)
+    # A download or upload that makes no progress for this long is aborted and retried; 0 disables the watchdog
+    transfer_stall_seconds: int = Field(default=120, ge=0)
 
 
 class VKConfig(BaseModel):
@@ -29,6 +38,13 @@ class VKConfig(BaseModel):
     post_source: Literal["wall", "donut"]
 
 
+def _check_channel_ids(v: list[str]) -> list[str]:
+    for ch in v:
+        if not CHANNEL_ID_RE.match(ch):
+            raise ValueError(f"Некорректный формат channel_id: {ch}. Используйте @username или числовой ID.")
+    return v
+
+
 class TelegramConfig(BaseModel):
     channel_ids: list[str]
 
@@ -37,15 +53,25 @@ class TelegramConfig(BaseModel):
     def validate_channel_ids(cls, v: list[str]) -> list[str]:
         if not v:
             raise ValueError("Список channel_ids не может быть пустым")
-        for ch in v:
-            if not CHANNEL_ID_RE.match(ch):
-                raise ValueError(f"Некорректный формат channel_id: {ch}. Используйте @username или числовой ID.")
-        return v
+        return _check_channel_ids(v)
+
+
+class TelegramSessionConfig(BaseModel):
+    session_name: str = Field(..., min_length=1)
+    # Channels this account is admin of; an empty list means any channel
+    channel_ids: list[str] = Field(default_factory=list)
+
+    @field_validator("channel_ids")
+    @classmethod
+    def validate_channel_ids(cls, v: list[str]) -> list[str]:
+        return _check_channel_ids(v)
 
 
 class BindingConfig(BaseModel):
     vk: VKConfig
     telegram: TelegramConfig
+    # Sharding: the instance that serves this binding; by default it is picked by a hash of the domain
+    instance: str | None = None
 
 
 class RetryConfig(BaseModel):
@@ -53,12 +79,66 @@ class RetryConfig(BaseModel):
     delay_seconds: int = Field(default=10, ge=0)
 
 
+class PostprocessConfig(BaseModel):
+    enabled: bool = True
+    workers: int = Field(default=1, ge=1)
+    thumbnail_width: int = Field(default=320, ge=16, le=320)
+
+
+class DiskBudgetConfig(BaseModel):
+    # Upper bound for downloaded files on disk; 0 disables the limit
+    max_size_mb: int = Field(default=0, ge=0)
+    # Untracked files not modified for this long are treated as leftovers and removed
+    orphan_max_age_seconds: int = Field(default=900, ge=0)
+    sweep_interval_seconds: int = Field(default=600, ge=1)
+
+
+class StreamUploadConfig(BaseModel):
+    # Upload single progressive MP4 videos to Telegram while they are still downloading
+    enabled: bool = False
+    # Smaller videos are downloaded first: streaming needs Telegram's big-file upload, which starts above 10 MB
+    min_size_mb: int = Field(default=20, ge=11)
+
+
+class DownloadTuningConfig(BaseModel):
+    # Adjust fragment concurrency and aria2c connections per CDN host from measured throughput and retries
+    enabled: bool = True
+    min_concurrency: int = Field(default=1, ge=1)
+    max_concurrency: int = Field(default=16, ge=1)
+    # How much the concurrency changes between downloads
+    step: int = Field(default=2, ge=1)
+    # Retries per fragment above which a host is considered to throttle
+    max_error_rate: float = Field(default=0.05, ge=0)
+    # The values chosen per host survive restarts in this file
+    state_file: Path = Field(default=Path("download_tuning.json"))
+
+    @model_validator(mode="after")
+    def check_bounds(self) -> DownloadTuningConfig:
+        if self.min_concurrency > self.max_concurrency:
+            raise ValueError("min_concurrency не может быть больше max_concurrency")
+        return self
+
+
+class RangeDownloadConfig(BaseModel):
+    # Fetch videos that resolve to a single progressive file with parallel range requests instead of yt-dlp;
+    # HLS/DASH and merged formats keep yt-dlp's downloader. Connections follow the per-host tuning
+    enabled: bool = True
+    segment_size_mb: int = Field(default=4, ge=1)
+    # Retries of one segment, each resuming from the byte where it stopped, before the attempt fails
+    segment_retries: int = Field(default=5, ge=0)
+
+
 class DownloaderConfig(BaseModel):
     browser: Literal["chrome", "firefox", "edge"]
     output_path: Path
     yt_dlp_opts: dict[str, Any]
     retries: RetryConfig = Field(default_factory=RetryConfig)
     browser_restart_wait_seconds: int = Field(default=30, ge=0)
+    postprocess: PostprocessConfig = Field(default_factory=PostprocessConfig)
+    disk_budget: DiskBudgetConfig = Field(default_factory=DiskBudgetConfig)
+    stream_upload: StreamUploadConfig = Field(default_factory=StreamUploadConfig)
+    tuning: DownloadTuningConfig = Field(default_factory=DownloadTuningConfig)
+    range_download: RangeDownloadConfig = Field(default_factory=RangeDownloadConfig)
 
     @field_validator("output_path")
     @classmethod
@@ -68,17 +148,111 @@ class DownloaderConfig(BaseModel):
         return v
 
 
+class BindingStoreConfig(BaseModel):
+    # Read the bindings from a SQLite file managed with `python -m src.binding_store` instead of the list below
+    enabled: bool = False
+    # Also holds the last post ID of every binding, imported from app.state_file on first use
+    path: Path = Field(default=Path("bindings.db"))
+
+
+class ShardingConfig(BaseModel):
+    enabled: bool = False
+    # IDs of all instances that split the bindings; each one sets its own POSTBRIDGE_INSTANCE_ID
+    instances: list[str] = Field(default_factory=list)
+    # SQLite file shared by the instances: binding leases, heartbeats and the last post IDs
+    store_path: Path = Field(default=Path("postbridge.db"))
+    # A binding of an instance that stopped renewing its lease is taken over after this many seconds
+    lease_seconds: int = Field(default=120, ge=10)
+
+    @field_validator("instances")
+    @classmethod
+    def validate_instances(cls, v: list[str]) -> list[str]:
+        if len(v) != len(set(v)):
+            raise ValueError("ID инстансов в sharding.instances должны быть уникальными")
+        return v
+
+
+def _default_cooldowns() -> dict[ErrorClass, int]:
+    return {"auth": 1800, "not_found": 3600, "rate_limit": 60, "network": 30, "other": 300}
+
+
+class CircuitBreakerConfig(BaseModel):
+    enabled: bool = True
+    # Consecutive failures of one kind before the binding is skipped
+    failure_threshold: int = Field(default=2, ge=1)
+    # First cooldown per kind of failure; it doubles every time a probe fails, up to max_cooldown_seconds
+    base_cooldown_seconds: dict[ErrorClass, int] = Field(default_factory=_default_cooldowns)
+    max_cooldown_seconds: int = Field(default=21600, ge=1)
+    # Breaker state survives restarts in this file
+    state_file: Path = Field(default=Path("circuit_breakers.json"))
+
+    @field_validator("base_cooldown_seconds")
+    @classmethod
+    def fill_cooldowns(cls, v: dict[ErrorClass, int]) -> dict[ErrorClass, int]:
+        if any(seconds < 1 for seconds in v.values()):
+            raise ValueError("Значения base_cooldown_seconds должны быть не меньше 1")
+        return {**_default_cooldowns(), **v}
+
+
+class PeerCacheConfig(BaseModel):
+    # Channel usernames resolved to peers by each Telegram session survive restarts in this file
+    state_file: Path = Field(default=Path("peers.json"))
+    # Usernames resolved at once at startup
+    concurrency: int = Field(default=2, ge=1)
+    # Pause between two resolutions on one session, in seconds
+    interval_seconds: float = Field(default=2.0, ge=0)
+
+
+class ParallelUploadConfig(BaseModel):
+    # Upload big videos part by part over several media connections instead of Pyrogram's single one
+    enabled: bool = True
+    # Smaller files go through Pyrogram's send_video
+    min_size_mb: int = Field(default=100, ge=11)
+    # Media connections opened for one upload
+    connections: int = Field(default=4, ge=1, le=16)
+    # Parts in flight at once, spread over the connections
+    workers: int = Field(default=8, ge=1)
+    # Retries of one part before the upload fails
+    part_retries: int = Field(default=3, ge=0)
+
+
+class LanesConfig(BaseModel):
+    # Posts estimated to cost more than this go to the slow lane: 1 per photo and, per video, 30 plus its duration
+    slow_post_cost: int = Field(default=120, ge=0)
+    fast_workers: int = Field(default=2, ge=1)
+    slow_workers: int = Field(default=1, ge=1)
+    # Slow posts queued or running at once; later ones are left for a following poll
+    slow_backlog: int = Field(default=4, ge=1)
+    # strict: each channel gets posts in the order they were found; best_effort: a ready post is sent at once
+    ordering: Literal["strict", "best_effort"] = "strict"
+
+
+class MetricsConfig(BaseModel):
+    enabled: bool = False
+    host: str = Field(default="127.0.0.1", min_length=1)
+    port: int = Field(default=9108, ge=1, le=65535)
+
+
 # --- The main model of settings ---
 class Settings(BaseSettings):
     # From .env
     vk_service_token: str = Field(..., alias="VK_SERVICE_TOKEN")
     telegram_api_id: int = Field(..., alias="TELEGRAM_API_ID")
     telegram_api_hash: str = Field(..., alias="TELEGRAM_API_HASH")
+    instance_id: str | None = Field(default=None, alias="POSTBRIDGE_INSTANCE_ID")
 
     # From YAML
     app: AppConfig
     bindings: list[BindingConfig]
     downloader: DownloaderConfig
+    metrics: MetricsConfig = Field(default_factory=MetricsConfig)
+    circuit_breaker: CircuitBreakerConfig = Field(default_factory=CircuitBreakerConfig)
+    lanes: LanesConfig = Field(default_factory=LanesConfig)
+    peer_cache: PeerCacheConfig = Field(default_factory=PeerCacheConfig)
+    parallel_upload: ParallelUploadConfig = Field(default_factory=ParallelUploadConfig)
+    binding_store: BindingStoreConfig = Field(default_factory=BindingStoreConfig)
+    sharding: ShardingConfig = Field(default_factory=ShardingConfig)
+    telegram_sessions: list[TelegramSessionConfig] = Field(default_factory=list[TelegramSessionConfig])
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -129,16 +303,75 @@ class Settings(BaseSettings):
             init_settings,
             env_settings,
             dotenv_settings,
-            cls.YamlConfigSource(settings_cls, Path("config.yaml")),
+            cls.YamlConfigSource(settings_cls, CONFIG_PATH),
             file_secret_settings,
         )
 
     @model_validator(mode="after")
     def check_bindings_not_empty(self) -> Settings:
-        if not self.bindings:
+        if not self.bindings and not self.binding_store.enabled:
             raise ValueError("Список bindings не может быть пустым")
         return self
 
+    @model_validator(mode="after")
+    def check_unique_domains(self) -> Settings:
+        # The state file and hot reload both key bindings by VK domain
+        domains = [b.vk.domain for b in self.bindings]
+        duplicates = sorted({d for d in domains if domains.count(d) > 1})
+        if duplicates:
+            raise ValueError(f"Домены в bindings должны быть уникальными: {', '.join(duplicates)}")
+        return self
+
+    @model_validator(mode="after")
+    def check_telegram_sessions_cover_channels(self) -> Settings:
+        names = [s.session_name for s in self.telegram_sessions]
+        if len(names) != len(set(names)):
+            raise ValueError("Имена session_name в telegram_sessions должны быть уникальными")
+        for binding in self.bindings:
+            self.check_binding_sessions(binding)
+        return self
+
+    @model_validator(mode="after")
+    def check_sharding(self) -> Settings:
+        if not self.sharding.enabled:
+            return self
+        if not self.sharding.instances:
+            raise ValueError("Для sharding укажите список sharding.instances")
+        if self.instance_id not in self.sharding.instances:
+            raise ValueError("POSTBRIDGE_INSTANCE_ID должен быть одним из sharding.instances")
+        if self.lanes.ordering != "strict":
+            # The shared store marks one post per binding as in flight; a takeover skips up to it
+            raise ValueError("При включённом sharding lanes.ordering должен быть strict")
+        for binding in self.bindings:
+            self.check_binding_instance(binding)
+        return self
+
+    def check_binding_sessions(self, binding: BindingConfig) -> None:
+        if not self.telegram_sessions:
+            return
+        for ch in binding.telegram.channel_ids:
+            if not any(not s.channel_ids or ch in s.channel_ids for s in self.telegram_sessions):
+                raise ValueError(f"Ни одна сессия из telegram_sessions не может публиковать в канал {ch}")
+
+    def check_binding_instance(self, binding: BindingConfig) -> None:
+        if self.sharding.enabled and binding.instance is not None and binding.instance not in self.sharding.instances:
+            raise ValueError(f"Инстанс {binding.instance} для {binding.vk.domain} не указан в sharding.instances")
+
+    def download_dir(self, base: str | Path) -> Path:
+        """A download directory; with sharding each instance keeps its files in its own subdirectory."""
+        path = Path(base)
+        return path / self.instance_id if self.sharding.enabled and self.instance_id else path
+
+    def check_binding(self, binding: BindingConfig) -> None:
+        """Checks a binding against the rest of the config, for bindings validated one at a time from the store."""
+        self.check_binding_sessions(binding)
+        self.check_binding_instance(binding)
+
+    @property
+    def sessions(self) -> list[TelegramSessionConfig]:
+        """Configured Telegram sessions, falling back to the single app.session_name account."""
+        return self.telegram_sessions or [TelegramSessionConfig(session_name=self.app.session_name)]
+
     @classmethod
     def load(cls) -> Settings:
         """Factory method for correct instantiation without arguments."""
@@ -147,6 +380,60 @@ class Settings(BaseSettings):
         return cast(Settings, instance)
 
 
+# Settings that are only read at startup; a reload that changes them logs a warning and keeps the old values
+RESTART_ONLY_FIELDS: Final[dict[str, Callable[[Settings], Any]]] = {
+    "TELEGRAM_API_ID/TELEGRAM_API_HASH": lambda s: (s.telegram_api_id, s.telegram_api_hash),
+    "app.session_name": lambda s: s.app.session_name,
+    "app.state_file": lambda s: s.app.state_file,
+    "telegram_sessions": lambda s: s.telegram_sessions,
+    "downloader.postprocess": lambda s: s.downloader.postprocess,
+    "downloader.tuning.state_file": lambda s: s.downloader.tuning.state_file,
+    "circuit_breaker.state_file": lambda s: s.circuit_breaker.state_file,
+    "peer_cache.state_file": lambda s: s.peer_cache.state_file,
+    "lanes.fast_workers/lanes.slow_workers": lambda s: (s.lanes.fast_workers, s.lanes.slow_workers),
+    "metrics": lambda s: s.metrics,
+    "sharding": lambda s: s.sharding,
+    "binding_store": lambda s: s.binding_store,
+    "POSTBRIDGE_INSTANCE_ID": lambda s: s.instance_id,
+}
+
+
+def apply_settings(new: Settings) -> list[str]:
+    """
+    Copies a freshly loaded config into the running `settings` object, which every module holds a reference to.
+    Restart-only fields keep their current values; their names are returned when the new config changes them.
+    """
+    ignored = [name for name, get in RESTART_ONLY_FIELDS.items() if get(settings) != get(new)]
+    settings.vk_service_token = new.vk_service_token
+    settings.bindings = new.bindings
+    settings.app = new.app.model_copy(
+        update={"session_name": settings.app.session_name, "state_file": settings.app.state_file}
+    )
+    settings.downloader = new.downloader.model_copy(
+        update={
+            "postprocess": settings.downloader.postprocess,
+            "tuning": new.downloader.tuning.model_copy(update={"state_file": settings.downloader.tuning.state_file}),
+        }
+    )
+    settings.circuit_breaker = new.circuit_breaker.model_copy(
+        update={"state_file": settings.circuit_breaker.state_file}
+    )
+    settings.peer_cache = new.peer_cache.model_copy(update={"state_file": settings.peer_cache.state_file})
+    settings.parallel_upload = new.parallel_upload
+    lanes_update: dict[str, Any] = {
+        "fast_workers": settings.lanes.fast_workers,
+        "slow_workers": settings.lanes.slow_workers,
+    }
+    if settings.sharding.enabled:
+        # The new config was validated against its own sharding, but this process stays sharded until a restart,
+        # and sharding requires strict ordering
+        if new.lanes.ordering != settings.lanes.ordering:
+            ignored.append("lanes.ordering")
+        lanes_update["ordering"] = settings.lanes.ordering
+    settings.lanes = new.lanes.model_copy(update=lanes_update)
+    return ignored
+
+
 if __name__ == "__main__":
     settings = Settings.load()
     print(settings.model_dump())
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import signal
+import sys
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import yaml
+from pydantic import ValidationError
+
+from .config import CONFIG_PATH, BindingConfig, Settings, apply_settings, settings
+from .printer import log
+
+
+@dataclass
+class BindingsDiff:
+    """Domains of bindings added, removed or changed by a config reload."""
+
+    added: list[str] = field(default_factory=list[str])
+    removed: list[str] = field(default_factory=list[str])
+    changed: list[str] = field(default_factory=list[str])
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+
+def diff_bindings(old: list[BindingConfig], new: list[BindingConfig]) -> BindingsDiff:
+    """Compares two binding lists by VK domain."""
+    old_by_domain = {b.vk.domain: b for b in old}
+    new_by_domain = {b.vk.domain: b for b in new}
+    return BindingsDiff(
+        added=[d for d in new_by_domain if d not in old_by_domain],
+        removed=[d for d in old_by_domain if d not in new_by_domain],
+        changed=[d for d, b in new_by_domain.items() if d in old_by_domain and old_by_domain[d] != b],
+    )
+
+
+class ConfigReloader:
+    """
+    Reloads config.yaml when its modification time changes or on SIGHUP.
+    The new config is validated first; an invalid one is logged and the running config stays in place.
+    `changed` is set after every applied reload so the main loop can pick up added bindings right away.
+    """
+
+    def __init__(
+        self,
+        shutdown_event: asyncio.Event,
+        path: Path = CONFIG_PATH,
+        poll_interval: float = 5.0,
+        loader: Callable[[], Settings] = Settings.load,
+    ) -> None:
+        self.shutdown_event = shutdown_event
+        self.path = path
+        self.poll_interval = poll_interval
+        self.changed = asyncio.Event()
+        self._loader = loader
+        self._mtime: float | None = None
+        self._task: asyncio.Task[None] | None = None
+        self._pending: set[asyncio.Task[BindingsDiff | None]] = set()
+        self._lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        self._mtime = await asyncio.to_thread(self._read_mtime)
+        self._task = asyncio.create_task(self._watch())
+        if sys.platform != "win32":
+            asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, self.request_reload)
+        log("🚀 Отслеживание изменений конфигурации запущено", indent=1)
+
+    async def stop(self) -> None:
+        if sys.platform != "win32":
+            asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+        tasks = [*self._pending, *([self._task] if self._task else [])]
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        self._task = None
+        log("🛑 Отслеживание изменений конфигурации остановлено", indent=1)
+
+    def request_reload(self) -> None:
+        log("🔁 Получен SIGHUP — перечитываю конфигурацию...", padding_top=1)
+        task = asyncio.get_running_loop().create_task(self.reload())
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    def _read_mtime(self) -> float | None:
+        try:
+            return self.path.stat().st_mtime
+        except OSError:
+            return None
+
+    async def _watch(self) -> None:
+        while not self.shutdown_event.is_set():
+            await asyncio.sleep(self.poll_interval)
+            mtime = await asyncio.to_thread(self._read_mtime)
+            if mtime is not None and mtime != self._mtime:
+                self._mtime = mtime
+                log(f"🔁 Файл {self.path} изменён — перечитываю конфигурацию...", padding_top=1)
+                await self.reload()
+
+    async def reload(self) -> BindingsDiff | None:
+        """Loads, validates and applies the config. Returns None when the new config is rejected."""
+        async with self._lock:
+            try:
+                new = await asyncio.to_thread(self._loader)
+            except (ValidationError, yaml.YAMLError, OSError, ValueError) as e:
+                log(
+                    f"❌ Новая конфигурация некорректна, продолжаю со старой: {e}",
+                    indent=1,
+                    level=logging.ERROR,
+                )
+                return None
+
+            diff = diff_bindings(settings.bindings, new.bindings)
+            ignored = apply_settings(new)
+
+        for name in ignored:
+            log(f"⚠️ Изменение {name} вступит в силу только после перезапуска.", indent=1, level=logging.WARNING)
+        if diff:
+            for domain in diff.added:
+                log(f"➕ Добавлен binding {domain}", indent=1)
+            for domain in diff.removed:
+                log(f"➖ Удалён binding {domain}: доработаю текущий пост и остановлюсь", indent=1)
+            for domain in diff.changed:
+                log(f"✏️ Изменён binding {domain}: новые настройки со следующей проверки", indent=1)
+        log("✅ Конфигурация перечитана.", indent=1)
+        self.changed.set()
+        return diff
@@ -1,3 +1,4 @@
+from pathlib import Path
 from typing import Any, Literal
 
 from pydantic import BaseModel, Field, HttpUrl, RootModel
@@ -61,5 +62,15 @@ class WallGetResponse(BaseModel):
     items: list[Post]
 
 
+class VideoMeta(BaseModel):
+    path: Path
+    width: int
+    height: int
+    duration: int
+    thumb: Path | None = None
+    supports_streaming: bool = True
+    remuxed: bool = False
+
+
 class State(RootModel[dict[str, int]]):
     root: dict[str, int] = Field(default_factory=dict)
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+
+
+class GrowingFileError(RuntimeError):
+    """The download behind a growing file failed, or the file does not match the announced size."""
+
+
+class GrowingFile:
+    """
+    A video yt-dlp is still writing, read by the uploader as its bytes arrive. `size` is the final size
+    announced by the server. advance() may be called from any thread; the rest runs on the event loop.
+    """
+
+    def __init__(self, path: Path, size: int, loop: asyncio.AbstractEventLoop) -> None:
+        self.path = path
+        self.size = size
+        self.final_path: Path | None = None
+        self._loop = loop
+        self._available = 0
+        self._error: str | None = None
+        self._complete = False
+        self._changed = asyncio.Event()
+
+    @property
+    def name(self) -> str:
+        return self.path.name.removesuffix(".part")
+
+    def advance(self, available: int) -> None:
+        """Reports the number of bytes downloaded so far."""
+        self._loop.call_soon_threadsafe(self._set_available, available)
+
+    def finish(self, path: Path, size: int) -> None:
+        """The download is complete and was renamed to `path`."""
+        self.final_path = path
+        if size != self.size:
+            self.fail(f"размер {size} вместо объявленных {self.size} байт")
+            return
+        self._available = size
+        self._complete = True
+        self._wake()
+
+    def fail(self, reason: str) -> None:
+        if self._error is None and not self._complete:
+            self._error = reason
+            self._wake()
+
+    async def read(self, offset: int, length: int) -> bytes:
+        """Waits until the bytes at `offset` are downloaded (up to the end of the file) and returns them."""
+        end = min(offset + length, self.size)
+        while True:
+            changed = self._changed
+            if self._error is not None:
+                raise GrowingFileError(self._error)
+            if self._available >= end:
+                data = await asyncio.to_thread(self._read, offset, end - offset)
+                if len(data) == end - offset:
+                    return data
+                if self.final_path is not None:
+                    raise GrowingFileError(f"{self.name} короче объявленного размера")
+                # Counted by yt-dlp but still in its write buffer
+            await changed.wait()
+
+    def _read(self, offset: int, length: int) -> bytes:
+        # yt-dlp renames the .part file once it is complete
+        data = b""
+        for path in (self.path, self.final_path):
+            if path is None:
+                continue
+            try:
+                with open(path, "rb") as f:
+                    f.seek(offset)
+                    data = f.read(length)
+            except FileNotFoundError:
+                continue
+            if len(data) == length:
+                break
+        return data
+
+    def _set_available(self, available: int) -> None:
+        if available > self._available:
+            self._available = available
+            self._wake()
+
+    def _wake(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
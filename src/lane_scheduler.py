@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import asyncio
+import bisect
+import itertools
+import logging
+from collections import deque
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import Literal
+
+from .config import LanesConfig, settings
+from .dto import Post
+from .managers.shard_manager import LeaseLostError, ShardManager
+from .metrics import POSTS_BEHIND, POSTS_PROCESSED, QUEUE_DEPTH
+from .printer import log
+
+Lane = Literal["fast", "slow"]
+
+# Cost units are roughly seconds of work; VK reports video durations but not sizes
+PHOTO_COST = 1
+VIDEO_COST = 30
+UNKNOWN_VIDEO_SECONDS = 600
+
+
+def estimate_cost(post: Post) -> int:
+    """1 per photo and, per video, VIDEO_COST plus its duration (a long one when VK does not report it)."""
+    cost = 0
+    for attachment in post.attachments:
+        if attachment.type == "photo" and attachment.photo:
+            cost += PHOTO_COST
+        elif attachment.type == "video" and attachment.video:
+            cost += VIDEO_COST + (attachment.video.duration or UNKNOWN_VIDEO_SECONDS)
+    return cost
+
+
+@dataclass(eq=False)
+class PostJob:
+    """A post waiting in or running through a lane."""
+
+    domain: str
+    post: Post
+    channel_ids: list[str]
+    lane: Lane
+    seq: int
+    strict: bool
+    delivered: bool = False
+    failed: bool = False
+    dropped: bool = False
+    began: bool = False
+    task: asyncio.Task[None] | None = field(default=None, repr=False)
+
+
+# Runs a post; calls wait_turn(channel_id) right before sending it to each channel
+ProcessJob = Callable[[PostJob, Callable[[str], Awaitable[None]]], Awaitable[None]]
+
+
+class LaneScheduler:
+    """
+    Runs posts in two lanes so that a text-and-photo post does not wait behind a long video of another binding.
+    Each post's cost is estimated from its attachments; cheap posts run in the fast lane, expensive ones in a
+    bounded slow lane. With strict ordering a reorder buffer holds a post back from a channel until every post
+    found before it for that channel was sent; with best-effort ordering a post is sent as soon as it is ready.
+    A binding's position only advances over posts that were delivered in order.
+    """
+
+    def __init__(
+        self,
+        shutdown_event: asyncio.Event,
+        shard_manager: ShardManager,
+        process: ProcessJob,
+        config: LanesConfig | None = None,
+    ) -> None:
+        self.shutdown_event = shutdown_event
+        self.shard_manager = shard_manager
+        self._process = process
+        self._config = config
+        self._seq = itertools.count()
+        self._lanes: dict[Lane, asyncio.Semaphore] = {}
+        # Posts of each binding that are not committed yet, by ID
+        self._pending: dict[str, list[PostJob]] = {}
+        # Reorder buffer: sequence numbers of the posts each channel expects, in order
+        self._channels: dict[str, deque[int]] = {}
+        self._turn_changed = asyncio.Event()
+        self._commit_lock = asyncio.Lock()
+
+    @property
+    def config(self) -> LanesConfig:
+        return self._config or settings.lanes
+
+    async def start(self) -> None:
+        self._lanes = {
+            "fast": asyncio.Semaphore(self.config.fast_workers),
+            "slow": asyncio.Semaphore(self.config.slow_workers),
+        }
+        log("🚀 Lane Scheduler готов к работе", indent=1)
+
+    async def stop(self) -> None:
+        """Waits for the running posts; on shutdown they stop on their own, an upload in progress may finish."""
+        tasks = [job.task for jobs in self._pending.values() for job in jobs if job.task and not job.task.done()]
+        await asyncio.gather(*tasks, return_exceptions=True)
+        log("🛑 Lane Scheduler остановлен", indent=1)
+
+    def held(self, domain: str) -> set[int]:
+        """IDs of the binding's posts that are queued, running or delivered but not committed yet."""
+        return {job.post.id for job in self._pending.get(domain, []) if not job.failed}
+
+    def submit(self, domain: str, post: Post, channel_ids: list[str]) -> bool:
+        """
+        Queues a post. Returns False when the slow lane is full: the post and the binding's later posts
+        should be submitted by a following poll.
+        """
+        cost = estimate_cost(post)
+        lane: Lane = "slow" if cost > self.config.slow_post_cost else "fast"
+        if lane == "slow" and self._backlog("slow") >= self.config.slow_backlog:
+            log(f"⏳ Медленная полоса занята, пост {post.id} подождёт следующей проверки.", indent=2)
+            return False
+
+        strict = self.config.ordering == "strict"
+        job = PostJob(domain, post, list(channel_ids), lane, next(self._seq), strict)
+        if strict:
+            for channel_id in job.channel_ids:
+                self._channels.setdefault(channel_id, deque()).append(job.seq)
+        jobs = self._pending.setdefault(domain, [])
+        # A retried post replaces the one that failed, ahead of posts delivered after it
+        jobs[:] = [j for j in jobs if j.post.id != post.id]
+        bisect.insort(jobs, job, key=lambda j: j.post.id)
+        job.task = asyncio.create_task(self._run(job))
+        log(
+            f"🛤️ Пост {post.id}: {'медленная' if lane == 'slow' else 'быстрая'} полоса (оценка {cost})",
+            indent=2,
+            level=logging.DEBUG,
+        )
+        self._update_depth()
+        return True
+
+    def drop(self, domain: str, from_post_id: int | None = None) -> None:
+        """
+        Cancels the binding's undelivered posts starting at `from_post_id` (all of them by default);
+        a following poll finds them again.
+        """
+        current = asyncio.current_task()
+        for job in self._pending.get(domain, []):
+            if job.delivered or (from_post_id is not None and job.post.id < from_post_id):
+                continue
+            job.dropped = True
+            self._release_turns(job)
+            if job.task and job.task is not current and not job.task.done():
+                job.task.cancel()
+        if from_post_id is None:
+            self._pending.pop(domain, None)
+        self._update_depth()
+
+    async def _run(self, job: PostJob) -> None:
+        try:
+            async with self._lanes[job.lane]:
+                if self.shutdown_event.is_set():
+                    raise asyncio.CancelledError()
+                await self._process(job, lambda channel_id: self._wait_turn(job, channel_id))
+        except asyncio.CancelledError:
+            await self._forget(job)
+            if job.dropped:
+                return
+            raise
+        except LeaseLostError as e:
+            log(f"⚠️ {e}. Останавливаю обработку {job.domain}.", indent=1, level=logging.WARNING)
+            await self._fail(job)
+            return
+        except Exception as e:
+            log(
+                f"❌ Ошибка обработки для {job.domain}: {e}. Пропускаю этот binding.",
+                indent=1,
+                level=logging.ERROR,
+            )
+            await self._fail(job)
+            return
+        if job.dropped:
+            await self._forget(job)
+            return
+
+        job.delivered = True
+        self._update_depth()
+        try:
+            await self._commit(job.domain)
+        except LeaseLostError as e:
+            log(f"⚠️ {e}. Останавливаю обработку {job.domain}.", indent=1, level=logging.WARNING)
+            self.drop(job.domain)
+        finally:
+            self._release_turns(job)
+
+    async def _wait_turn(self, job: PostJob, channel_id: str) -> None:
+        queue = self._channels.get(channel_id)
+        while job.strict and queue and queue[0] != job.seq:
+            await self._turn_changed.wait()
+        if self.shutdown_event.is_set():
+            raise asyncio.CancelledError()
+        if not job.began:
+            job.began = True
+            await self.shard_manager.begin_post(job.domain, job.post.id)
+
+    def _release_turns(self, job: PostJob) -> None:
+        # Turns are held until the post is sent to every channel and committed, so a later post
+        # of the same binding is not marked in flight before its position is written
+        for channel_id in job.channel_ids:
+            queue = self._channels.get(channel_id)
+            if queue and job.seq in queue:
+                queue.remove(job.seq)
+                if not queue:
+                    del self._channels[channel_id]
+        self._turn_changed.set()
+        self._turn_changed = asyncio.Event()
+
+    async def _fail(self, job: PostJob) -> None:
+        # Kept as a gap: posts of the binding delivered after it must not be committed past it
+        job.failed = True
+        self.drop(job.domain, from_post_id=job.post.id)
+        if job.began:
+            await self.shard_manager.abort_post(job.domain)
+        jobs = self._pending.get(job.domain, [])
+        jobs[:] = [j for j in jobs if j.failed or not j.dropped]
+        self._update_depth()
+
+    async def _forget(self, job: PostJob) -> None:
+        """Removes an interrupted post; the next poll finds it again."""
+        self._release_turns(job)
+        jobs = self._pending.get(job.domain, [])
+        if job in jobs:
+            if any(j.delivered and j.post.id > job.post.id for j in jobs):
+                # A gap like a failed post: the ones delivered after it must wait for its retry
+                job.failed = True
+            else:
+                jobs.remove(job)
+        if job.began:
+            await self.shard_manager.abort_post(job.domain)
+        self._update_depth()
+
+    async def _commit(self, domain: str) -> None:
+        """Advances the binding's position over the delivered posts at the head of its queue."""
+        async with self._commit_lock:
+            jobs = self._pending.get(domain, [])
+            while jobs and jobs[0].delivered:
+                job = jobs[0]
+                await self.shard_manager.commit_post(domain, job.post.id)
+                jobs.pop(0)
+                POSTS_PROCESSED.labels(domain=domain).inc()
+                POSTS_BEHIND.labels(domain=domain).dec()
+            if not jobs:
+                self._pending.pop(domain, None)
+
+    def _backlog(self, lane: Lane) -> int:
+        return sum(
+            1
+            for jobs in self._pending.values()
+            for j in jobs
+            if j.lane == lane and not (j.delivered or j.failed or j.dropped)
+        )
+
+    def _update_depth(self) -> None:
+        for lane in ("fast", "slow"):
+            QUEUE_DEPTH.labels(queue=f"{lane}_lane").set(self._backlog(lane))
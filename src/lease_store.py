@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+from collections.abc import Generator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS instances (
+    instance_id TEXT PRIMARY KEY,
+    heartbeat_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    domain TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    token INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS post_state (
+    domain TEXT PRIMARY KEY,
+    last_post_id INTEGER NOT NULL DEFAULT 0,
+    inflight_post_id INTEGER,
+    inflight_token INTEGER
+);
+"""
+
+
+@dataclass(frozen=True)
+class Lease:
+    """A binding held by this instance. `token` grows with every change of holder and fences stale writers."""
+
+    domain: str
+    token: int
+    # Post left in flight by the previous holder; it may have been delivered, so it is skipped
+    skipped_post_id: int | None = None
+
+
+class LeaseStore:
+    """
+    Binding leases, instance heartbeats and per-binding post state in a SQLite file shared by all instances.
+    Every method is a short transaction; call them from a worker thread.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Generator[sqlite3.Connection]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def heartbeat(self, instance_id: str, now: float) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO instances (instance_id, heartbeat_at) VALUES (?, ?) "
+                "ON CONFLICT(instance_id) DO UPDATE SET heartbeat_at = excluded.heartbeat_at",
+                (instance_id, now),
+            )
+
+    def alive_instances(self, now: float, ttl: float) -> set[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT instance_id FROM instances WHERE heartbeat_at > ?", (now - ttl,))
+            return {row[0] for row in rows}
+
+    def retire(self, instance_id: str) -> None:
+        """Marks the instance as gone so that its bindings are reassigned without waiting for the heartbeat TTL."""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM instances WHERE instance_id = ?", (instance_id,))
+
+    def acquire(self, domain: str, owner: str, now: float, ttl: float) -> Lease | None:
+        """
+        Takes or extends the lease on a binding. Returns None while another holder's lease is valid.
+        A post the previous holder had in flight is recorded as done: it may already be in the channel,
+        and skipping it is the only way to never deliver it twice.
+        """
+        with self._transaction() as conn:
+            row = conn.execute("SELECT owner, token, expires_at FROM leases WHERE domain = ?", (domain,)).fetchone()
+            if row and row[0] == owner and row[2] > now:
+                conn.execute("UPDATE leases SET expires_at = ? WHERE domain = ?", (now + ttl, domain))
+                return Lease(domain, row[1])
+            if row and row[2] > now:
+                return None
+
+            token = (row[1] if row else 0) + 1
+            conn.execute(
+                "INSERT INTO leases (domain, owner, token, expires_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(domain) DO UPDATE SET owner = excluded.owner, token = excluded.token, "
+                "expires_at = excluded.expires_at",
+                (domain, owner, token, now + ttl),
+            )
+            state = conn.execute(
+                "SELECT last_post_id, inflight_post_id FROM post_state WHERE domain = ?", (domain,)
+            ).fetchone()
+            skipped = None
+            if state and state[1] is not None:
+                skipped = state[1] if state[1] > state[0] else None
+                conn.execute(
+                    "UPDATE post_state SET last_post_id = MAX(last_post_id, inflight_post_id), "
+                    "inflight_post_id = NULL, inflight_token = NULL WHERE domain = ?",
+                    (domain,),
+                )
+            return Lease(domain, token, skipped)
+
+    def renew(self, lease: Lease, owner: str, now: float, ttl: float) -> bool:
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE leases SET expires_at = ? WHERE domain = ? AND owner = ? AND token = ? AND expires_at > ?",
+                (now + ttl, lease.domain, owner, lease.token, now),
+            )
+            return cursor.rowcount == 1
+
+    def release(self, lease: Lease, owner: str) -> None:
+        # The row is kept so that the next token is still greater than this one
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE leases SET expires_at = 0 WHERE domain = ? AND owner = ? AND token = ?",
+                (lease.domain, owner, lease.token),
+            )
+
+    def last_post_id(self, domain: str) -> int | None:
+        with self._lock:
+            row = self._conn.execute("SELECT last_post_id FROM post_state WHERE domain = ?", (domain,)).fetchone()
+            return row[0] if row else None
+
+    def seed_last_post_id(self, domain: str, post_id: int) -> None:
+        """Imports a position from state.yaml unless the store already has one."""
+        with self._transaction() as conn:
+            conn.execute("INSERT OR IGNORE INTO post_state (domain, last_post_id) VALUES (?, ?)", (domain, post_id))
+
+    def begin_post(self, lease: Lease, owner: str, post_id: int, now: float) -> bool:
+        """Records the post as in flight; False if the lease is no longer held."""
+        with self._transaction() as conn:
+            if not self._holds(conn, lease, owner, now):
+                return False
+            conn.execute("INSERT OR IGNORE INTO post_state (domain) VALUES (?)", (lease.domain,))
+            conn.execute(
+                "UPDATE post_state SET inflight_post_id = ?, inflight_token = ? WHERE domain = ?",
+                (post_id, lease.token, lease.domain),
+            )
+            return True
+
+    def commit_post(self, lease: Lease, owner: str, post_id: int) -> bool:
+        """Advances the binding past the post; False if another instance has taken the lease over."""
+        with self._transaction() as conn:
+            if not self._holds(conn, lease, owner, None):
+                return False
+            conn.execute(
+                "UPDATE post_state SET last_post_id = MAX(last_post_id, ?) WHERE domain = ?", (post_id, lease.domain)
+            )
+            # A later post already in flight keeps its mark
+            conn.execute(
+                "UPDATE post_state SET inflight_post_id = NULL, inflight_token = NULL "
+                "WHERE domain = ? AND (inflight_post_id IS NULL OR inflight_post_id <= ?)",
+                (lease.domain, post_id),
+            )
+            return True
+
+    def abort_post(self, lease: Lease, owner: str) -> None:
+        """Clears the in-flight mark of a post that was interrupted before it was sent, so it is retried."""
+        with self._transaction() as conn:
+            if self._holds(conn, lease, owner, None):
+                conn.execute(
+                    "UPDATE post_state SET inflight_post_id = NULL, inflight_token = NULL "
+                    "WHERE domain = ? AND inflight_token = ?",
+                    (lease.domain, lease.token),
+                )
+
+    @staticmethod
+    def _holds(conn: sqlite3.Connection, lease: Lease, owner: str, now: float | None) -> bool:
+        row = conn.execute("SELECT owner, token, expires_at FROM leases WHERE domain = ?", (lease.domain,)).fetchone()
+        return bool(row) and row[0] == owner and row[1] == lease.token and (now is None or row[2] > now)
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import AsyncIterator
+
+from pydantic import ValidationError
+
+from ..binding_store import BindingStore
+from ..config import BindingConfig, settings
+from ..printer import log
+from ..state_manager import get_last_post_id, set_last_post_id
+
+# Bindings read from the store at once
+PAGE_SIZE = 500
+
+
+class BindingManager:
+    """
+    The bindings to poll. Without binding_store they are the config.yaml list, which a reload may change.
+    With it they are read from the SQLite store page by page and validated one at a time as they are read,
+    so thousands of bindings are never loaded or validated at once and an invalid row only skips itself.
+    Their last post IDs move to the store too, imported from state.yaml the first time a binding is polled,
+    instead of rewriting the whole YAML map after every post.
+    """
+
+    def __init__(self, store: BindingStore | None = None) -> None:
+        self.store = store
+        # Rows reported as invalid, so that each version is logged once
+        self._invalid: dict[str, str] = {}
+
+    async def start(self) -> None:
+        if not settings.binding_store.enabled:
+            return
+        if self.store is None:
+            self.store = await asyncio.to_thread(BindingStore, settings.binding_store.path)
+        count = await asyncio.to_thread(self.store.count)
+        log(f"🚀 Bindings читаются из {self.store.path}: {count}", indent=1)
+        if settings.bindings:
+            log(
+                "⚠️ При включённом binding_store список bindings из config.yaml не используется.",
+                indent=1,
+                level=logging.WARNING,
+            )
+
+    async def stop(self) -> None:
+        if self.store is not None:
+            await asyncio.to_thread(self.store.close)
+            self.store = None
+
+    async def iterate(self) -> AsyncIterator[BindingConfig]:
+        """Every binding, in domain order for the store; bindings added or removed meanwhile may be missed."""
+        if self.store is None:
+            # A reload while the bindings are polled may change or remove the ones not polled yet
+            for domain in [b.vk.domain for b in settings.bindings]:
+                if binding := await self.get(domain):
+                    yield binding
+            return
+        after = ""
+        while page := await asyncio.to_thread(self.store.page, after, PAGE_SIZE):
+            for domain, raw in page:
+                if binding := self._validate(domain, raw):
+                    yield binding
+            after = page[-1][0]
+
+    async def get(self, domain: str) -> BindingConfig | None:
+        """The binding as currently configured, or None once it is removed."""
+        if self.store is None:
+            return next((b for b in settings.bindings if b.vk.domain == domain), None)
+        raw = await asyncio.to_thread(self.store.get, domain)
+        return self._validate(domain, raw) if raw is not None else None
+
+    async def last_post_id(self, domain: str) -> int:
+        if self.store is None:
+            return await get_last_post_id(domain)
+        post_id = await asyncio.to_thread(self.store.last_post_id, domain)
+        if post_id is None:
+            post_id = await get_last_post_id(domain)
+            await asyncio.to_thread(self.store.seed_last_post_id, domain, post_id)
+        return post_id
+
+    async def set_last_post_id(self, domain: str, post_id: int) -> None:
+        if self.store is None:
+            await set_last_post_id(domain, post_id)
+            return
+        await asyncio.to_thread(self.store.set_last_post_id, domain, post_id)
+
+    def _validate(self, domain: str, raw: str) -> BindingConfig | None:
+        try:
+            binding = BindingConfig.model_validate_json(raw)
+            settings.check_binding(binding)
+        except (ValidationError, ValueError) as e:
+            if self._invalid.get(domain) != raw:
+                self._invalid[domain] = raw
+                log(f"❌ Binding {domain} в хранилище некорректен, пропускаю: {e}", indent=1, level=logging.ERROR)
+            return None
+        self._invalid.pop(domain, None)
+        return binding
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import random
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Literal
+
+from ..config import CircuitBreakerConfig, ErrorClass, settings
+from ..metrics import CIRCUIT_SKIPPED_CHECKS, CIRCUIT_STATE
+from ..printer import log
+from .vk_client_manager import classify_error
+
+CircuitState = Literal["closed", "half_open", "open"]
+STATE_VALUES: dict[CircuitState, int] = {"closed": 0, "half_open": 1, "open": 2}
+
+
+@dataclass
+class Circuit:
+    """Failures of one kind for one binding."""
+
+    state: CircuitState = "closed"
+    failures: int = 0
+    # Times the circuit opened in a row; every failed probe doubles the cooldown
+    opens: int = 0
+    # Wall-clock time, so that a cooldown carries over a restart
+    open_until: float = 0.0
+    last_error: str = ""
+
+
+def _read(path: Path) -> dict[str, dict[str, Circuit]]:
+    try:
+        raw = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+    return {domain: {kind: Circuit(**c) for kind, c in circuits.items()} for domain, circuits in raw.items()}
+
+
+def _write(path: Path, data: dict[str, dict[str, Circuit]]) -> None:
+    raw = {domain: {kind: asdict(c) for kind, c in circuits.items()} for domain, circuits in data.items()}
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(raw, indent=2, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(path)
+
+
+class CircuitBreaker:
+    """
+    Skips bindings whose wall.get keeps failing, so a deleted group or a revoked token does not slow down every cycle.
+    Each binding has a circuit per kind of failure (auth, not_found, rate_limit, network, other). After
+    `failure_threshold` consecutive failures of one kind the circuit opens and the binding is skipped for a jittered
+    cooldown that doubles every time; after it the binding is checked once more (half-open), and a success closes
+    all of its circuits.
+    """
+
+    def __init__(
+        self,
+        config: CircuitBreakerConfig | None = None,
+        clock: Callable[[], float] = time.time,
+        rng: random.Random | None = None,
+    ) -> None:
+        self._config = config
+        self._clock = clock
+        self._rng = rng or random.Random()
+        self._circuits: dict[str, dict[str, Circuit]] = {}
+        self._path: Path | None = None
+
+    @property
+    def config(self) -> CircuitBreakerConfig:
+        return self._config or settings.circuit_breaker
+
+    async def start(self) -> None:
+        self._path = self.config.state_file
+        try:
+            self._circuits = await asyncio.to_thread(_read, self._path)
+        except (OSError, ValueError, TypeError) as e:
+            log(f"⚠️ Не удалось прочитать {self._path}: {e}. Начинаю с закрытыми цепями.", indent=1)
+            self._circuits = {}
+        for domain, circuits in self._circuits.items():
+            for kind, circuit in circuits.items():
+                CIRCUIT_STATE.labels(domain=domain, error_class=kind).set(STATE_VALUES[circuit.state])
+        log("🚀 Circuit Breaker готов к работе", indent=1)
+
+    async def stop(self) -> None:
+        await self._save()
+        log("🛑 Circuit Breaker остановлен", indent=1)
+
+    def allow(self, domain: str) -> bool:
+        """Whether the binding should be checked now. An expired cooldown lets one probe through."""
+        circuits = self._circuits.get(domain)
+        if not circuits or not self.config.enabled:
+            return True
+        now = self._clock()
+        blocking = [(kind, c) for kind, c in circuits.items() if c.state == "open" and c.open_until > now]
+        if blocking:
+            kind, circuit = max(blocking, key=lambda item: item[1].open_until)
+            CIRCUIT_SKIPPED_CHECKS.labels(domain=domain).inc()
+            until = datetime.fromtimestamp(circuit.open_until).strftime("%H:%M:%S")
+            log(f"⏸️ {domain} пропущен до {until} ({kind}: {circuit.last_error})", indent=1, level=logging.DEBUG)
+            return False
+        for kind, circuit in circuits.items():
+            if circuit.state == "open":
+                self._set_state(domain, kind, circuit, "half_open")
+                log(f"🔎 Проверяю {domain} после паузы ({kind}).", indent=1)
+        return True
+
+    async def record_success(self, domain: str) -> None:
+        circuits = self._circuits.pop(domain, None)
+        if not circuits:
+            return
+        for kind in circuits:
+            CIRCUIT_STATE.labels(domain=domain, error_class=kind).set(STATE_VALUES["closed"])
+        if any(c.state != "closed" for c in circuits.values()):
+            log(f"✅ {domain} снова отвечает, проверки возобновлены.", indent=1)
+        await self._save()
+
+    async def record_failure(self, domain: str, error: BaseException) -> ErrorClass:
+        kind = classify_error(error)
+        if not self.config.enabled:
+            return kind
+        circuits = self._circuits.setdefault(domain, {})
+        probing = any(c.state == "half_open" for c in circuits.values())
+        circuit = circuits.setdefault(kind, Circuit())
+        circuit.failures += 1
+        circuit.last_error = str(error)[:200]
+        if probing or circuit.failures >= self.config.failure_threshold:
+            circuit.opens += 1
+            cooldown = self._cooldown(kind, circuit.opens)
+            circuit.open_until = self._clock() + cooldown
+            self._set_state(domain, kind, circuit, "open")
+            # The other kinds waiting for this probe wait for the new cooldown instead
+            for other_kind, other in circuits.items():
+                if other.state == "half_open":
+                    other.open_until = circuit.open_until
+                    self._set_state(domain, other_kind, other, "open")
+            log(
+                f"⛔ {domain}: {kind}, пропускаю проверки на {cooldown:.0f} с.",
+                indent=1,
+                level=logging.WARNING,
+            )
+        await self._save()
+        return kind
+
+    def _cooldown(self, kind: ErrorClass, opens: int) -> float:
+        base = self.config.base_cooldown_seconds[kind]
+        cooldown = min(self.config.max_cooldown_seconds, base * 2 ** min(opens - 1, 30))
+        # Equal jitter: bindings that failed together are not all probed at the same moment
+        return cooldown / 2 + self._rng.uniform(0, cooldown / 2)
+
+    @staticmethod
+    def _set_state(domain: str, kind: str, circuit: Circuit, state: CircuitState) -> None:
+        circuit.state = state
+        CIRCUIT_STATE.labels(domain=domain, error_class=kind).set(STATE_VALUES[state])
+
+    async def _save(self) -> None:
+        if self._path is None:
+            return
+        try:
+            await asyncio.to_thread(_write, self._path, self._circuits)
+        except OSError as e:
+            log(f"⚠️ Не удалось сохранить {self._path}: {e}", indent=1, level=logging.WARNING)
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import os
+import time
+from collections.abc import Hashable
+from pathlib import Path
+
+from ..config import DiskBudgetConfig, settings
+from ..metrics import DISK_WAIT_SECONDS, DOWNLOADS_DISK_BYTES, ORPHANS_REMOVED
+from ..printer import log
+from .vk_client_manager import PHOTOS_PATH
+
+
+def _file_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+
+def _sweep_directory(directory: Path, tracked: set[Path], max_age: float, now: float) -> list[Path]:
+    """Removes files in `directory` that are not tracked and were not modified for `max_age` seconds."""
+    removed: list[Path] = []
+    if not directory.is_dir():
+        return removed
+    for path in directory.iterdir():
+        try:
+            if not path.is_file() or path.resolve() in tracked:
+                continue
+            if now - path.stat().st_mtime < max_age:
+                continue
+            path.unlink()
+            removed.append(path)
+        except OSError:
+            continue
+    return removed
+
+
+class DownloadSpaceManager:
+    """
+    Keeps downloaded files within the disk budget.
+    Files are tracked per owner (a post) and deleted together by release(), whether the post was sent or failed.
+    Files nobody tracks are leftovers of a failed or killed run; they are swept on startup and periodically.
+    When the budget is used up, wait_for_room() holds new downloads until another owner releases its files.
+    """
+
+    def __init__(
+        self,
+        shutdown_event: asyncio.Event,
+        directories: list[Path] | None = None,
+        config: DiskBudgetConfig | None = None,
+    ) -> None:
+        self.shutdown_event = shutdown_event
+        self._directories = directories
+        self._config = config
+        self._files: dict[Hashable, dict[Path, int]] = {}
+        self._used = 0
+        self._changed = asyncio.Condition()
+        self._tasks: list[asyncio.Task[None]] = []
+
+    @property
+    def config(self) -> DiskBudgetConfig:
+        return self._config or settings.downloader.disk_budget
+
+    @property
+    def directories(self) -> list[Path]:
+        # With sharding, instances sharing the directories only sweep their own subdirectories
+        bases = [PHOTOS_PATH, Path(settings.downloader.output_path)]
+        return self._directories or list(dict.fromkeys(settings.download_dir(base) for base in bases))
+
+    @property
+    def used_bytes(self) -> int:
+        return self._used
+
+    async def start(self) -> None:
+        await self.sweep()
+        self._tasks = [asyncio.create_task(self._sweep_periodically()), asyncio.create_task(self._wake_on_shutdown())]
+        log("🚀 Download Space Manager готов к работе", indent=1)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        self._tasks = []
+        log("🛑 Download Space Manager остановлен", indent=1)
+
+    def _limit(self) -> int:
+        return self.config.max_size_mb * 1024 * 1024
+
+    def _blocked(self, owner: Hashable) -> bool:
+        # A post is never blocked by its own files, otherwise a post larger than the budget would wait forever
+        limit = self._limit()
+        return bool(limit) and self._used >= limit and any(other != owner for other in self._files)
+
+    async def wait_for_room(self, owner: Hashable) -> None:
+        """Waits until the disk budget allows `owner` to download another file."""
+        async with self._changed:
+            if not self._blocked(owner):
+                return
+            log(
+                f"⏳ Лимит места для загрузок исчерпан ({self._used / 2**20:.0f}/{self.config.max_size_mb} МБ), "
+                "жду освобождения...",
+                indent=4,
+            )
+            started = time.perf_counter()
+            await self._changed.wait_for(lambda: self.shutdown_event.is_set() or not self._blocked(owner))
+            DISK_WAIT_SECONDS.inc(time.perf_counter() - started)
+        if self.shutdown_event.is_set():
+            raise asyncio.CancelledError()
+
+    async def track(self, owner: Hashable, path: Path) -> None:
+        """Counts a downloaded file against the budget until its owner is released."""
+        size = await asyncio.to_thread(_file_size, path)
+        files = self._files.setdefault(owner, {})
+        self._used += size - files.get(path, 0)
+        files[path] = size
+        DOWNLOADS_DISK_BYTES.set(self._used)
+
+    async def release(self, owner: Hashable) -> None:
+        """Deletes every file tracked for `owner` and wakes downloads waiting for space."""
+        files = self._files.pop(owner, {})
+        if files:
+            log("🗑️ Удаляю временные файлы...", indent=4, padding_top=1, level=logging.DEBUG)
+        for file_path, size in files.items():
+            try:
+                await asyncio.to_thread(os.remove, file_path)
+                log(f"✅ Файл {file_path} удален.", indent=4, level=logging.DEBUG)
+            except FileNotFoundError:
+                log(f"⚠️ Файл {file_path} уже удалён или не найден.", indent=4, level=logging.WARNING)
+            except Exception as e:
+                log(f"❌ Ошибка удаления файла {file_path}: {e}", indent=4, level=logging.ERROR)
+            self._used -= size
+        DOWNLOADS_DISK_BYTES.set(self._used)
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def sweep(self) -> int:
+        """Removes leftover files from the download directories; returns how many were removed."""
+        paths = [path for files in self._files.values() for path in files]
+        tracked = await asyncio.to_thread(lambda: {path.resolve() for path in paths})
+        removed: list[Path] = []
+        for directory in self.directories:
+            removed += await asyncio.to_thread(
+                _sweep_directory, directory, tracked, self.config.orphan_max_age_seconds, time.time()
+            )
+        if removed:
+            ORPHANS_REMOVED.inc(len(removed))
+            log(f"🧹 Удалено оставшихся от прошлых запусков файлов: {len(removed)}", indent=1)
+        return len(removed)
+
+    async def _sweep_periodically(self) -> None:
+        while not self.shutdown_event.is_set():
+            await asyncio.sleep(self.config.sweep_interval_seconds)
+            await self.sweep()
+
+    async def _wake_on_shutdown(self) -> None:
+        await self.shutdown_event.wait()
+        async with self._changed:
+            self._changed.notify_all()
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+from ..config import DownloadTuningConfig, settings
+from ..metrics import DOWNLOAD_CONCURRENCY
+from ..printer import log
+
+# Downloads shorter than this say little about a host's throughput
+MIN_SAMPLE_SECONDS = 2.0
+# Weight of the newest download in a concurrency's throughput
+SCORE_WEIGHT = 0.5
+
+
+@dataclass(frozen=True)
+class DownloadStats:
+    """What the yt-dlp worker measured for one video."""
+
+    host: str
+    concurrency: int
+    bytes: int
+    seconds: float
+    fragments: int
+    retries: int
+
+    @property
+    def throughput(self) -> float:
+        return self.bytes / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def error_rate(self) -> float:
+        """Retries per fragment, or per download for a progressive file."""
+        return self.retries / max(self.fragments, 1)
+
+
+@dataclass
+class HostTuning:
+    """Concurrency of one CDN host: the value for the next download and the throughput of the values tried."""
+
+    concurrency: int
+    # No probing above this once the host started throttling
+    ceiling: int
+    # Bytes/s per concurrency tried; 0 when it caused too many retries
+    scores: dict[int, float] = field(default_factory=dict[int, float])
+    downloads: int = 0
+
+    @property
+    def best(self) -> int:
+        return max(sorted(self.scores), key=lambda c: self.scores[c]) if self.scores else self.concurrency
+
+
+def _read(path: Path) -> dict[str, HostTuning]:
+    try:
+        raw = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+    hosts: dict[str, HostTuning] = {}
+    for host, tuning in raw.items():
+        scores = {int(c): float(score) for c, score in tuning.pop("scores", {}).items()}
+        hosts[host] = HostTuning(**tuning, scores=scores)
+    return hosts
+
+
+def _write(path: Path, data: dict[str, HostTuning]) -> None:
+    raw = {host: asdict(tuning) for host, tuning in data.items()}
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(raw, indent=2, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(path)
+
+
+class DownloadTuner:
+    """
+    Picks the fragment concurrency (and aria2c connections) for each CDN host from the throughput and retries
+    of earlier downloads. A host starts at yt_dlp_opts' concurrent_fragment_downloads; while the best value
+    so far is the highest tried, the next download probes `step` more. Retries above `max_error_rate` per
+    fragment mean the host throttles: the value scores nothing and the host is capped `step` below it.
+    The chosen values survive restarts and are reported on stop.
+    """
+
+    def __init__(self, config: DownloadTuningConfig | None = None) -> None:
+        self._config = config
+        self._hosts: dict[str, HostTuning] = {}
+        self._path: Path | None = None
+
+    @property
+    def config(self) -> DownloadTuningConfig:
+        return self._config or settings.downloader.tuning
+
+    @property
+    def initial(self) -> int:
+        configured = int(settings.downloader.yt_dlp_opts.get("concurrent_fragment_downloads", 1))
+        return self._clamp(configured)
+
+    async def start(self) -> None:
+        self._path = self.config.state_file
+        try:
+            self._hosts = await asyncio.to_thread(_read, self._path)
+        except (OSError, ValueError, TypeError) as e:
+            log(f"⚠️ Не удалось прочитать {self._path}: {e}. Подбираю потоки заново.", indent=1)
+            self._hosts = {}
+        for host, tuning in self._hosts.items():
+            DOWNLOAD_CONCURRENCY.labels(host=host).set(self._clamp(tuning.concurrency))
+
+    async def stop(self) -> None:
+        for line in self.report():
+            log(line, indent=1)
+        await self._save()
+
+    def table(self) -> dict[str, int]:
+        """Concurrency per host for the worker; "" is used for hosts seen for the first time."""
+        return {"": self.initial, **{host: self._clamp(t.concurrency) for host, t in self._hosts.items()}}
+
+    def report(self) -> list[str]:
+        lines: list[str] = []
+        for host, t in sorted(self._hosts.items()):
+            best = t.scores.get(t.best, 0.0)
+            lines.append(
+                f"🎛️ {host}: {self._clamp(t.concurrency)} потоков, лучший результат {best / 2**20:.1f} МБ/с "
+                f"при {t.best} ({t.downloads} загрузок)"
+            )
+        return lines
+
+    async def record(self, stats: DownloadStats) -> None:
+        """Scores the concurrency the download used and picks the one for the next download from the host."""
+        if not self.config.enabled or not stats.host or stats.seconds < MIN_SAMPLE_SECONDS:
+            return
+        config = self.config
+        tuning = self._hosts.setdefault(stats.host, HostTuning(stats.concurrency, config.max_concurrency))
+        tuning.downloads += 1
+        used = stats.concurrency
+        throttled = stats.error_rate > config.max_error_rate
+        score = 0.0 if throttled else stats.throughput
+        previous = tuning.scores.get(used)
+        tuning.scores[used] = score if previous is None else previous * (1 - SCORE_WEIGHT) + score * SCORE_WEIGHT
+
+        if throttled:
+            tuning.ceiling = self._clamp(used - config.step)
+            following = min(tuning.best, tuning.ceiling) if tuning.scores[tuning.best] > 0 else tuning.ceiling
+        elif tuning.best == used and used + config.step <= min(config.max_concurrency, tuning.ceiling):
+            following = used + config.step if used + config.step not in tuning.scores else used
+        else:
+            following = tuning.best
+        following = self._clamp(following)
+
+        if following != tuning.concurrency:
+            log(
+                f"🎛️ {stats.host}: {used} → {following} потоков "
+                f"({stats.throughput / 2**20:.1f} МБ/с, повторов {stats.error_rate:.0%})",
+                indent=4,
+            )
+        tuning.concurrency = following
+        DOWNLOAD_CONCURRENCY.labels(host=stats.host).set(following)
+        await self._save()
+
+    def _clamp(self, concurrency: int) -> int:
+        return max(self.config.min_concurrency, min(self.config.max_concurrency, concurrency))
+
+    async def _save(self) -> None:
+        if self._path is None:
+            return
+        try:
+            await asyncio.to_thread(_write, self._path, self._hosts)
+        except OSError as e:
+            log(f"⚠️ Не удалось сохранить {self._path}: {e}", indent=1, level=logging.WARNING)
+
+
+def stats_from_message(message: tuple[Any, ...]) -> DownloadStats:
+    """Reads the worker's ("stats", host, concurrency, bytes, seconds, fragments, retries) message."""
+    _, host, concurrency, size, seconds, fragments, retries = message
+    return DownloadStats(str(host), int(concurrency), int(size), float(seconds), int(fragments), int(retries))
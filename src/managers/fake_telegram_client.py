@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, cast
+
+from pyrogram.errors import FloodWait
+from pyrogram.raw.functions.messages.send_media import SendMedia
+from pyrogram.raw.functions.messages.upload_media import UploadMedia
+from pyrogram.raw.functions.upload.save_big_file_part import SaveBigFilePart
+from pyrogram.raw.types.document import Document
+from pyrogram.raw.types.input_peer_channel import InputPeerChannel
+from pyrogram.raw.types.message_media_document import MessageMediaDocument
+
+from .peer_cache import CHANNEL_ID_OFFSET
+
+
+def _file_size(path: str) -> int:
+    try:
+        return Path(path).stat().st_size
+    except OSError:
+        return 0
+
+
+@dataclass
+class FakeMedia:
+    file_id: str
+
+
+@dataclass
+class FakeMessage:
+    """The subset of pyrogram.types.Message the managers read back."""
+
+    id: int
+    chat_id: int | str
+    kind: str
+    caption: str = ""
+    photo: FakeMedia | None = None
+    video: FakeMedia | None = None
+
+
+class FakeStorage:
+    """Records the peers written to the session storage."""
+
+    def __init__(self) -> None:
+        self.peers: dict[int, tuple[int, str]] = {}
+
+    async def update_peers(self, peers: list[tuple[int, int, str, str | None]]) -> None:
+        for peer_id, access_hash, peer_type, _ in peers:
+            self.peers[peer_id] = (access_hash, peer_type)
+
+
+class FakeSession:
+    """A temporary media connection: requests go to the client, which counts them per connection."""
+
+    def __init__(self, client: FakeTelegramClient) -> None:
+        self.client = client
+        self.requests = 0
+        self.stopped = False
+
+    async def invoke(self, query: Any, **kwargs: Any) -> Any:
+        self.requests += 1
+        return await self.client.invoke(query)
+
+    async def stop(self) -> None:
+        self.stopped = True
+
+
+class FakeParser:
+    """Leaves captions as plain text."""
+
+    async def parse(self, text: str, mode: Any = None) -> dict[str, Any]:
+        return {"message": text, "entities": None}
+
+
+@dataclass
+class FakeTelegramClient:
+    """
+    In-memory stand-in for a Pyrogram Client, used to test routing without Telegram.
+    Every send is recorded in `sent`; values queued in `flood_waits` are raised as
+    FloodWait on the next calls, one per call. Raw big-file uploads (upload.saveBigFilePart parts,
+    the messages.sendMedia that sends them and messages.uploadMedia that saves them) go through invoke(),
+    directly or over the media connections of get_session(), kept in `sessions`. Usernames resolve to channels,
+    counted in `resolves`; sends by channel id are recorded under the username. `bandwidth` (bytes/s)
+    simulates upload time, and `flood_every` raises a FloodWait of `flood_seconds` on every n-th upload.
+    """
+
+    name: str
+    flood_waits: list[int] = field(default_factory=list[int])
+    upload_delay: float = 0.0
+    bandwidth: float | None = None
+    flood_every: int = 0
+    flood_seconds: int = 1
+    uploads: int = 0
+    uploaded_bytes: int = 0
+    is_connected: bool = False
+    sent: list[FakeMessage] = field(default_factory=list[FakeMessage])
+    deleted: list[int] = field(default_factory=list[int])
+    resolves: int = 0
+    parser: FakeParser = field(default_factory=FakeParser)
+    storage: FakeStorage = field(default_factory=FakeStorage)
+    sessions: list[FakeSession] = field(default_factory=list[FakeSession])
+    _channels: dict[str, int] = field(default_factory=dict[str, int])
+    _ids: itertools.count[int] = field(default_factory=lambda: itertools.count(1))
+
+    async def start(self) -> None:
+        self.is_connected = True
+
+    async def stop(self) -> None:
+        self.is_connected = False
+
+    async def _transfer(self, path: str, progress: Callable[[int, int], None] | None) -> None:
+        size = await asyncio.to_thread(_file_size, path)
+        await self._transfer_bytes(size)
+        if progress:
+            progress(size, size)
+
+    async def _transfer_bytes(self, size: int) -> None:
+        if self.flood_waits:
+            raise FloodWait(value=self.flood_waits.pop(0))
+        self.uploads += 1
+        if self.flood_every and self.uploads % self.flood_every == 0:
+            raise FloodWait(value=self.flood_seconds)
+        delay = self.upload_delay + (size / self.bandwidth if self.bandwidth else 0.0)
+        if delay:
+            await asyncio.sleep(delay)
+        self.uploaded_bytes += size
+
+    def _record(self, chat_id: int | str, kind: str, caption: str) -> FakeMessage:
+        chat_id = next((name for name, id_ in self._channels.items() if CHANNEL_ID_OFFSET - id_ == chat_id), chat_id)
+        message_id = next(self._ids)
+        media = FakeMedia(file_id=f"{self.name}:{kind}:{message_id}")
+        message = FakeMessage(
+            id=message_id,
+            chat_id=chat_id,
+            kind=kind,
+            caption=caption,
+            photo=media if kind == "photo" else None,
+            video=media if kind == "video" else None,
+        )
+        self.sent.append(message)
+        return message
+
+    async def send_photo(
+        self,
+        chat_id: int | str,
+        photo: str,
+        caption: str = "",
+        progress: Callable[[int, int], None] | None = None,
+        **kwargs: Any,
+    ) -> FakeMessage:
+        await self._transfer(photo, progress)
+        return self._record(chat_id, "photo", caption)
+
+    async def send_video(
+        self,
+        chat_id: int | str,
+        video: str,
+        caption: str = "",
+        progress: Callable[[int, int], None] | None = None,
+        **kwargs: Any,
+    ) -> FakeMessage:
+        await self._transfer(video, progress)
+        return self._record(chat_id, "video", caption)
+
+    async def send_media_group(self, chat_id: int | str, media: list[Any], **kwargs: Any) -> list[FakeMessage]:
+        if self.flood_waits:
+            raise FloodWait(value=self.flood_waits.pop(0))
+        return [self._record(chat_id, "album", "") for _ in media]
+
+    def rnd_id(self) -> int:
+        return next(self._ids)
+
+    async def resolve_peer(self, peer_id: int | str) -> Any:
+        if isinstance(peer_id, str) and peer_id.startswith("@"):
+            self.resolves += 1
+            channel_id = self._channels.setdefault(peer_id, len(self._channels) + 1)
+            return InputPeerChannel(channel_id=channel_id, access_hash=channel_id)
+        return peer_id
+
+    async def save_file(self, path: str, **kwargs: Any) -> str:
+        await self._transfer(path, None)
+        return path
+
+    async def get_session(self, **kwargs: Any) -> FakeSession:
+        self.sessions.append(FakeSession(self))
+        return self.sessions[-1]
+
+    async def invoke(self, query: Any, **kwargs: Any) -> Any:
+        if isinstance(query, SaveBigFilePart):
+            await self._transfer_bytes(len(query.bytes))
+            return True
+        if isinstance(query, SendMedia):
+            if self.flood_waits:
+                raise FloodWait(value=self.flood_waits.pop(0))
+            return self._record(cast(int | str, query.peer), "video", query.message)
+        if isinstance(query, UploadMedia):
+            document_id = next(self._ids)
+            document = Document(
+                id=document_id,
+                access_hash=document_id,
+                file_reference=b"",
+                date=0,
+                mime_type=cast(Any, query.media).mime_type,
+                size=0,
+                dc_id=2,
+                attributes=[],
+            )
+            return MessageMediaDocument(document=document)
+        raise NotImplementedError(type(query).__name__)
+
+    async def delete_messages(self, chat_id: int | str, message_ids: list[int], **kwargs: Any) -> int:
+        self.deleted.extend(message_ids)
+        return len(message_ids)
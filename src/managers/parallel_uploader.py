@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import math
+import mmap
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import Any, cast
+
+from ..config import ParallelUploadConfig, settings
+from ..printer import log
+
+# Pyrogram's part size for big files, the largest Telegram accepts
+UPLOAD_PART_SIZE = 512 * 1024
+
+
+def _map(path: Path) -> mmap.mmap:
+    # The mapping stays valid once the file is closed
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _fault_in(part: memoryview) -> None:
+    """Reads one byte per page, so that the event loop does not wait for the disk when it sends the part."""
+    part[:: mmap.PAGESIZE].tobytes()
+
+
+def _file_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+
+class ParallelUploader:
+    """
+    Saves a big file to Telegram with upload.saveBigFilePart over several temporary media connections
+    of the client, `workers` parts in flight at once. Parts are slices of a memory-mapped file, so they
+    are not read into Python buffers before the request is serialized. A part is retried on its own
+    (after the FloodWait if there is one); the upload fails once a part runs out of retries.
+    The returned InputFileBig is sent with messages.sendMedia or saved with messages.uploadMedia.
+    """
+
+    def __init__(
+        self,
+        config: ParallelUploadConfig | None = None,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ) -> None:
+        self._config = config
+        self._sleep = sleep
+
+    @property
+    def config(self) -> ParallelUploadConfig:
+        return self._config or settings.parallel_upload
+
+    async def applies(self, path: Path) -> bool:
+        """Whether the file is big enough to be uploaded in parallel."""
+        if not self.config.enabled:
+            return False
+        return await asyncio.to_thread(_file_size, path) >= self.config.min_size_mb * 2**20
+
+    async def upload(self, client: Any, path: Path, progress: Callable[[int, int], None]) -> Any:
+        from pyrogram.raw.functions.upload.save_big_file_part import SaveBigFilePart
+        from pyrogram.raw.types.input_file_big import InputFileBig
+
+        config = self.config
+        file_id = client.rnd_id()
+        mapped = await asyncio.to_thread(_map, path)
+        size = len(mapped)
+        total_parts = math.ceil(size / UPLOAD_PART_SIZE)
+        parts = iter(range(total_parts))
+        uploaded = 0
+        sessions: list[Any] = []
+
+        async def worker(session: Any, view: memoryview) -> None:
+            nonlocal uploaded
+            for part in parts:
+                data = view[part * UPLOAD_PART_SIZE : (part + 1) * UPLOAD_PART_SIZE]
+                try:
+                    await asyncio.to_thread(_fault_in, data)
+                    # TL serialization concatenates the part, which takes any buffer
+                    part_bytes = cast(bytes, data)
+                    rpc = SaveBigFilePart(
+                        file_id=file_id, file_part=part, file_total_parts=total_parts, bytes=part_bytes
+                    )
+                    await self._save_part(session, rpc, part, total_parts)
+                    uploaded += len(data)
+                finally:
+                    data.release()
+                progress(uploaded, size)
+
+        try:
+            for _ in range(config.connections):
+                sessions.append(await client.get_session(is_media=True, temporary=True))
+            log(
+                f"📤 Загружаю {path.name} частями: {len(sessions)} соединений, {config.workers} частей одновременно.",
+                indent=4,
+                level=logging.DEBUG,
+            )
+            with memoryview(mapped) as view:
+                workers = [
+                    asyncio.create_task(worker(sessions[i % len(sessions)], view)) for i in range(config.workers)
+                ]
+                try:
+                    await asyncio.gather(*workers)
+                finally:
+                    for task in workers:
+                        task.cancel()
+                    await asyncio.gather(*workers, return_exceptions=True)
+        finally:
+            await asyncio.gather(*(session.stop() for session in sessions), return_exceptions=True)
+            # A part still read by a cancelled thread keeps the mapping open until it is collected
+            with contextlib.suppress(BufferError):
+                mapped.close()
+        return InputFileBig(id=file_id, parts=total_parts, name=path.name)
+
+    async def _save_part(self, session: Any, rpc: Any, part: int, total_parts: int) -> None:
+        from pyrogram.errors import FloodWait
+
+        retries = self.config.part_retries
+        for attempt in range(retries + 1):
+            try:
+                await session.invoke(rpc)
+                return
+            except FloodWait as e:
+                if attempt == retries:
+                    raise
+                delay = float(e.value) if isinstance(e.value, int) else 5.0
+                error: Exception = e
+            except Exception as e:
+                if attempt == retries:
+                    raise
+                delay = float(min(2**attempt, 10))
+                error = e
+            log(
+                f"🔁 Часть {part + 1}/{total_parts}: {error}. Повтор через {delay:.0f} с.",
+                indent=5,
+                level=logging.DEBUG,
+            )
+            await self._sleep(delay)
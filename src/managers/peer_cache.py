@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from ..config import PeerCacheConfig, settings
+from ..metrics import PEER_RESOLVES
+from ..printer import log
+from .telegram_pool import PooledClient
+
+# Channels are stored in Pyrogram's session under Bot API style ids: -100 followed by the channel id
+CHANNEL_ID_OFFSET = -1_000_000_000_000
+
+
+@dataclass(frozen=True)
+class CachedPeer:
+    """A channel as seen by one session: access hashes differ between accounts."""
+
+    id: int
+    access_hash: int
+    # Peer type in Pyrogram's session storage
+    type: str
+
+
+def _cached_peer(peer: Any) -> CachedPeer | None:
+    from pyrogram.raw.types.input_peer_channel import InputPeerChannel
+    from pyrogram.raw.types.input_peer_chat import InputPeerChat
+    from pyrogram.raw.types.input_peer_user import InputPeerUser
+
+    if isinstance(peer, InputPeerChannel):
+        return CachedPeer(CHANNEL_ID_OFFSET - peer.channel_id, peer.access_hash, "channel")
+    if isinstance(peer, InputPeerChat):
+        return CachedPeer(-peer.chat_id, 0, "group")
+    if isinstance(peer, InputPeerUser):
+        return CachedPeer(peer.user_id, peer.access_hash, "user")
+    return None
+
+
+def _read(path: Path) -> dict[str, dict[str, CachedPeer]]:
+    try:
+        raw = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+    return {session: {channel: CachedPeer(**p) for channel, p in peers.items()} for session, peers in raw.items()}
+
+
+def _write(path: Path, data: dict[str, dict[str, CachedPeer]]) -> None:
+    raw = {session: {channel: asdict(p) for channel, p in peers.items()} for session, peers in data.items()}
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(raw, indent=2, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(path)
+
+
+class PeerCache:
+    """
+    Channel usernames resolved to peers per session, kept in a file across restarts. Sends address channels
+    by id, which Pyrogram looks up in its session storage, so they never call contacts.resolveUsername,
+    one of the most flood-limited methods. Configured channels are resolved at startup, a few at a time
+    with a pause between the calls of each session; a channel added by a reload is resolved on its first send.
+    An entry is dropped when Telegram rejects the peer (PeerIdInvalid, ChannelPrivate) and resolved again.
+    """
+
+    def __init__(
+        self,
+        config: PeerCacheConfig | None = None,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._config = config
+        self._sleep = sleep
+        self._clock = clock
+        self._peers: dict[str, dict[str, CachedPeer]] = {}
+        self._path: Path | None = None
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._next_call: dict[str, float] = {}
+
+    @property
+    def config(self) -> PeerCacheConfig:
+        return self._config or settings.peer_cache
+
+    async def start(self, clients: list[PooledClient], channels: Iterable[str]) -> None:
+        """Loads the cache into the sessions' storage and resolves the channels it does not have yet."""
+        from pyrogram.errors import FloodWait
+
+        self._path = self.config.state_file
+        try:
+            self._peers = await asyncio.to_thread(_read, self._path)
+        except (OSError, ValueError, TypeError) as e:
+            log(f"⚠️ Не удалось прочитать {self._path}: {e}. Каналы будут найдены заново.", indent=1)
+            self._peers = {}
+        for pc in clients:
+            await self._seed(pc, self._peers.get(pc.name, {}).values())
+
+        usernames = sorted({ch for ch in channels if ch.startswith("@")})
+        missing = [(pc, ch) for pc in clients for ch in usernames if pc.can_serve(ch) and not self._get(pc, ch)]
+        if missing:
+            log(f"🔎 Ищу {len(missing)} каналов в Telegram...", indent=1)
+        slots = asyncio.Semaphore(self.config.concurrency)
+        flooded: set[str] = set()
+
+        async def resolve(pc: PooledClient, channel: str) -> None:
+            async with slots:
+                if pc.name in flooded:
+                    return
+                try:
+                    await self._resolve(pc, channel)
+                except FloodWait as e:
+                    # The rest of this session's channels are resolved on their first send
+                    flooded.add(pc.name)
+                    log(f"⏳ FloodWait {e.value} с при поиске каналов ({pc.name}).", indent=1, level=logging.WARNING)
+                except Exception as e:
+                    log(f"⚠️ Не удалось найти канал {channel} ({pc.name}): {e}", indent=1, level=logging.WARNING)
+
+        await asyncio.gather(*(resolve(pc, ch) for pc, ch in missing))
+        await self._save()
+
+    async def chat_id(self, pc: PooledClient, channel: int | str) -> int | str:
+        """The id to send to the channel with: cached for usernames, resolved once if it is not cached yet."""
+        if not isinstance(channel, str) or not channel.startswith("@"):
+            return channel
+        peer = self._get(pc, channel)
+        if peer is None:
+            peer = await self._resolve(pc, channel)
+            if peer is None:
+                return channel
+            await self._save()
+        return peer.id
+
+    async def invalidate(self, pc: PooledClient, channel: int | str) -> None:
+        """Forgets a peer Telegram rejected; the next send resolves the username again."""
+        if self._peers.get(pc.name, {}).pop(str(channel), None) is not None:
+            log(f"🗑️ Канал {channel} удалён из кэша ({pc.name}).", indent=4, level=logging.DEBUG)
+            await self._save()
+
+    def _get(self, pc: PooledClient, channel: str) -> CachedPeer | None:
+        return self._peers.get(pc.name, {}).get(channel)
+
+    async def _resolve(self, pc: PooledClient, channel: str) -> CachedPeer | None:
+        async with self._locks.setdefault(pc.name, asyncio.Lock()):
+            # Resolved by another caller while this one waited
+            if cached := self._get(pc, channel):
+                return cached
+            wait = self._next_call.get(pc.name, 0.0) - self._clock()
+            if wait > 0:
+                await self._sleep(wait)
+            try:
+                PEER_RESOLVES.labels(session=pc.name).inc()
+                peer = _cached_peer(await pc.client.resolve_peer(channel))
+            finally:
+                self._next_call[pc.name] = self._clock() + self.config.interval_seconds
+        if peer is None:
+            return None
+        self._peers.setdefault(pc.name, {})[channel] = peer
+        await self._seed(pc, [peer])
+        log(f"🔎 Канал {channel} найден ({pc.name}): {peer.id}", indent=1, level=logging.DEBUG)
+        return peer
+
+    @staticmethod
+    async def _seed(pc: PooledClient, peers: Iterable[CachedPeer]) -> None:
+        # Sessions created after the peer was cached do not know it by id yet
+        rows = [(p.id, p.access_hash, p.type, None) for p in peers]
+        if rows:
+            await pc.client.storage.update_peers(rows)
+
+    async def _save(self) -> None:
+        if self._path is None:
+            return
+        try:
+            await asyncio.to_thread(_write, self._path, self._peers)
+        except OSError as e:
+            log(f"⚠️ Не удалось сохранить {self._path}: {e}", indent=1, level=logging.WARNING)
@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from urllib.parse import urlparse
+
+import anyio
+import httpx
+
+from ..cancellation import sleep_or_shutdown
+from ..config import RangeDownloadConfig, settings
+from ..printer import log
+from ..transfer_watchdog import Transfer
+from .download_tuner import DownloadStats
+
+# Bytes read from the response between two writes
+READ_CHUNK_SIZE = 256 * 1024
+CONTENT_RANGE = re.compile(r"bytes \d+-\d+/(\d+)")
+
+
+class RangeDownloadError(RuntimeError):
+    """The server does not serve the requested range, or a segment failed on every retry."""
+
+
+@dataclass(frozen=True)
+class DirectSource:
+    """A progressive file yt-dlp resolved a video to, with the headers (cookies included) to fetch it with."""
+
+    url: str
+    headers: dict[str, str]
+    path: Path
+    # Announced by the extractor; 0 when unknown
+    size: int = 0
+
+    @property
+    def host(self) -> str:
+        return urlparse(self.url).hostname or ""
+
+    @property
+    def partial(self) -> Path:
+        return self.path.with_name(self.path.name + ".part")
+
+    @property
+    def progress_file(self) -> Path:
+        """Finished segments of the partial file, for the next attempt to resume from."""
+        return self.path.with_name(self.path.name + ".part.ranges")
+
+
+@dataclass
+class _Job:
+    source: DirectSource
+    size: int
+    segment_size: int
+    transfer: Transfer
+    done: set[int] = field(default_factory=set[int])
+    downloaded: int = 0
+    retries: int = 0
+    saving: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    @property
+    def segments(self) -> int:
+        return -(-self.size // self.segment_size)
+
+    def bounds(self, index: int) -> tuple[int, int]:
+        start = index * self.segment_size
+        return start, min(start + self.segment_size, self.size) - 1
+
+    def advance(self, count: int) -> None:
+        self.downloaded += count
+        self.transfer.progress(self.downloaded, self.size)
+
+
+def _read_progress(source: DirectSource, size: int, segment_size: int) -> set[int]:
+    if not source.partial.exists():
+        return set()
+    try:
+        raw = json.loads(source.progress_file.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return set()
+    if raw.get("size") != size or raw.get("segment_size") != segment_size:
+        return set()
+    return {int(i) for i in raw.get("done", [])}
+
+
+def _write_progress(source: DirectSource, raw: dict[str, int | list[int]]) -> None:
+    tmp = source.progress_file.with_name(source.progress_file.name + ".tmp")
+    tmp.write_text(json.dumps(raw), encoding="utf-8")
+    tmp.replace(source.progress_file)
+
+
+def _preallocate(path: Path, size: int) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "r+b" if path.exists() else "wb") as f:
+        f.truncate(size)
+
+
+def _complete(source: DirectSource) -> None:
+    source.partial.replace(source.path)
+    source.progress_file.unlink(missing_ok=True)
+
+
+def _discard(source: DirectSource) -> None:
+    source.partial.unlink(missing_ok=True)
+    source.progress_file.unlink(missing_ok=True)
+
+
+class RangeDownloader:
+    """
+    Fetches the direct files yt-dlp resolved videos to, with parallel HTTP range requests over one pooled
+    client instead of yt-dlp's downloader. The file is preallocated at its full size and split into
+    segments fetched by `connections` workers; a segment is retried from the byte where it stopped, and
+    finished segments are listed next to the file, so the next attempt of the same video resumes instead
+    of starting over. A server that does not answer range requests gets a single plain request.
+    """
+
+    def __init__(
+        self,
+        shutdown_event: asyncio.Event,
+        config: RangeDownloadConfig | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self.shutdown_event = shutdown_event
+        self._config = config
+        self.transport = transport
+        self.client: httpx.AsyncClient | None = None
+
+    @property
+    def config(self) -> RangeDownloadConfig:
+        return self._config or settings.downloader.range_download
+
+    async def start(self) -> None:
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=32),
+            transport=self.transport,
+        )
+
+    async def stop(self) -> None:
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+
+    async def download(self, source: DirectSource, connections: int, transfer: Transfer) -> DownloadStats:
+        """Downloads the file to `source.path`; the stats cover the bytes fetched by this call."""
+        size = await self._probe(source)
+        started = time.monotonic()
+        if not size:
+            job = _Job(source, source.size, max(source.size, 1), transfer)
+            await self._fetch_whole(job)
+            return DownloadStats(source.host, 1, job.downloaded, time.monotonic() - started, 1, job.retries)
+
+        segment_size = self.config.segment_size_mb * 2**20
+        job = _Job(source, size, segment_size, transfer)
+        job.done = await asyncio.to_thread(_read_progress, source, size, segment_size)
+        await asyncio.to_thread(_preallocate, source.partial, size)
+        if job.done:
+            log(f"⏯️ Продолжаю загрузку: готово {len(job.done)}/{job.segments} частей.", indent=4)
+        resumed = sum(end - start + 1 for start, end in map(job.bounds, job.done))
+        job.advance(resumed)
+
+        pending = [i for i in range(job.segments) if i not in job.done]
+        workers = [asyncio.create_task(self._worker(job, pending)) for _ in range(min(connections, len(pending)))]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        await asyncio.to_thread(_complete, source)
+        seconds = time.monotonic() - started
+        return DownloadStats(source.host, connections, size - resumed, seconds, len(pending), job.retries)
+
+    async def discard(self, source: DirectSource) -> None:
+        """Removes the partial file of a video that is given up on."""
+        try:
+            await asyncio.to_thread(_discard, source)
+        except OSError as e:
+            log(f"⚠️ Не удалось удалить {source.partial}: {e}", indent=4, level=logging.WARNING)
+
+    async def _probe(self, source: DirectSource) -> int:
+        """The size of the file if the server serves ranges of it, otherwise 0."""
+        assert self.client is not None
+        headers = {**source.headers, "Range": "bytes=0-0"}
+        async with self.client.stream("GET", source.url, headers=headers) as response:
+            response.raise_for_status()
+            match = CONTENT_RANGE.fullmatch(response.headers.get("Content-Range", ""))
+            if response.status_code != 206 or not match:
+                return 0
+            return int(match.group(1))
+
+    async def _worker(self, job: _Job, pending: list[int]) -> None:
+        while pending:
+            index = pending.pop(0)
+            await self._fetch_segment(job, index)
+            job.done.add(index)
+            raw = {"size": job.size, "segment_size": job.segment_size, "done": sorted(job.done)}
+            try:
+                async with job.saving:
+                    await asyncio.to_thread(_write_progress, job.source, raw)
+            except OSError as e:
+                log(f"⚠️ Не удалось сохранить {job.source.progress_file}: {e}", indent=4, level=logging.WARNING)
+
+    async def _fetch_segment(self, job: _Job, index: int) -> None:
+        assert self.client is not None
+        position, end = job.bounds(index)
+        retries = self.config.segment_retries
+        for attempt in range(retries + 1):
+            headers = {**job.source.headers, "Range": f"bytes={position}-{end}"}
+            try:
+                async with self.client.stream("GET", job.source.url, headers=headers) as response:
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        raise RangeDownloadError(f"сервер вернул {response.status_code} вместо части файла")
+                    async with await anyio.open_file(job.source.partial, "r+b") as f:
+                        await f.seek(position)
+                        async for chunk in response.aiter_bytes(READ_CHUNK_SIZE):
+                            chunk = chunk[: end + 1 - position]
+                            await f.write(chunk)
+                            position += len(chunk)
+                            job.advance(len(chunk))
+                            if position > end:
+                                return
+                raise RangeDownloadError(f"соединение закрыто на байте {position}")
+            except httpx.HTTPStatusError as e:
+                # An expired link or lost access is not fixed by retrying the segment
+                if e.response.status_code < 500 and e.response.status_code != 429:
+                    raise
+                error: Exception = e
+            except (httpx.TransportError, RangeDownloadError) as e:
+                error = e
+            if attempt == retries:
+                raise RangeDownloadError(f"часть {index + 1}/{job.segments} не скачана: {error}") from error
+            job.retries += 1
+            log(
+                f"🔁 Часть {index + 1}/{job.segments}: {error}. Повтор с байта {position}.",
+                indent=5,
+                level=logging.DEBUG,
+            )
+            await sleep_or_shutdown(min(2**attempt, 30), self.shutdown_event)
+
+    async def _fetch_whole(self, job: _Job) -> None:
+        assert self.client is not None
+        source = job.source
+        async with self.client.stream("GET", source.url, headers=source.headers) as response:
+            response.raise_for_status()
+            job.size = int(response.headers.get("Content-Length") or job.size)
+            await asyncio.to_thread(_preallocate, source.partial, 0)
+            async with await anyio.open_file(source.partial, "wb") as f:
+                async for chunk in response.aiter_bytes(READ_CHUNK_SIZE):
+                    await f.write(chunk)
+                    job.advance(len(chunk))
+        await asyncio.to_thread(_complete, source)
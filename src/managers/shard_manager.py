@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import logging
+import time
+
+from ..config import BindingConfig, settings
+from ..lease_store import Lease, LeaseStore
+from ..metrics import LEASES_HELD, TAKEOVER_SKIPPED_POSTS
+from ..printer import log
+from .binding_manager import BindingManager
+
+
+class LeaseLostError(RuntimeError):
+    """Raised when another instance has taken over a binding this instance was processing."""
+
+
+def _domain_hash(domain: str) -> int:
+    # crc32 keeps the low bits of similar names (group1, group2, ...) correlated; blake2b spreads them evenly
+    return int.from_bytes(hashlib.blake2b(domain.encode(), digest_size=8).digest(), "big")
+
+
+def owner_for(binding: BindingConfig, instances: list[str], alive: set[str]) -> str:
+    """
+    The instance that should serve a binding: its explicit `instance`, or one picked by a stable hash
+    of the domain. While that instance is down, the binding is rehashed over the instances that are alive.
+    """
+    domain_hash = _domain_hash(binding.vk.domain)
+    preferred = binding.instance or instances[domain_hash % len(instances)]
+    if preferred in alive:
+        return preferred
+    candidates = sorted(i for i in instances if i in alive)
+    if not candidates:
+        return preferred
+    return candidates[domain_hash % len(candidates)]
+
+
+class ShardManager:
+    """
+    Decides which bindings this instance serves and keeps their position.
+    Without sharding every binding is served and the position lives in state.yaml, or in the binding store.
+    With sharding the bindings are split between instances, each one guarded by a lease in a shared SQLite store;
+    positions move to that store, and every post is marked in flight before it is sent so that an instance taking
+    over a binding never sends it again.
+    """
+
+    def __init__(
+        self, shutdown_event: asyncio.Event, store: LeaseStore | None = None, bindings: BindingManager | None = None
+    ) -> None:
+        self.shutdown_event = shutdown_event
+        self.store = store
+        self.bindings = bindings or BindingManager()
+        self.instance_id = settings.instance_id or ""
+        self._leases: dict[str, Lease] = {}
+        self._alive: set[str] = set()
+        self._task: asyncio.Task[None] | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return settings.sharding.enabled
+
+    async def start(self) -> None:
+        if not self.enabled:
+            return
+        if self.store is None:
+            self.store = await asyncio.to_thread(LeaseStore, settings.sharding.store_path)
+        await self._heartbeat()
+        self._task = asyncio.create_task(self._keep_alive())
+        log(f"🚀 Шардирование включено: инстанс {self.instance_id}", indent=1)
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        if self.store is None:
+            return
+        for domain in list(self._leases):
+            await self._release(domain)
+        await asyncio.to_thread(self.store.retire, self.instance_id)
+        await asyncio.to_thread(self.store.close)
+        self.store = None
+        log("🛑 Шардирование остановлено, аренды освобождены", indent=1)
+
+    async def acquire(self, binding: BindingConfig) -> bool:
+        """Whether this instance should poll the binding now; takes or renews its lease."""
+        if self.store is None:
+            return True
+        domain = binding.vk.domain
+        ttl = settings.sharding.lease_seconds
+        if owner_for(binding, settings.sharding.instances, self._alive | {self.instance_id}) != self.instance_id:
+            # The preferred instance is back: hand the binding over between polls
+            if domain in self._leases:
+                log(f"↩️ Передаю {domain} инстансу-владельцу.", indent=1)
+                await self._release(domain)
+            return False
+
+        lease = await asyncio.to_thread(self.store.acquire, domain, self.instance_id, time.time(), ttl)
+        if lease is None:
+            log(f"⏳ {domain} ещё удерживается другим инстансом.", indent=1, level=logging.DEBUG)
+            self._leases.pop(domain, None)
+            return False
+        if domain not in self._leases:
+            log(f"🔒 Получена аренда {domain} (token {lease.token}).", indent=1)
+        if lease.skipped_post_id is not None:
+            TAKEOVER_SKIPPED_POSTS.labels(domain=domain).inc()
+            log(
+                f"⚠️ Пост {lease.skipped_post_id} из {domain} отправлялся прежним инстансом и мог быть доставлен. "
+                "Пропускаю, чтобы не отправить дважды.",
+                indent=1,
+                level=logging.WARNING,
+            )
+        self._leases[domain] = lease
+        LEASES_HELD.set(len(self._leases))
+        return True
+
+    async def last_post_id(self, domain: str) -> int:
+        if self.store is None:
+            return await self.bindings.last_post_id(domain)
+        post_id = await asyncio.to_thread(self.store.last_post_id, domain)
+        if post_id is None:
+            # First run with sharding: continue from state.yaml (or the binding store)
+            post_id = await self.bindings.last_post_id(domain)
+            await asyncio.to_thread(self.store.seed_last_post_id, domain, post_id)
+        return post_id
+
+    async def begin_post(self, domain: str, post_id: int) -> None:
+        """Marks the post as in flight. Raises LeaseLostError when the binding is no longer ours."""
+        if self.store is None:
+            return
+        lease = self._leases.get(domain)
+        if lease is None or not await asyncio.to_thread(
+            self.store.begin_post, lease, self.instance_id, post_id, time.time()
+        ):
+            self._lost(domain)
+
+    async def commit_post(self, domain: str, post_id: int) -> None:
+        """Advances the binding past a delivered post."""
+        if self.store is None:
+            await self.bindings.set_last_post_id(domain, post_id)
+            return
+        lease = self._leases.get(domain)
+        if lease is None or not await asyncio.to_thread(self.store.commit_post, lease, self.instance_id, post_id):
+            self._lost(domain)
+
+    async def abort_post(self, domain: str) -> None:
+        """The post was interrupted before delivery: let whoever holds the binding next retry it."""
+        lease = self._leases.get(domain)
+        if self.store is not None and lease is not None:
+            await asyncio.to_thread(self.store.abort_post, lease, self.instance_id)
+
+    def _lost(self, domain: str) -> None:
+        self._leases.pop(domain, None)
+        LEASES_HELD.set(len(self._leases))
+        raise LeaseLostError(f"Аренда {domain} перешла к другому инстансу")
+
+    async def _release(self, domain: str) -> None:
+        lease = self._leases.pop(domain, None)
+        if lease and self.store:
+            await asyncio.to_thread(self.store.release, lease, self.instance_id)
+        LEASES_HELD.set(len(self._leases))
+
+    async def _heartbeat(self) -> None:
+        assert self.store is not None
+        now = time.time()
+        ttl = settings.sharding.lease_seconds
+        await asyncio.to_thread(self.store.heartbeat, self.instance_id, now)
+        self._alive = await asyncio.to_thread(self.store.alive_instances, now, ttl)
+        for domain, lease in list(self._leases.items()):
+            if not await asyncio.to_thread(self.store.renew, lease, self.instance_id, now, ttl):
+                log(f"⚠️ Аренда {domain} потеряна.", indent=1, level=logging.WARNING)
+                self._leases.pop(domain, None)
+        LEASES_HELD.set(len(self._leases))
+
+    async def _keep_alive(self) -> None:
+        # Renew well before expiry so a long upload never lets the lease lapse
+        while not self.shutdown_event.is_set():
+            await asyncio.sleep(settings.sharding.lease_seconds / 3)
+            try:
+                await self._heartbeat()
+            except Exception as e:
+                log(f"❌ Не удалось продлить аренды: {e}", indent=1, level=logging.ERROR)
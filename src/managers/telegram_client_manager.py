@@ -1,33 +1,161 @@
+from __future__ import annotations
+
 import asyncio
-from collections.abc import Callable
+import contextlib
+import logging
+import math
+import mimetypes
+import time
+from collections.abc import Awaitable, Callable, Mapping
 from pathlib import Path
-from typing import Any
-
-from moviepy import VideoFileClip  # type: ignore
-from pyrogram.client import Client
-from pyrogram.errors import ChannelPrivate, FloodWait, PeerIdInvalid, RPCError
-from pyrogram.types import InputMedia, InputMediaPhoto, InputMediaVideo, Message
-from tqdm import tqdm
+from typing import TYPE_CHECKING, Any
 
-from ..config import settings
+from ..cancellation import shutdown_sleeper, sleep_or_shutdown
+from ..config import TelegramSessionConfig, settings
+from ..dto import VideoMeta
+from ..growing_file import GrowingFile
+from ..metrics import FLOODWAIT_SECONDS, UPLOAD_BYTES, UPLOAD_DURATION, UPLOAD_ERRORS
 from ..printer import log
+from ..transfer_watchdog import Transfer, TransferWatchdog
+from .parallel_uploader import UPLOAD_PART_SIZE, ParallelUploader
+from .peer_cache import PeerCache
+from .telegram_pool import ClientPool, PooledClient
+
+# pyrogram, moviepy and tqdm take most of the startup time, so they are imported on first use
+if TYPE_CHECKING:
+    from pyrogram.client import Client
+    from pyrogram.errors import FloodWait
+    from pyrogram.types import InputMedia, Message
+    from tqdm import tqdm
+
+ClientFactory = Callable[[TelegramSessionConfig], Any]
+
+# Number of parts in flight for big files, like Pyrogram's save_file
+UPLOAD_PARALLEL_PARTS = 4
+
+
+def _probe_video(file_path: Path) -> dict[str, Any]:
+    from moviepy import VideoFileClip  # type: ignore
+
+    with VideoFileClip(str(file_path)) as clip:
+        return {
+            "width": int(clip.w),  # type: ignore[attr-defined]
+            "height": int(clip.h),  # type: ignore[attr-defined]
+        }
+
+
+async def _video_attributes(file_path: Path, meta: VideoMeta | None) -> dict[str, Any]:
+    """send_video arguments from post-processing metadata, or probed from the file when there is none."""
+    if meta is None:
+        return await asyncio.to_thread(_probe_video, file_path)
+    return {
+        "width": meta.width,
+        "height": meta.height,
+        "duration": meta.duration,
+        "thumb": str(meta.thumb) if meta.thumb else None,
+        "supports_streaming": meta.supports_streaming,
+    }
+
+
+async def _uploaded_video_media(client: Any, uploaded: Any, path: Path, attributes: dict[str, Any]) -> Any:
+    """The video document of a file already saved with upload.saveBigFilePart."""
+    from pyrogram.raw.types.document_attribute_filename import DocumentAttributeFilename
+    from pyrogram.raw.types.document_attribute_video import DocumentAttributeVideo
+    from pyrogram.raw.types.input_media_uploaded_document import InputMediaUploadedDocument
+
+    thumb = attributes.get("thumb")
+    return InputMediaUploadedDocument(
+        mime_type=mimetypes.guess_type(path.name)[0] or "video/mp4",
+        file=uploaded,
+        thumb=await client.save_file(thumb) if thumb else None,
+        attributes=[
+            DocumentAttributeVideo(
+                supports_streaming=attributes.get("supports_streaming", True) or None,
+                duration=attributes.get("duration", 0),
+                w=attributes.get("width", 0),
+                h=attributes.get("height", 0),
+            ),
+            DocumentAttributeFilename(file_name=path.name),
+        ],
+    )
+
+
+async def _send_uploaded_video(
+    client: Any, channel: int | str, uploaded: Any, path: Path, caption: str, attributes: dict[str, Any]
+) -> None:
+    """send_video for a file already saved with upload.saveBigFilePart."""
+    from pyrogram.raw.functions.messages.send_media import SendMedia
+
+    media = await _uploaded_video_media(client, uploaded, path, attributes)
+    message, entities = (await client.parser.parse(caption, None)).values()
+    await client.invoke(
+        SendMedia(
+            peer=await client.resolve_peer(channel),
+            media=media,
+            random_id=client.rnd_id(),
+            message=message,
+            entities=entities,
+        )
+    )
+
+
+async def _save_uploaded_video(client: Any, uploaded: Any, path: Path, attributes: dict[str, Any]) -> str:
+    """
+    Turns a file saved with upload.saveBigFilePart into a video with a file id, without sending a message,
+    for send_media_group.
+    """
+    from pyrogram.file_id import FileId, FileType
+    from pyrogram.raw.functions.messages.upload_media import UploadMedia
+    from pyrogram.raw.types.input_peer_self import InputPeerSelf
+
+    media = await _uploaded_video_media(client, uploaded, path, attributes)
+    document = (await client.invoke(UploadMedia(peer=InputPeerSelf(), media=media))).document
+    return FileId(
+        file_type=FileType.VIDEO,
+        dc_id=document.dc_id,
+        media_id=document.id,
+        access_hash=document.access_hash,
+        file_reference=document.file_reference,
+    ).encode()
+
+
+def _create_client(session: TelegramSessionConfig) -> Client:
+    from pyrogram.client import Client
+
+    return Client(
+        session.session_name,
+        api_id=settings.telegram_api_id,
+        api_hash=settings.telegram_api_hash,
+    )
 
 
 class TelegramClientManager:
-    """Manages Kurigram client and handles sending media to Telegram channels."""
+    """Manages a pool of Kurigram clients and handles sending media to Telegram channels."""
 
-    def __init__(self, shutdown_event: asyncio.Event) -> None:
-        """Initialize the manager with a shutdown event."""
+    def __init__(self, shutdown_event: asyncio.Event, client_factory: ClientFactory = _create_client) -> None:
+        """Initialize the manager with a shutdown event and a factory for session clients."""
         self.shutdown_event = shutdown_event
-        self.app: Client | None = None
+        self.client_factory = client_factory
+        self.pool: ClientPool | None = None
         self.pbar: tqdm[Any] | None = None
+        self.watchdog = TransferWatchdog()
+        self.peers = PeerCache()
+        self.uploader = ParallelUploader(sleep=shutdown_sleeper(self.shutdown_event))
+
+    def _create_progress_callback(self, indent: int, transfer: Transfer) -> Callable[[int, int], None]:
+        # A bar left over from an upload the watchdog aborted
+        if self.pbar is not None:
+            self.pbar.close()
+            self.pbar = None
 
-    def _create_progress_callback(self, indent: int) -> Callable[[int, int], None]:
         def _progress_hook(current: int, total: int) -> None:
+            transfer.progress(current, total)
             current_mb = current / (1024 * 1024)
             total_mb = total / (1024 * 1024) if total else 0
 
             if self.pbar is None:
+                from tqdm import tqdm
+
                 self.pbar = tqdm(
                     total=total_mb,
                     unit="MB",
@@ -46,107 +174,234 @@ class TelegramClientManager:
         return _progress_hook
 
     async def start(self) -> None:
-        """Start the Telegram client session."""
+        """Start every configured Telegram session and build the upload pool."""
+        clients: list[PooledClient] = []
         try:
-            self.app = Client(
-                settings.app.session_name,
-                api_id=settings.telegram_api_id,
-                api_hash=settings.telegram_api_hash,
-            )
-            await self.app.start()
-            log("🚀 Telegram Client запущен", indent=1)
+            for session in settings.sessions:
+                client = self.client_factory(session)
+                clients.append(PooledClient(session.session_name, client, frozenset(session.channel_ids)))
+                await client.start()
+                log(f"🚀 Telegram Client запущен ({session.session_name})", indent=1)
         except asyncio.CancelledError:
             log("⏹️ Запуск Telegram клиента прерван пользователем.", indent=1)
             raise
+        finally:
+            self.pool = ClientPool(clients, sleep=shutdown_sleeper(self.shutdown_event)) if clients else None
+        # Channels of the binding store are resolved on their first send rather than all at startup
+        bindings = [] if settings.binding_store.enabled else settings.bindings
+        await self.peers.start(clients, [ch for b in bindings for ch in b.telegram.channel_ids])
 
     async def stop(self) -> None:
-        """Stop the Telegram client session."""
-        if self.app and self.app.is_connected:
-            await self.app.stop()
-            log("🛑 Telegram Client остановлен", indent=1)
+        """Stop all Telegram client sessions."""
+        if self.pool is None:
+            return
+        for pc in self.pool.clients:
+            if pc.client.is_connected:
+                await pc.client.stop()
+                log(f"🛑 Telegram Client остановлен ({pc.name})", indent=1)
 
-    async def send_media(self, channel: int | str, files: list[Path], caption: str = "", max_retries: int = 3) -> None:
+    async def send_media(
+        self,
+        channel: int | str,
+        files: list[Path],
+        caption: str = "",
+        max_retries: int = 3,
+        video_meta: Mapping[Path, VideoMeta] | None = None,
+    ) -> None:
         """
         Universal Sending:
         - 1 file → directly to the progress channel
         - a few → through Favorites with progress, then the album to the channel
+        `video_meta` carries thumbnails and dimensions from post-processing, keyed by file path.
         """
-        assert self.app is not None, "TelegramClientManager is not started"
+        assert self.pool is not None, "TelegramClientManager is not started"
 
         files = sorted(files, key=lambda p: p.name)
+        video_meta = video_meta or {}
 
         if len(files) == 1:
-            await self._send_single(channel, files[0], caption, max_retries)
+            await self._send_single(channel, files[0], caption, max_retries, video_meta.get(files[0]))
         else:
-            await self._send_album_via_saved(channel, files, caption, max_retries)
+            await self._send_album_via_saved(channel, files, caption, max_retries, video_meta)
 
-    async def _send_single(self, channel: int | str, file_path: Path, caption: str, max_retries: int) -> None:
+    async def _send_single(
+        self, channel: int | str, file_path: Path, caption: str, max_retries: int, meta: VideoMeta | None
+    ) -> None:
         suffix = file_path.suffix.lower()
         if suffix in [".jpg", ".jpeg", ".png", ".webp"]:
             await self._send_single_photo(channel, file_path, caption, max_retries)
         elif suffix in [".mp4", ".mov", ".mkv"]:
-            await self._send_single_video(channel, file_path, caption, max_retries)
+            await self._send_single_video(channel, file_path, caption, max_retries, meta)
         else:
-            log(f"⚠️ Формат {file_path} не поддерживается.", indent=4)
+            log(f"⚠️ Формат {file_path} не поддерживается.", indent=4, level=logging.WARNING)
 
-    async def _send_single_video(self, channel: int | str, file_path: Path, caption: str, max_retries: int) -> None:
+    async def _send_single_video(
+        self, channel: int | str, file_path: Path, caption: str, max_retries: int, meta: VideoMeta | None
+    ) -> None:
+        from pyrogram.errors import ChannelPrivate, FloodWait, PeerIdInvalid, RPCError
+
+        assert self.pool is not None
         attempt = 0
         while attempt < max_retries:
-            try:
-                log(f"✈️ Отправка видео (попытка {attempt + 1}/{max_retries})...", indent=4, padding_top=1)
-                assert self.app is not None
-                with VideoFileClip(str(file_path)) as clip:
-                    await self.app.send_video(  # type: ignore[reportUnknownMemberType]
-                        chat_id=channel,
-                        video=str(file_path),
-                        caption=caption,
-                        progress=self._create_progress_callback(indent=4),
-                        width=int(clip.w),  # type: ignore[attr-defined]
-                        height=int(clip.h),  # type: ignore[attr-defined]
+            async with self.pool.lease(channel) as pc:
+                try:
+                    log(
+                        f"✈️ Отправка видео{self._session_suffix(pc)} (попытка {attempt + 1}/{max_retries})...",
+                        indent=4,
+                        padding_top=1,
                     )
+                    started = time.perf_counter()
+                    attributes = await _video_attributes(file_path, meta)
+                    chat_id = await self.peers.chat_id(pc, channel)
+                    if await self.uploader.applies(file_path):
+                        uploaded = await self._upload_parallel(pc.client, file_path)
+                        await _send_uploaded_video(pc.client, chat_id, uploaded, file_path, caption, attributes)
+                    else:
+                        await self._send_watched(
+                            pc.client.send_video,
+                            file_path,
+                            chat_id=chat_id,
+                            video=str(file_path),
+                            caption=caption,
+                            **attributes,
+                        )
 
-                log(f"✅ Видео '{file_path}' отправлено.", indent=4, padding_top=1)
-                return
-            except FloodWait as e:
-                await self._handle_floodwait(e)
-            except (PeerIdInvalid, ChannelPrivate):
-                log(f"⚠️ Канал '{channel}' недоступен.", indent=4)
-                return
-            except RPCError as e:
-                log(f"❌ Ошибка API: {e}", indent=4)
-                await self._sleep_cancelable(5)
-            except Exception as e:
-                log(f"❌ Неизвестная ошибка: {e}", indent=4)
-                await self._sleep_cancelable(3)
+                    self._observe_upload("video", file_path, started)
+                    log(f"✅ Видео '{file_path}' отправлено.", indent=4, padding_top=1)
+                    return
+                except FloodWait as e:
+                    self._handle_floodwait(e, channel, pc)
+                except (PeerIdInvalid, ChannelPrivate):
+                    await self.peers.invalidate(pc, channel)
+                    log(f"⚠️ Канал '{channel}' недоступен.", indent=4, level=logging.WARNING)
+                    return
+                except RPCError as e:
+                    UPLOAD_ERRORS.labels(kind="video", error=type(e).__name__).inc()
+                    log(f"❌ Ошибка API: {e}", indent=4, level=logging.ERROR)
+                    await sleep_or_shutdown(5, self.shutdown_event)
+                except Exception as e:
+                    UPLOAD_ERRORS.labels(kind="video", error=type(e).__name__).inc()
+                    log(f"❌ Неизвестная ошибка: {e}", indent=4, level=logging.ERROR)
+                    await sleep_or_shutdown(3, self.shutdown_event)
             attempt += 1
 
+    async def send_streamed_video(
+        self,
+        channel: int | str,
+        growing: GrowingFile,
+        caption: str,
+        meta: Awaitable[VideoMeta | None],
+        before_send: Callable[[], Awaitable[None]] | None = None,
+    ) -> bool:
+        """
+        Uploads a video while it is still downloading and sends it once `meta`, the post-processing result
+        of the finished file, resolves. Returns False when the video has to be sent the usual way:
+        the download failed or was rewritten by post-processing, or the upload did not go through.
+        """
+        assert self.pool is not None
+        try:
+            async with self.pool.lease(channel) as pc:
+                log(f"✈️ Отправляю видео по мере загрузки{self._session_suffix(pc)}: {growing.name}", indent=4)
+                started = time.perf_counter()
+                uploaded = await self._upload_growing(pc.client, growing)
+                video_meta = await meta
+                path = growing.final_path
+                assert path is not None
+                if video_meta is not None and (video_meta.remuxed or video_meta.path != path):
+                    log("ℹ️ Видео перепаковано после загрузки, отправляю его заново.", indent=4)
+                    return False
+                attributes = await _video_attributes(path, video_meta)
+                if before_send:
+                    await before_send()
+                chat_id = await self.peers.chat_id(pc, channel)
+                await _send_uploaded_video(pc.client, chat_id, uploaded, path, caption, attributes)
+                self._observe_upload("video", path, started)
+                log(f"✅ Видео '{path}' отправлено.", indent=4, padding_top=1)
+                return True
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            UPLOAD_ERRORS.labels(kind="video", error=type(e).__name__).inc()
+            log(f"⚠️ Не удалось отправить видео по мере загрузки: {e}", indent=4, level=logging.WARNING)
+            return False
+
+    async def _upload_growing(self, client: Any, growing: GrowingFile) -> Any:
+        """Saves the file as it downloads under the stall watchdog; waiting for a stuck download is a stall too."""
+        return await self.watchdog.watch(
+            "upload", growing.name, lambda transfer: self._save_growing(client, growing, transfer)
+        )
+
+    async def _save_growing(self, client: Any, growing: GrowingFile, transfer: Transfer) -> Any:
+        """Saves the file part by part as its bytes arrive, a few parts in flight like Pyrogram's save_file."""
+        from pyrogram.raw.functions.upload.save_big_file_part import SaveBigFilePart
+        from pyrogram.raw.types.input_file_big import InputFileBig
+
+        file_id = client.rnd_id()
+        total_parts = math.ceil(growing.size / UPLOAD_PART_SIZE)
+        progress = self._create_progress_callback(4, transfer)
+        uploaded = 0
+
+        async def save(part: int, data: bytes) -> None:
+            nonlocal uploaded
+            rpc = SaveBigFilePart(file_id=file_id, file_part=part, file_total_parts=total_parts, bytes=data)
+            await client.invoke(rpc)
+            uploaded += len(data)
+            progress(uploaded, growing.size)
+
+        pending: set[asyncio.Task[None]] = set()
+        try:
+            for part in range(total_parts):
+                data = await growing.read(part * UPLOAD_PART_SIZE, UPLOAD_PART_SIZE)
+                while len(pending) >= UPLOAD_PARALLEL_PARTS:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        task.result()
+                pending.add(asyncio.create_task(save(part, data)))
+            await asyncio.gather(*pending)
+        finally:
+            for task in pending:
+                task.cancel()
+        return InputFileBig(id=file_id, parts=total_parts, name=growing.name)
+
     async def _send_single_photo(self, channel: int | str, file_path: Path, caption: str, max_retries: int) -> None:
+        from pyrogram.errors import ChannelPrivate, FloodWait, PeerIdInvalid, RPCError
+
+        assert self.pool is not None
         attempt = 0
         while attempt < max_retries:
-            try:
-                log(f"✈️ Отправка фото (попытка {attempt + 1}/{max_retries})...", indent=4)
-                assert self.app is not None
-                await self.app.send_photo(  # type: ignore[reportUnknownMemberType]
-                    chat_id=channel,
-                    photo=str(file_path),
-                    caption=caption,
-                    progress=self._create_progress_callback(indent=4),
-                )
-                log(f"✅ Фото '{file_path}' отправлено.", indent=4, padding_top=1)
-                return
-            except FloodWait as e:
-                await self._handle_floodwait(e)
-            except (PeerIdInvalid, ChannelPrivate):
-                log(f"⚠️ Канал '{channel}' недоступен или приватный. Пропускаю.", indent=4)
-                return
+            async with self.pool.lease(channel) as pc:
+                try:
+                    log(
+                        f"✈️ Отправка фото{self._session_suffix(pc)} (попытка {attempt + 1}/{max_retries})...",
+                        indent=4,
+                    )
+                    started = time.perf_counter()
+                    await self._send_watched(
+                        pc.client.send_photo,
+                        file_path,
+                        chat_id=await self.peers.chat_id(pc, channel),
+                        photo=str(file_path),
+                        caption=caption,
+                    )
+                    self._observe_upload("photo", file_path, started)
+                    log(f"✅ Фото '{file_path}' отправлено.", indent=4, padding_top=1)
+                    return
+                except FloodWait as e:
+                    self._handle_floodwait(e, channel, pc)
+                except (PeerIdInvalid, ChannelPrivate):
+                    await self.peers.invalidate(pc, channel)
+                    log(f"⚠️ Канал '{channel}' недоступен или приватный. Пропускаю.", indent=4, level=logging.WARNING)
+                    return
 
-            except RPCError as e:
-                log(f"❌ Ошибка Telegram API: {type(e).__name__} — {e}", indent=4)
-                await self._sleep_cancelable(5)
+                except RPCError as e:
+                    UPLOAD_ERRORS.labels(kind="photo", error=type(e).__name__).inc()
+                    log(f"❌ Ошибка Telegram API: {type(e).__name__} — {e}", indent=4, level=logging.ERROR)
+                    await sleep_or_shutdown(5, self.shutdown_event)
 
-            except Exception as e:
-                log(f"❌ Неизвестная ошибка отправки: {e}", indent=4)
-                await self._sleep_cancelable(3)
+                except Exception as e:
+                    UPLOAD_ERRORS.labels(kind="photo", error=type(e).__name__).inc()
+                    log(f"❌ Неизвестная ошибка отправки: {e}", indent=4, level=logging.ERROR)
+                    await sleep_or_shutdown(3, self.shutdown_event)
 
             attempt += 1
 
@@ -156,11 +411,36 @@ class TelegramClientManager:
         files: list[Path],
         caption: str,
         max_retries: int,
+        video_meta: Mapping[Path, VideoMeta],
     ) -> None:
         """
         Uploads the media to Favorites with progress, then sends the album to the channel.
+        File ids are only valid for the account that uploaded them, so the whole album
+        stays on one session and waits out its FloodWaits instead of failing over.
         """
-        assert self.app is not None
+        from pyrogram.errors import ChannelPrivate, PeerIdInvalid
+
+        assert self.pool is not None
+        async with self.pool.lease(channel) as pc:
+            try:
+                await self._send_album_with_client(pc, channel, files, caption, max_retries, video_meta)
+            except (PeerIdInvalid, ChannelPrivate):
+                await self.peers.invalidate(pc, channel)
+                raise
+
+    async def _send_album_with_client(
+        self,
+        pc: PooledClient,
+        channel: int | str,
+        files: list[Path],
+        caption: str,
+        max_retries: int,
+        video_meta: Mapping[Path, VideoMeta],
+    ) -> None:
+        from pyrogram.errors import FloodWait, RPCError
+        from pyrogram.types import InputMediaPhoto, InputMediaVideo
+
+        client = pc.client
         uploaded_media: list[InputMedia] = []
         temp_message_ids: list[int] = []
 
@@ -169,73 +449,112 @@ class TelegramClientManager:
             attempt = 0
             while attempt < max_retries:
                 try:
-                    log(f"⬆️ Загрузка {i + 1}/{len(files)} в Избранное: {file_path.name}", indent=4)
+                    log(
+                        f"⬆️ Загрузка {i + 1}/{len(files)} в Избранное{self._session_suffix(pc)}: {file_path.name}",
+                        indent=4,
+                        level=logging.DEBUG,
+                    )
+                    started = time.perf_counter()
                     msg: Message | None = None
                     if suffix in [".jpg", ".jpeg", ".png", ".webp"]:
-                        msg = await self.app.send_photo(  # type: ignore[reportUnknownMemberType]
+                        msg = await self._send_watched(
+                            client.send_photo,
+                            file_path,
                             chat_id="me",
                             photo=str(file_path),
                             caption=caption if i == 0 else "",
-                            progress=self._create_progress_callback(indent=4),
                         )
                         if msg and msg.photo:
                             uploaded_media.append(
                                 InputMediaPhoto(media=msg.photo.file_id, caption=caption if i == 0 else "")
                             )
 
+                    elif suffix in [".mp4", ".mov", ".mkv"] and await self.uploader.applies(file_path):
+                        # Saved without a message in Favorites
+                        attributes = await _video_attributes(file_path, video_meta.get(file_path))
+                        uploaded = await self._upload_parallel(client, file_path)
+                        file_id = await _save_uploaded_video(client, uploaded, file_path, attributes)
+                        uploaded_media.append(InputMediaVideo(media=file_id, caption=caption if i == 0 else ""))
+                        self._observe_upload("album", file_path, started)
+
                     elif suffix in [".mp4", ".mov", ".mkv"]:
-                        with VideoFileClip(str(file_path)) as clip:
-                            msg = await self.app.send_video(  # type: ignore[reportUnknownMemberType]
-                                chat_id="me",
-                                video=str(file_path),
-                                caption=caption if i == 0 else "",
-                                progress=self._create_progress_callback(indent=4),
-                                width=int(clip.w),  # type: ignore[attr-defined]
-                                height=int(clip.h),  # type: ignore[attr-defined]
-                            )
+                        attributes = await _video_attributes(file_path, video_meta.get(file_path))
+                        msg = await self._send_watched(
+                            client.send_video,
+                            file_path,
+                            chat_id="me",
+                            video=str(file_path),
+                            caption=caption if i == 0 else "",
+                            **attributes,
+                        )
                         if msg and msg.video:
                             uploaded_media.append(
                                 InputMediaVideo(media=msg.video.file_id, caption=caption if i == 0 else "")
                             )
                     else:
-                        log(f"⚠️ Формат {file_path} не поддерживается для альбомов.", indent=4)
+                        log(f"⚠️ Формат {file_path} не поддерживается для альбомов.", indent=4, level=logging.WARNING)
 
                     if msg and msg.id:
                         temp_message_ids.append(msg.id)
+                        self._observe_upload("album", file_path, started)
                     break
 
                 except FloodWait as e:
-                    await self._handle_floodwait(e)
+                    self._handle_floodwait(e, channel, pc)
+                    await sleep_or_shutdown(pc.flood_remaining(time.monotonic()), self.shutdown_event)
                 except RPCError as e:
-                    log(f"❌ Ошибка Telegram API: {type(e).__name__} — {e}", indent=4)
-                    await self._sleep_cancelable(5)
+                    UPLOAD_ERRORS.labels(kind="album", error=type(e).__name__).inc()
+                    log(f"❌ Ошибка Telegram API: {type(e).__name__} — {e}", indent=4, level=logging.ERROR)
+                    await sleep_or_shutdown(5, self.shutdown_event)
                 except Exception as e:
-                    log(f"❌ Неизвестная ошибка отправки: {e}", indent=4)
-                    await self._sleep_cancelable(3)
+                    UPLOAD_ERRORS.labels(kind="album", error=type(e).__name__).inc()
+                    log(f"❌ Неизвестная ошибка отправки: {e}", indent=4, level=logging.ERROR)
+                    await sleep_or_shutdown(3, self.shutdown_event)
                 attempt += 1
 
         if len(uploaded_media) > 1:
             log("📦 Формирование альбома...", indent=4)
-            await self.app.send_media_group(chat_id=channel, media=uploaded_media)  # type: ignore[reportGeneralTypeIssues]
+            await client.send_media_group(chat_id=await self.peers.chat_id(pc, channel), media=uploaded_media)
             log("✅ Альбом отправлен в канал.", indent=4)
 
         if temp_message_ids:
             try:
-                await self.app.delete_messages(chat_id="me", message_ids=temp_message_ids)
-                log("🧹 Временные сообщения из Избранного удалены.", indent=4)
+                await client.delete_messages(chat_id="me", message_ids=temp_message_ids)
+                log("🧹 Временные сообщения из Избранного удалены.", indent=4, level=logging.DEBUG)
             except Exception as e:
-                log(f"⚠️ Не удалось удалить временные сообщения: {e}", indent=4)
+                log(f"⚠️ Не удалось удалить временные сообщения: {e}", indent=4, level=logging.WARNING)
+
+    async def _send_watched(self, send: Callable[..., Awaitable[Any]], file_path: Path, **kwargs: Any) -> Any:
+        """Runs a Pyrogram send_* call under the stall watchdog, feeding it the upload progress."""
+        return await self.watchdog.watch(
+            "upload",
+            file_path.name,
+            lambda transfer: send(progress=self._create_progress_callback(4, transfer), **kwargs),
+        )
+
+    async def _upload_parallel(self, client: Any, file_path: Path) -> Any:
+        """Saves a big file over several connections under the stall watchdog."""
+        return await self.watchdog.watch(
+            "upload",
+            file_path.name,
+            lambda transfer: self.uploader.upload(client, file_path, self._create_progress_callback(4, transfer)),
+        )
+
+    @staticmethod
+    def _observe_upload(kind: str, file_path: Path, started: float) -> None:
+        UPLOAD_DURATION.labels(kind=kind).observe(time.perf_counter() - started)
+        with contextlib.suppress(OSError):
+            UPLOAD_BYTES.labels(kind=kind).inc(file_path.stat().st_size)
+
+    def _session_suffix(self, pc: PooledClient) -> str:
+        assert self.pool is not None
+        return f" через {pc.name}" if len(self.pool.clients) > 1 else ""
 
-    async def _handle_floodwait(self, e: FloodWait) -> None:
+    def _handle_floodwait(self, e: FloodWait, channel: int | str, pc: PooledClient) -> None:
+        """Puts the session aside for the FloodWait period; the next lease picks another one or waits."""
+        assert self.pool is not None
         wait_time = e.value if isinstance(e.value, int) else 60
-        log(f"⏳ FloodWait: жду {wait_time + 1} секунд...", indent=4)
-        await self._sleep_cancelable(wait_time + 1)
-
-    async def _sleep_cancelable(self, seconds: int) -> None:
-        remaining = float(seconds)
-        step = 0.25
-        while remaining > 0:
-            if self.shutdown_event.is_set():
-                raise asyncio.CancelledError()
-            await asyncio.sleep(step)
-            remaining -= step
+        self.pool.mark_flood(pc, wait_time + 1)
+        FLOODWAIT_SECONDS.inc(wait_time + 1)
+        if self.pool.has_alternative(channel, pc):
+            log(f"⏳ FloodWait {wait_time + 1} с на {pc.name}, переключаюсь на другую сессию...", indent=4)
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import time
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any
+
+from ..printer import log
+
+
+class NoEligibleClientError(RuntimeError):
+    """Raised when no session in the pool is allowed to post to a channel."""
+
+
+@dataclass
+class PooledClient:
+    """A Telegram session in the pool together with its routing state."""
+
+    name: str
+    client: Any
+    channels: frozenset[str] = field(default_factory=lambda: frozenset[str]())
+    active: int = 0
+    total: int = 0
+    flood_until: float = 0.0
+
+    def can_serve(self, channel: int | str) -> bool:
+        """An empty channel list means the session may post anywhere."""
+        return not self.channels or str(channel) in self.channels
+
+    def flood_remaining(self, now: float) -> float:
+        return max(0.0, self.flood_until - now)
+
+
+class ClientPool:
+    """
+    Routes uploads to the least-loaded session that is admin of the target channel.
+    Sessions that hit FloodWait are skipped until the wait expires; when every eligible
+    session is flooded, acquire() sleeps until the earliest one becomes available.
+    """
+
+    def __init__(
+        self,
+        clients: list[PooledClient],
+        sleep: Callable[[float], Awaitable[None]],
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if not clients:
+            raise ValueError("Пул Telegram клиентов не может быть пустым")
+        self.clients = clients
+        self._sleep = sleep
+        self._clock = clock
+
+    def eligible(self, channel: int | str) -> list[PooledClient]:
+        return [pc for pc in self.clients if pc.can_serve(channel)]
+
+    async def acquire(self, channel: int | str) -> PooledClient:
+        """Picks a session for the channel and marks it busy until release()."""
+        candidates = self.eligible(channel)
+        if not candidates:
+            raise NoEligibleClientError(f"Нет Telegram сессии с доступом к каналу {channel}")
+
+        while True:
+            now = self._clock()
+            ready = [pc for pc in candidates if pc.flood_remaining(now) == 0]
+            if ready:
+                chosen = min(ready, key=lambda pc: (pc.active, pc.total))
+                chosen.active += 1
+                chosen.total += 1
+                return chosen
+
+            wait = min(pc.flood_remaining(now) for pc in candidates)
+            log(f"⏳ FloodWait: жду {wait:.0f} секунд...", indent=4)
+            await self._sleep(wait)
+
+    def release(self, pc: PooledClient) -> None:
+        pc.active = max(0, pc.active - 1)
+
+    def mark_flood(self, pc: PooledClient, seconds: float) -> None:
+        pc.flood_until = max(pc.flood_until, self._clock() + seconds)
+
+    def has_alternative(self, channel: int | str, pc: PooledClient) -> bool:
+        """Whether another eligible session is free of FloodWait right now."""
+        now = self._clock()
+        return any(other is not pc and other.flood_remaining(now) == 0 for other in self.eligible(channel))
+
+    @asynccontextmanager
+    async def lease(self, channel: int | str) -> AsyncGenerator[PooledClient]:
+        pc = await self.acquire(channel)
+        try:
+            yield pc
+        finally:
+            self.release(pc)
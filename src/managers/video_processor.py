@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import struct
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, cast
+
+from ..config import settings
+from ..dto import VideoMeta
+from ..growing_file import GrowingFile
+from ..printer import log
+
+FASTSTART_SUFFIXES = (".mp4",)
+
+
+def _box_header(data: bytes) -> tuple[int, bytes, int] | None:
+    """Size, type and header length of the MP4 box whose header starts `data` (up to 16 bytes)."""
+    if len(data) < 8:
+        return None
+    size, box = struct.unpack(">I4s", data[:8])
+    if size == 1:
+        if len(data) < 16:
+            return None
+        return struct.unpack(">Q", data[8:16])[0], box, 16
+    return size, box, 8
+
+
+def is_faststart_mp4(path: Path) -> bool:
+    """Checks the top-level MP4 boxes: playback can start early only if `moov` precedes `mdat`."""
+    with open(path, "rb") as f:
+        offset = 0
+        while True:
+            f.seek(offset)
+            header = _box_header(f.read(16))
+            if header is None:
+                return False
+            size, box, header_len = header
+            if box == b"moov":
+                return True
+            if box == b"mdat" or size < header_len:
+                return False
+            offset += size
+
+
+async def is_faststart_growing(growing: GrowingFile) -> bool:
+    """is_faststart_mp4 for a file that is still downloading; waits only for the box headers."""
+    offset = 0
+    while offset < growing.size:
+        header = _box_header(await growing.read(offset, 16))
+        if header is None:
+            return False
+        size, box, header_len = header
+        if box == b"moov":
+            return True
+        if box == b"mdat" or size < header_len:
+            return False
+        offset += size
+    return False
+
+
+def _run_ffmpeg(*args: str) -> None:
+    from moviepy.config import FFMPEG_BINARY  # type: ignore
+
+    subprocess.run(
+        [cast(str, FFMPEG_BINARY), "-hide_banner", "-loglevel", "error", "-y", *args],
+        check=True,
+        capture_output=True,
+        timeout=3600,
+    )
+
+
+def _process_video(path_str: str, thumbnail_width: int) -> dict[str, Any]:
+    """
+    Worker process: normalizes a downloaded video for Telegram.
+    Remuxes (stream copy, no re-encoding) into a faststart MP4 unless the file already is one,
+    then extracts a JPEG thumbnail and probes duration and dimensions.
+    """
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos  # type: ignore
+
+    path = Path(path_str)
+    remuxed = False
+    if path.suffix.lower() not in FASTSTART_SUFFIXES or not is_faststart_mp4(path):
+        target = path.with_name(f"{path.stem}.faststart.mp4")
+        try:
+            _run_ffmpeg(
+                "-i", str(path), "-map", "0:v:0", "-map", "0:a?", "-c", "copy", "-movflags", "+faststart", str(target)
+            )
+        except BaseException:
+            target.unlink(missing_ok=True)
+            raise
+        final = path.with_suffix(".mp4")
+        target.replace(final)
+        if final != path:
+            path.unlink(missing_ok=True)
+        path = final
+        remuxed = True
+
+    infos = cast(dict[str, Any], ffmpeg_parse_infos(str(path)))
+    duration = float(infos.get("duration") or 0)
+    width, height = cast(list[int], infos.get("video_size") or [0, 0])
+
+    thumb: Path | None = path.with_name(f"{path.stem}.thumb.jpg")
+    try:
+        _run_ffmpeg(
+            "-ss",
+            f"{min(1.0, duration / 2):.2f}",
+            "-i",
+            str(path),
+            "-frames:v",
+            "1",
+            "-vf",
+            f"scale='min({thumbnail_width},iw)':-2",
+            "-q:v",
+            "4",
+            str(thumb),
+        )
+    except (subprocess.SubprocessError, OSError):
+        thumb = None
+
+    return {
+        "path": str(path),
+        "width": int(width),
+        "height": int(height),
+        "duration": round(duration),
+        "thumb": str(thumb) if thumb else None,
+        "remuxed": remuxed,
+    }
+
+
+class VideoProcessor:
+    """Post-processes downloaded videos in a process pool before they are uploaded."""
+
+    def __init__(self, shutdown_event: asyncio.Event) -> None:
+        self.shutdown_event = shutdown_event
+        self._executor: ProcessPoolExecutor | None = None
+
+    async def start(self) -> None:
+        config = settings.downloader.postprocess
+        if config.enabled:
+            self._executor = ProcessPoolExecutor(max_workers=config.workers)
+        log("🚀 Video Processor готов к работе", indent=1)
+
+    async def stop(self) -> None:
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        log("🛑 Video Processor остановлен", indent=1)
+
+    async def must_remux(self, growing: GrowingFile) -> bool:
+        """Whether process() will rewrite a video that is still downloading, so it cannot be uploaded yet."""
+        return self._executor is not None and not await is_faststart_growing(growing)
+
+    async def process(self, path: Path) -> VideoMeta | None:
+        """
+        Returns metadata for the upload, with `path` pointing at the normalized file.
+        Returns None when post-processing is disabled or fails; the original file is then sent as is.
+        """
+        if self._executor is None:
+            return None
+        if self.shutdown_event.is_set():
+            raise asyncio.CancelledError()
+
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(
+                self._executor, _process_video, str(path), settings.downloader.postprocess.thumbnail_width
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log(f"⚠️ Не удалось обработать видео {path.name}: {e}. Отправляю как есть.", indent=4, level=logging.WARNING)
+            return None
+
+        meta = VideoMeta.model_validate(result)
+        if result["remuxed"]:
+            log(f"🎞️ Видео перепаковано в faststart MP4: {meta.path.name}", indent=4)
+        return meta
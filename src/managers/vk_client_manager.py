@@ -1,4 +1,6 @@
 import asyncio
+import logging
+import time
 from pathlib import Path
 from typing import Any
 
@@ -6,23 +8,76 @@ import anyio
 import httpx
 from pydantic import HttpUrl
 
+from ..cancellation import sleep_or_shutdown, until_shutdown
 from ..cleaner import normalize_links
-from ..config import settings
+from ..config import ErrorClass, settings
 from ..dto import Post, WallGetResponse
+from ..metrics import (
+    DOWNLOAD_BYTES,
+    DOWNLOAD_DURATION,
+    DOWNLOAD_ERRORS,
+    VK_WALL_DURATION,
+    VK_WALL_ERRORS,
+    VK_WALL_REQUESTS,
+)
 from ..printer import log
 
+PHOTOS_PATH = Path("downloads")
+
+# https://dev.vk.com/ru/reference/errors
+AUTH_ERROR_CODES = frozenset({5, 27, 28, 1116})
+NOT_FOUND_ERROR_CODES = frozenset({15, 18, 19, 30, 100, 113})
+RATE_LIMIT_ERROR_CODES = frozenset({6, 9, 29})
+
+
+class VKAPIError(RuntimeError):
+    """An error object returned by the VK API instead of a response."""
+
+    def __init__(self, code: int, message: str) -> None:
+        super().__init__(f"VK API Error {code}: {message}")
+        self.code = code
+
+
+def classify_error(e: BaseException) -> ErrorClass:
+    """Sorts a wall.get failure into the kinds tracked by the circuit breaker."""
+    if isinstance(e, VKAPIError):
+        if e.code in AUTH_ERROR_CODES:
+            return "auth"
+        if e.code in NOT_FOUND_ERROR_CODES:
+            return "not_found"
+        if e.code in RATE_LIMIT_ERROR_CODES:
+            return "rate_limit"
+        return "other"
+    if isinstance(e, httpx.HTTPStatusError):
+        status = e.response.status_code
+        if status == 429:
+            return "rate_limit"
+        if status in (401, 403):
+            return "auth"
+        if status == 404:
+            return "not_found"
+        return "network" if status >= 500 else "other"
+    if isinstance(e, httpx.TransportError | OSError):
+        return "network"
+    return "other"
+
 
 class VKClientManager:
     """Manages the HTTP client for VK and provides methods for working with the API."""
 
-    def __init__(self, shutdown_event: asyncio.Event) -> None:
+    def __init__(self, shutdown_event: asyncio.Event, transport: httpx.AsyncBaseTransport | None = None) -> None:
+        """`transport` replaces the network layer, e.g. with an httpx.MockTransport in benchmarks."""
         self.shutdown_event = shutdown_event
+        self.transport = transport
         self.client: httpx.AsyncClient | None = None
 
     async def start(self) -> None:
         try:
             self.client = httpx.AsyncClient(
-                timeout=httpx.Timeout(10.0, connect=5.0), http2=True, headers={"User-Agent": "PostBridgeBot/1.0"}
+                timeout=httpx.Timeout(10.0, connect=5.0),
+                http2=True,
+                headers={"User-Agent": "PostBridgeBot/1.0"},
+                transport=self.transport,
             )
             log("🚀 VK Client запущен", indent=1)
         except asyncio.CancelledError:
@@ -41,21 +96,18 @@ class VKClientManager:
         assert self.client is not None, "VKClientManager is not started"
 
         if not url.path:
-            log(f"❌ Не удалось получить путь из URL: {url}", indent=4)
+            log(f"❌ Не удалось получить путь из URL: {url}", indent=4, level=logging.ERROR)
             return None
         file_name = Path(url.path).name
-        save_path = Path("downloads") / file_name
-        save_path.parent.mkdir(exist_ok=True)
+        save_path = settings.download_dir(PHOTOS_PATH) / file_name
+        save_path.parent.mkdir(parents=True, exist_ok=True)
 
+        started = time.perf_counter()
         try:
-            async with self.client.stream("GET", str(url)) as response:
-                response.raise_for_status()
-                async with await anyio.open_file(save_path, "wb") as f:
-                    async for chunk in response.aiter_bytes():
-                        if self.shutdown_event.is_set():
-                            raise asyncio.CancelledError()
-                        await f.write(chunk)
-            log(f"✅ Фотография сохранена: {save_path}", indent=4)
+            size = await until_shutdown(self._stream_to_file(str(url), save_path), self.shutdown_event)
+            DOWNLOAD_DURATION.labels(kind="photo").observe(time.perf_counter() - started)
+            DOWNLOAD_BYTES.labels(kind="photo").inc(size)
+            log(f"✅ Фотография сохранена: {save_path}", indent=4, level=logging.DEBUG)
             return save_path
         except asyncio.CancelledError:
             log("⏹️ Загрузка фотографии прервана.", indent=4)
@@ -63,13 +115,29 @@ class VKClientManager:
                 save_path.unlink()
             raise
         except Exception as e:
-            log(f"❌ Не удалось скачать фотографию: {e}", indent=4)
+            DOWNLOAD_ERRORS.labels(kind="photo").inc()
+            log(f"❌ Не удалось скачать фотографию: {e}", indent=4, level=logging.ERROR)
             if save_path.exists():
                 save_path.unlink()
             return None
 
+    async def _stream_to_file(self, url: str, save_path: Path) -> int:
+        assert self.client is not None
+        size = 0
+        async with self.client.stream("GET", url) as response:
+            response.raise_for_status()
+            async with await anyio.open_file(save_path, "wb") as f:
+                async for chunk in response.aiter_bytes():
+                    await f.write(chunk)
+                    size += len(chunk)
+        return size
+
     async def get_vk_wall(self, domain: str, post_count: int, post_source: str) -> list[Post]:
         """Requests posts from a VK wall (or Donut) with retry and cancellation on shutdown_event."""
+        with VK_WALL_DURATION.labels(domain=domain).time():
+            return await self._get_vk_wall(domain, post_count, post_source)
+
+    async def _get_vk_wall(self, domain: str, post_count: int, post_source: str) -> list[Post]:
         if self.shutdown_event.is_set():
             raise asyncio.CancelledError()
 
@@ -83,9 +151,9 @@ class VKClientManager:
         }
         if post_source == "donut":
             params["filter"] = "donut"
-            log(f"🔍 Собираю посты из VK Donut: {domain}...", indent=2)
+            log(f"🔍 Собираю посты из VK Donut: {domain}...", indent=2, level=logging.DEBUG)
         else:
-            log(f"🔍 Собираю посты со стены: {domain}...", indent=2)
+            log(f"🔍 Собираю посты со стены: {domain}...", indent=2, level=logging.DEBUG)
 
         delay = 2
         for attempt in range(3):
@@ -93,14 +161,15 @@ class VKClientManager:
                 raise asyncio.CancelledError()
 
             try:
-                response = await self.client.get("https://api.vk.com/method/wall.get", params=params)
-                if self.shutdown_event.is_set():
-                    raise asyncio.CancelledError()
+                VK_WALL_REQUESTS.labels(domain=domain).inc()
+                response = await until_shutdown(
+                    self.client.get("https://api.vk.com/method/wall.get", params=params), self.shutdown_event
+                )
 
                 response.raise_for_status()
                 data = response.json()
                 if "error" in data:
-                    raise RuntimeError(f"VK API Error: {data['error']['error_msg']}")
+                    raise VKAPIError(int(data["error"].get("error_code", 0)), data["error"].get("error_msg", ""))
                 raw = data["response"]
                 posts = WallGetResponse.model_validate(raw).items
                 for post in posts:
@@ -113,20 +182,12 @@ class VKClientManager:
                 raise
 
             except Exception as e:
-                if attempt < 2:
-                    log(f"❌ Ошибка VK API: {e}. Повтор через {delay} c...", indent=3)
-                    await self._sleep_cancelable(delay)
+                VK_WALL_ERRORS.labels(domain=domain, error=type(e).__name__).inc()
+                # A deleted group or a bad token will not recover in seconds; the circuit breaker handles those
+                if attempt < 2 and classify_error(e) in ("network", "rate_limit"):
+                    log(f"❌ Ошибка VK API: {e}. Повтор через {delay} c...", indent=3, level=logging.WARNING)
+                    await sleep_or_shutdown(delay, self.shutdown_event)
                     delay *= 2
                 else:
                     raise
         return []
-
-    async def _sleep_cancelable(self, seconds: int) -> None:
-        """A sleep that is interrupted by a shutdown event."""
-        remaining = float(seconds)
-        step = 0.25
-        while remaining > 0:
-            if self.shutdown_event.is_set():
-                raise asyncio.CancelledError()
-            await asyncio.sleep(step)
-            remaining -= step
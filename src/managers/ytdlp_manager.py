@@ -1,17 +1,26 @@
 from __future__ import annotations
 
 import asyncio
+import logging
 import subprocess
 import sys
-from multiprocessing import Process, Queue
+import time
+from collections.abc import Awaitable, Callable
+from functools import partial
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection
 from pathlib import Path
-from typing import Any, cast
-
-import psutil
-import yt_dlp
+from typing import Any, Protocol
 
+from ..cancellation import sleep_or_shutdown, until_shutdown
 from ..config import settings
+from ..growing_file import GrowingFile
+from ..metrics import DOWNLOAD_BYTES, DOWNLOAD_DURATION, DOWNLOAD_ERRORS
 from ..printer import log
+from ..transfer_watchdog import Transfer, TransferWatchdog
+from . import ytdlp_worker
+from .download_tuner import DownloadStats, DownloadTuner, stats_from_message
+from .range_downloader import DirectSource, RangeDownloader
 
 BROWSER_EXECUTABLES = (
     {
@@ -28,57 +37,138 @@ BROWSER_EXECUTABLES = (
 )
 
 
-def _ytdlp_worker(url: str, opts: dict[str, Any], out_q: Queue[str]) -> None:
-    """Worker process: downloads a video and sends the file path through a queue."""
+class _Receiver(Protocol):
+    """The receiving end of multiprocessing.Pipe (Connection, or PipeConnection on Windows)."""
+
+    def recv(self) -> Any: ...
+
+
+class _Stream:
+    """Turns the worker's "stream" message into a GrowingFile handed to the caller on the event loop."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, on_stream: Callable[[GrowingFile], None]) -> None:
+        self.loop = loop
+        self.on_stream = on_stream
+        self.growing: GrowingFile | None = None
+
+    def started(self, path: str, size: int) -> None:
+        self.growing = GrowingFile(Path(path), size, self.loop)
+        self.loop.call_soon_threadsafe(self.on_stream, self.growing)
+
+    def progress(self, done: int) -> None:
+        if self.growing:
+            self.growing.advance(done)
+
+
+def _receive(
+    conn: _Receiver,
+    on_progress: Callable[[int, int], None],
+    stream: _Stream | None = None,
+    on_stats: Callable[[DownloadStats], None] | None = None,
+) -> str | DirectSource | None:
+    """
+    Blocks until the worker sends the file path (or the direct file to fetch), passing its progress
+    messages on, or returns None once it exits without one.
+    """
     try:
-        with yt_dlp.YoutubeDL(cast(Any, opts)) as ydl:
-            info = ydl.extract_info(url, download=True)
-            downloaded_file = ydl.prepare_filename(info)
-            out_q.put(downloaded_file)
-    except BaseException:
-        pass
+        while True:
+            message = conn.recv()
+            if message[0] == "progress":
+                on_progress(message[1], message[2])
+                if stream:
+                    stream.progress(message[1])
+            elif message[0] == "stream":
+                if stream:
+                    stream.started(message[1], message[2])
+            elif message[0] == "stats":
+                if on_stats:
+                    on_stats(stats_from_message(message))
+            elif message[0] == "direct":
+                _, url, headers, path, size = message
+                return DirectSource(url, headers, Path(path), size)
+            else:
+                return message[1]
+    except (EOFError, OSError):
+        return None
+
+
+def _receiver_for(
+    conn: _Receiver, stream: _Stream | None, on_stats: Callable[[DownloadStats], None]
+) -> Callable[[Transfer], Awaitable[str | DirectSource | None]]:
+    """Reads the worker's messages in a thread, reporting its progress to the watchdog."""
+    return lambda transfer: asyncio.to_thread(_receive, conn, transfer.progress, stream, on_stats)
+
+
+def _file_size(path: str) -> int:
+    try:
+        return Path(path).stat().st_size
+    except OSError:
+        return 0
 
 
 class YtDlpManager:
     """Handles video downloading via yt-dlp in a separate process."""
 
-    def __init__(self, shutdown_event: asyncio.Event) -> None:
-        """Initialize the manager with a shutdown event."""
+    def __init__(
+        self,
+        shutdown_event: asyncio.Event,
+        worker: Callable[[str, dict[str, Any], Connection], None] | None = None,
+        recorder: Callable[[str, Path, float], None] | None = None,
+    ) -> None:
+        """
+        `worker` replaces ytdlp_worker.download as the process target (e.g. to replay captured traffic);
+        `recorder` is called in a worker thread with the URL, file and duration of every finished download.
+        """
         self.shutdown_event = shutdown_event
-        self._active_proc: Process | None = None
+        self.worker = worker
+        self.recorder = recorder
+        self.watchdog = TransferWatchdog()
+        self.tuner = DownloadTuner()
+        self.ranges = RangeDownloader(shutdown_event)
+        # Several posts may download videos at once, each in its own process
+        self._active_procs: set[Process] = set()
 
     async def start(self) -> None:
         """Prepare the manager for downloading."""
+        await self.tuner.start()
+        await self.ranges.start()
         log("🚀 YtDlp Manager готов к работе", indent=1)
 
     async def stop(self) -> None:
         """Terminate any active download process."""
-        await self._terminate_active()
+        for proc in list(self._active_procs):
+            await self._terminate(proc)
+        await self.tuner.stop()
+        await self.ranges.stop()
         log("🛑 YtDlp Manager остановлен", indent=1)
 
-    async def _terminate_active(self) -> None:
-        proc = self._active_proc
-        if proc and proc.is_alive():
+    async def _terminate(self, proc: Process) -> None:
+        if proc.is_alive():
             log("🛑 Прерываю активную загрузку yt-dlp...", indent=2)
             proc.terminate()
-            for _ in range(20):
-                if not proc.is_alive():
-                    break
-                await asyncio.sleep(0.1)
+            await asyncio.to_thread(proc.join, 2.0)
             if proc.is_alive():
                 proc.kill()
-            proc.join(timeout=1.0)
-        self._active_proc = None
+                await asyncio.to_thread(proc.join, 1.0)
+        self._active_procs.discard(proc)
+
+    async def _record(self, video_url: str, path: Path, duration: float) -> None:
+        assert self.recorder is not None
+        try:
+            await asyncio.to_thread(self.recorder, video_url, path, duration)
+        except OSError as e:
+            log(f"⚠️ Не удалось записать видео в архив: {e}", indent=4, level=logging.WARNING)
 
     async def restart_browser(self) -> None:
         """Restarts the browser to update cookies."""
         browser_name = settings.downloader.browser
         executable = BROWSER_EXECUTABLES.get(browser_name)
         if not executable:
-            log(f"⚠️ Браузер {browser_name} не поддерживается для перезапуска.", indent=4)
+            log(f"⚠️ Браузер {browser_name} не поддерживается для перезапуска.", indent=4, level=logging.WARNING)
             return
 
         log(f"🔄 Перезапускаю {browser_name} для обновления cookie...", indent=4)
+        import psutil
 
         for proc in psutil.process_iter(["name"]):  # type: ignore [reportUnknownMemberType, reportUnknownArgumentType])
             if proc.info["name"] == executable:
@@ -86,7 +176,7 @@ class YtDlpManager:
                 await asyncio.to_thread(proc.wait)
 
         await asyncio.to_thread(subprocess.Popen, [executable])
-        await asyncio.sleep(settings.downloader.browser_restart_wait_seconds)
+        await sleep_or_shutdown(settings.downloader.browser_restart_wait_seconds, self.shutdown_event)
 
         for proc in psutil.process_iter(["name"]):  # type: ignore [reportUnknownMemberType, reportUnknownArgumentType])
             if proc.info["name"] == executable:
@@ -96,15 +186,19 @@ class YtDlpManager:
 
         log("✅ Перезапуск завершен.", indent=4)
 
-    async def download_video(self, video_url: str) -> Path | None:
+    async def download_video(
+        self, video_url: str, on_stream: Callable[[GrowingFile], None] | None = None
+    ) -> Path | None:
         """
         Download a video via yt-dlp in a separate process.
         Guaranteed to stop on shutdown or cancellation.
+        With `on_stream`, a video that can be uploaded while it downloads is passed to it as a GrowingFile
+        once the first attempt starts; the GrowingFile fails if that attempt does.
         """
         if self.shutdown_event.is_set():
             raise asyncio.CancelledError()
 
-        out_dir = Path(settings.downloader.output_path)
+        out_dir = settings.download_dir(settings.downloader.output_path)
         out_dir.mkdir(parents=True, exist_ok=True)
 
         ydl_opts: dict[str, Any] = dict(settings.downloader.yt_dlp_opts)
@@ -121,62 +215,96 @@ class YtDlpManager:
         retries = settings.downloader.retries.count
         base_delay = settings.downloader.retries.delay_seconds
 
+        direct: DirectSource | None = None
         for attempt in range(retries):
             if self.shutdown_event.is_set():
                 log("⏹️ Загрузка отменена пользователем.", indent=4)
                 raise asyncio.CancelledError()
 
             log(f"📥 Скачиваю видео (попытка {attempt + 1}/{retries})...", indent=4)
-            out_q: Queue[str] = Queue()
-            proc = Process(target=_ytdlp_worker, args=(video_url, ydl_opts, out_q), daemon=True)
+            opts = ydl_opts
+            stream: _Stream | None = None
+            if on_stream and attempt == 0 and sys.platform != "win32":
+                # Windows cannot rename a file while the uploader has it open
+                stream = _Stream(asyncio.get_running_loop(), on_stream)
+                min_bytes = settings.downloader.stream_upload.min_size_mb * 2**20
+                opts = {**opts, ytdlp_worker.STREAM_OPTION: min_bytes}
+            if self.tuner.config.enabled:
+                opts = {**opts, ytdlp_worker.TUNING_OPTION: self.tuner.table()}
+            if self.ranges.config.enabled:
+                opts = {**opts, ytdlp_worker.DIRECT_OPTION: True}
+            stats: list[DownloadStats] = []
+            receiver, sender = Pipe(duplex=False)
+            proc = Process(target=self.worker or ytdlp_worker.download, args=(video_url, opts, sender), daemon=True)
             proc.start()
-            self._active_proc = proc
+            sender.close()
+            self._active_procs.add(proc)
 
+            started = time.perf_counter()
             try:
-                downloaded_file = await self._wait_for_result_or_shutdown(proc, out_q)
+                # The pipe reaches EOF when the worker exits, so this single wait also covers failures
+                downloaded_file = await until_shutdown(
+                    self.watchdog.watch("download", video_url, _receiver_for(receiver, stream, stats.append)),
+                    self.shutdown_event,
+                )
+                await asyncio.to_thread(proc.join, 1.0)
+                if isinstance(downloaded_file, DirectSource):
+                    # yt-dlp only extracted the video: the file is fetched here
+                    direct = downloaded_file
+                    connections = self._connections(direct.host)
+                    log(f"⚡ Прямая ссылка на файл, качаю в {connections} потоков...", indent=4)
+                    fetch = partial(self.ranges.download, direct, connections)
+                    stats.append(
+                        await until_shutdown(self.watchdog.watch("download", video_url, fetch), self.shutdown_event)
+                    )
+                    downloaded_file = str(direct.path)
                 if downloaded_file:
+                    duration = time.perf_counter() - started
+                    DOWNLOAD_DURATION.labels(kind="video").observe(duration)
+                    if self.recorder:
+                        await self._record(video_url, Path(downloaded_file), duration)
+                    size = await asyncio.to_thread(_file_size, downloaded_file)
+                    DOWNLOAD_BYTES.labels(kind="video").inc(size)
+                    if stream and stream.growing:
+                        stream.growing.finish(Path(downloaded_file), size)
+                    if stats:
+                        await self.tuner.record(stats[-1])
                     log(f"✅ Видео скачано: {downloaded_file}", indent=4)
                     return Path(downloaded_file)
+                DOWNLOAD_ERRORS.labels(kind="video").inc()
 
             except asyncio.CancelledError:
-                await self._terminate_active()
+                await self._terminate(proc)
                 log("⏹️ Загрузка отменена (CancelledError).", indent=4)
                 raise
             except Exception as e:
-                log(f"❌ Ошибка скачивания: {e}", indent=4)
+                DOWNLOAD_ERRORS.labels(kind="video").inc()
+                log(f"❌ Ошибка скачивания: {e}", indent=4, level=logging.WARNING)
 
                 if "This video is only available for registered users" in str(e) and attempt < retries - 1:
                     await self.restart_browser()
                     continue
 
-                await self._terminate_active()
+                await self._terminate(proc)
                 if attempt < retries - 1 and not self.shutdown_event.is_set():
                     current_delay = base_delay * (2**attempt)
                     log(f"⏳ Пауза {current_delay} секунд перед следующей попыткой...", indent=4)
-                    await self._sleep_cancelable(current_delay)
+                    await sleep_or_shutdown(current_delay, self.shutdown_event)
+            finally:
+                receiver.close()
+                if stream and stream.growing:
+                    stream.growing.fail("загрузка прервана")
+                if not proc.is_alive():
+                    self._active_procs.discard(proc)
 
-        log(f"❌ Не удалось скачать видео после {retries} попыток.", indent=4)
+        if direct:
+            await self.ranges.discard(direct)
+        log(f"❌ Не удалось скачать видео после {retries} попыток.", indent=4, level=logging.ERROR)
         return None
 
-    async def _wait_for_result_or_shutdown(self, proc: Process, out_q: Queue[str]) -> str | None:
-        while proc.is_alive():
-            if self.shutdown_event.is_set():
-                await self._terminate_active()
-                return None
-            try:
-                return out_q.get_nowait()
-            except Exception:
-                pass
-            await asyncio.sleep(0.15)
-
-        try:
-            return out_q.get_nowait()
-        except Exception:
-            return None
-
-    async def _sleep_cancelable(self, seconds: int) -> None:
-        remaining = float(seconds)
-        step = 0.25
-        while remaining > 0 and not self.shutdown_event.is_set():
-            await asyncio.sleep(step)
-            remaining -= step
+    def _connections(self, host: str) -> int:
+        """Connections for a direct file: the concurrency tuned for its host."""
+        if not self.tuner.config.enabled:
+            return self.tuner.initial
+        table = self.tuner.table()
+        return table.get(host, table[""])
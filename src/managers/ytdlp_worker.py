@@ -0,0 +1,187 @@
+"""
+Entry point of the yt-dlp download process.
+
+Kept free of project imports: with the spawn start method the child process imports this
+module (and the main module) from scratch, so it should load yt-dlp and nothing else.
+"""
+
+from __future__ import annotations
+
+import time
+from multiprocessing.connection import Connection
+from typing import Any, cast
+from urllib.parse import urlparse
+
+# Progress is sent at most this often; the stall window is minutes long
+PROGRESS_INTERVAL_SECONDS = 1.0
+# Option with the minimum size of a video announced for streaming upload; it is not passed on to yt-dlp
+STREAM_OPTION = "postbridge_stream_min_bytes"
+STREAM_PROTOCOLS = ("http", "https")
+# Option with the concurrency to use per CDN host ("" for hosts not in it); it is not passed on to yt-dlp
+TUNING_OPTION = "postbridge_concurrency"
+# Option that makes the worker announce direct files instead of downloading them; it is not passed on to yt-dlp
+DIRECT_OPTION = "postbridge_direct"
+# aria2c options that set the number of connections
+ARIA2C_CONNECTION_FLAGS = ("-x", "--max-connection-per-server", "-s", "--split")
+
+
+def is_direct(info: dict[str, Any]) -> bool:
+    """Whether the video is a single progressive file served over plain HTTP (not merged, HLS or DASH)."""
+    return not info.get("requested_formats") and info.get("protocol") in STREAM_PROTOCOLS and bool(info.get("url"))
+
+
+def streamable_size(info: dict[str, Any], min_bytes: int) -> int:
+    """
+    The exact size of a video that is written front to back into its final container, so that it can be
+    uploaded while it downloads; 0 when it is merged from several formats, fragmented, not MP4 or of unknown size.
+    """
+    if not is_direct(info) or info.get("ext") != "mp4":
+        return 0
+    size = int(info.get("filesize") or 0)
+    return size if size >= min_bytes else 0
+
+
+def media_host(info: dict[str, Any]) -> str:
+    """The host the media is downloaded from: the first requested format's, for merged formats."""
+    formats = cast(list[dict[str, Any]], info.get("requested_formats") or [info])
+    return urlparse(str(formats[0].get("url") or "")).hostname or ""
+
+
+def with_connections(args: list[str], connections: int) -> list[str]:
+    """aria2c arguments with the number of connections per server and of splits set to `connections`."""
+    result: list[str] = []
+    skip = False
+    for arg in args:
+        if skip:
+            skip = False
+        elif arg in ARIA2C_CONNECTION_FLAGS:
+            skip = True
+        elif not arg.startswith(tuple(f"{flag}=" for flag in ARIA2C_CONNECTION_FLAGS[1::2])):
+            result.append(arg)
+    return [*result, "-x", str(connections), "-s", str(connections)]
+
+
+def direct_headers(ydl: Any, info: dict[str, Any]) -> dict[str, str]:
+    """The headers yt-dlp would send for the file, with the cookies of its URL."""
+    headers = {str(k): str(v) for k, v in cast(dict[str, Any], info.get("http_headers") or {}).items()}
+    cookie = ydl.cookiejar.get_cookie_header(info["url"])
+    if cookie:
+        headers["Cookie"] = cookie
+    return headers
+
+
+def set_concurrency(params: dict[str, Any], concurrency: int) -> None:
+    """Applies the concurrency to fragment downloads and to aria2c's connections."""
+    params["concurrent_fragment_downloads"] = concurrency
+    downloader_args = params.get("external_downloader_args")
+    if isinstance(downloader_args, dict) and "aria2c" in downloader_args:
+        aria2c_args = cast(list[str], downloader_args["aria2c"])
+        params["external_downloader_args"] = {**downloader_args, "aria2c": with_connections(aria2c_args, concurrency)}
+
+
+class _RetryCounter:
+    """yt-dlp logger that counts download retries; messages are dropped like in quiet mode."""
+
+    def __init__(self) -> None:
+        self.retries = 0
+
+    def debug(self, message: str) -> None:
+        if "Retrying" in message:
+            self.retries += 1
+
+    def info(self, message: str) -> None:
+        pass
+
+    def warning(self, message: str) -> None:
+        self.debug(message)
+
+    def error(self, message: str) -> None:
+        pass
+
+
+class _Stats:
+    """Transfer time, bytes and fragments of the downloads of one video (two when formats are merged)."""
+
+    def __init__(self) -> None:
+        self.seconds = 0.0
+        self.bytes = 0
+        self.fragments = 0
+        self._started: float | None = None
+
+    def update(self, status: dict[str, Any]) -> None:
+        if status.get("status") == "downloading" and self._started is None:
+            self._started = time.monotonic()
+        elif status.get("status") == "finished" and self._started is not None:
+            self.seconds += time.monotonic() - self._started
+            self.bytes += int(status.get("total_bytes") or status.get("downloaded_bytes") or 0)
+            self.fragments += int(status.get("fragment_count") or 0)
+            self._started = None
+
+
+def download(url: str, opts: dict[str, Any], out: Connection) -> None:
+    """
+    Worker process: downloads a video, sending ("progress", downloaded, total) messages while it runs and
+    ("done", path) at the end through a pipe; exits without sending "done" on failure. With STREAM_OPTION
+    a streamable video is announced with ("stream", partial file, size) as soon as its download starts.
+    With TUNING_OPTION the concurrency is picked by the media host, and ("stats", host, concurrency,
+    bytes, seconds, fragments, retries) is sent before "done". With DIRECT_OPTION a video that is not
+    streamed and resolves to a single progressive file is not downloaded: ("direct", url, headers, path, size)
+    is sent instead, for the caller to fetch itself.
+    """
+    import yt_dlp
+
+    opts = dict(opts)
+    stream_min_bytes = int(opts.pop(STREAM_OPTION, 0))
+    tuning = cast(dict[str, int] | None, opts.pop(TUNING_OPTION, None))
+    direct = bool(opts.pop(DIRECT_OPTION, False))
+    stream_size = 0
+    last_sent = 0.0
+    stats = _Stats()
+    retries = _RetryCounter()
+    if tuning is not None:
+        opts["logger"] = retries
+
+    def report(status: dict[str, Any]) -> None:
+        nonlocal last_sent, stream_size
+        stats.update(status)
+        if stream_size and status.get("status") == "downloading" and status.get("tmpfilename"):
+            out.send(("stream", status["tmpfilename"], stream_size))
+            stream_size = 0
+        now = time.monotonic()
+        if status.get("status") != "downloading" or now - last_sent < PROGRESS_INTERVAL_SECONDS:
+            return
+        last_sent = now
+        total = status.get("total_bytes") or status.get("total_bytes_estimate") or 0
+        out.send(("progress", int(status.get("downloaded_bytes") or 0), int(total)))
+
+    try:
+        with yt_dlp.YoutubeDL(cast(Any, {**opts, "progress_hooks": [report]})) as ydl:
+            host = ""
+            concurrency = 0
+            streamed = False
+            if stream_min_bytes or tuning is not None or direct:
+                info = cast(dict[str, Any], ydl.extract_info(url, download=False))
+                if tuning is not None:
+                    host = media_host(info)
+                    concurrency = tuning.get(host, tuning[""])
+                    set_concurrency(cast(dict[str, Any], ydl.params), concurrency)
+                stream_size = streamable_size(info, stream_min_bytes) if stream_min_bytes else 0
+                streamed = bool(stream_size)
+                if direct and not streamed and is_direct(info):
+                    path = ydl.prepare_filename(cast(Any, info))
+                    size = int(info.get("filesize") or 0)
+                    out.send(("direct", info["url"], direct_headers(ydl, info), path, size))
+                    return
+                if streamed:
+                    # External downloaders such as aria2c write segments out of order
+                    ydl.params["external_downloader"] = {"default": "native"}
+                info = ydl.process_ie_result(cast(Any, info), download=True)
+            else:
+                info = ydl.extract_info(url, download=True)
+            downloaded_file = ydl.prepare_filename(info)
+            # A streamed video is downloaded over a single connection whatever the concurrency
+            if tuning is not None and not streamed:
+                out.send(("stats", host, concurrency, stats.bytes, stats.seconds, stats.fragments, retries.retries))
+            out.send(("done", downloaded_file))
+    except BaseException:
+        pass
@@ -0,0 +1,322 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections.abc import Generator, Iterator, Sequence
+from contextlib import contextmanager
+from typing import Self, TypeVar
+
+from .printer import log
+
+DEFAULT_BUCKETS: tuple[float, ...] = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values, strict=True)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric(ABC):
+    """Base class for a metric family with an optional fixed set of label names."""
+
+    kind: str = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple[str, ...], Self] = {}
+
+    @abstractmethod
+    def _new_child(self) -> Self:
+        """A fresh metric of the same kind for one set of label values."""
+
+    def labels(self, **labels: object) -> Self:
+        """Returns the child metric for the given label values, creating it on first use."""
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: ожидаются метки {self.labelnames}, получены {tuple(labels)}")
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            child = self._new_child()
+            self._children[key] = child
+        return child
+
+    def _samples(self) -> Iterator[tuple[tuple[str, ...], Self]]:
+        if self.labelnames:
+            yield from self._children.items()
+        else:
+            yield (), self
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in self._samples():
+            lines.extend(child._render_sample(self.name, self.labelnames, values))
+        return lines
+
+    @abstractmethod
+    def _render_sample(self, name: str, labelnames: Sequence[str], values: Sequence[str]) -> list[str]:
+        """The exposition lines of this metric under the given label values."""
+
+
+class Counter(_Metric):
+    """A monotonically increasing value."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.value = 0.0
+
+    def _new_child(self) -> Self:
+        return type(self)(self.name, self.documentation)
+
+    def inc(self, amount: float = 1.0) -> None:
+        if amount < 0:
+            raise ValueError("Counter can only be incremented")
+        self.value += amount
+
+    def _render_sample(self, name: str, labelnames: Sequence[str], values: Sequence[str]) -> list[str]:
+        return [f"{name}{_format_labels(labelnames, values)} {_format_value(self.value)}"]
+
+
+class Gauge(_Metric):
+    """A value that can go up and down."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.value = 0.0
+
+    def _new_child(self) -> Self:
+        return type(self)(self.name, self.documentation)
+
+    def set(self, value: float) -> None:
+        self.value = float(value)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def _render_sample(self, name: str, labelnames: Sequence[str], values: Sequence[str]) -> list[str]:
+        return [f"{name}{_format_labels(labelnames, values)} {_format_value(self.value)}"]
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets, plus their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def _new_child(self) -> Self:
+        return type(self)(self.name, self.documentation, buckets=self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.bucket_counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    @contextmanager
+    def time(self) -> Generator[None]:
+        """Observes the wall time spent inside the block, also when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def _render_sample(self, name: str, labelnames: Sequence[str], values: Sequence[str]) -> list[str]:
+        lines: list[str] = []
+        cumulative = 0
+        for bound, bucket_count in zip((*self.buckets, math.inf), self.bucket_counts, strict=True):
+            cumulative += bucket_count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{name}_bucket{_format_labels(labelnames, values, le)} {cumulative}")
+        labels = _format_labels(labelnames, values)
+        lines.append(f"{name}_sum{labels} {_format_value(self.sum)}")
+        lines.append(f"{name}_count{labels} {self.count}")
+        return lines
+
+
+_M = TypeVar("_M", bound=_Metric)
+
+
+class MetricsRegistry:
+    """Holds metric families and renders them in the Prometheus text format."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def _register(self, metric: _M) -> _M:
+        if metric.name in self._metrics:
+            raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# --- VK ---
+VK_WALL_REQUESTS = REGISTRY.counter("postbridge_vk_wall_requests_total", "wall.get requests sent to VK.", ("domain",))
+VK_WALL_ERRORS = REGISTRY.counter(
+    "postbridge_vk_wall_errors_total", "Failed wall.get requests by error type.", ("domain", "error")
+)
+VK_WALL_DURATION = REGISTRY.histogram(
+    "postbridge_vk_wall_duration_seconds", "Duration of a get_vk_wall call, retries included.", ("domain",)
+)
+
+# --- Downloads ---
+DOWNLOAD_BYTES = REGISTRY.counter("postbridge_download_bytes_total", "Bytes of downloaded media.", ("kind",))
+DOWNLOAD_DURATION = REGISTRY.histogram(
+    "postbridge_download_duration_seconds", "Duration of a single media download.", ("kind",)
+)
+DOWNLOAD_ERRORS = REGISTRY.counter("postbridge_download_errors_total", "Failed media downloads.", ("kind",))
+DOWNLOAD_CONCURRENCY = REGISTRY.gauge(
+    "postbridge_download_concurrency", "Fragment concurrency chosen for the next video from a CDN host.", ("host",)
+)
+DOWNLOADS_DISK_BYTES = REGISTRY.gauge(
+    "postbridge_downloads_disk_bytes", "Bytes held by downloaded files that are not deleted yet."
+)
+DISK_WAIT_SECONDS = REGISTRY.counter(
+    "postbridge_disk_wait_seconds_total", "Seconds downloads waited for the disk budget to free up."
+)
+ORPHANS_REMOVED = REGISTRY.counter("postbridge_orphan_files_removed_total", "Leftover downloaded files removed.")
+
+# --- Uploads ---
+UPLOAD_BYTES = REGISTRY.counter("postbridge_upload_bytes_total", "Bytes uploaded to Telegram.", ("kind",))
+UPLOAD_DURATION = REGISTRY.histogram(
+    "postbridge_upload_duration_seconds", "Duration of a single successful Telegram upload.", ("kind",)
+)
+UPLOAD_ERRORS = REGISTRY.counter(
+    "postbridge_upload_errors_total", "Failed Telegram upload attempts.", ("kind", "error")
+)
+FLOODWAIT_SECONDS = REGISTRY.counter(
+    "postbridge_floodwait_seconds_total", "Seconds spent waiting on Telegram FloodWait."
+)
+PEER_RESOLVES = REGISTRY.counter(
+    "postbridge_peer_resolves_total", "Channel usernames resolved through Telegram.", ("session",)
+)
+
+# --- Pipeline ---
+TRANSFER_STALLS = REGISTRY.counter(
+    "postbridge_transfer_stalls_total", "Downloads and uploads aborted for making no progress.", ("kind",)
+)
+
+CYCLE_DURATION = REGISTRY.histogram("postbridge_cycle_duration_seconds", "Duration of a full check cycle.")
+POSTS_PROCESSED = REGISTRY.counter("postbridge_posts_processed_total", "Posts delivered to Telegram.", ("domain",))
+POSTS_BEHIND = REGISTRY.gauge(
+    "postbridge_posts_behind", "New posts found in the last check that are not delivered yet.", ("domain",)
+)
+LEASES_HELD = REGISTRY.gauge("postbridge_leases_held", "Bindings this instance holds a sharding lease on.")
+TAKEOVER_SKIPPED_POSTS = REGISTRY.counter(
+    "postbridge_takeover_skipped_posts_total",
+    "Posts skipped on takeover because the previous instance may have delivered them.",
+    ("domain",),
+)
+CIRCUIT_STATE = REGISTRY.gauge(
+    "postbridge_circuit_state",
+    "wall.get circuit breaker per binding and kind of failure: 0 closed, 1 half-open, 2 open.",
+    ("domain", "error_class"),
+)
+CIRCUIT_SKIPPED_CHECKS = REGISTRY.counter(
+    "postbridge_circuit_skipped_checks_total", "Binding checks skipped while a circuit was open.", ("domain",)
+)
+QUEUE_DEPTH = REGISTRY.gauge("postbridge_queue_depth", "Items waiting in a pipeline stage.", ("queue",))
+
+
+class MetricsServer:
+    """A minimal HTTP server that exposes the registry on /metrics."""
+
+    def __init__(self, host: str, port: int, registry: MetricsRegistry = REGISTRY) -> None:
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self._server: asyncio.Server | None = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        log(f"📈 Метрики доступны на http://{self.host}:{self.port}/metrics", indent=1)
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+            log("🛑 Сервер метрик остановлен", indent=1)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            path = parts[1].split("?", 1)[0] if len(parts) >= 2 else ""
+            if len(parts) >= 2 and parts[0] == "GET" and path in ("/metrics", "/"):
+                status, body = "200 OK", self.registry.render().encode()
+            else:
+                status, body = "404 Not Found", b"Not Found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+        except (TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
@@ -1,8 +1,107 @@
-def log(message: str, indent: int = 0, padding_top: int = 0) -> None:
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import sys
+from collections.abc import Generator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import UTC, datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Literal, TextIO
+
+LOGGER = logging.getLogger("postbridge")
+CONTEXT_FIELDS = ("binding", "post", "channel")
+
+_context: ContextVar[dict[str, Any] | None] = ContextVar("log_context", default=None)
+_listener: QueueListener | None = None
+
+
+def log(message: str, indent: int = 0, padding_top: int = 0, level: int = logging.INFO, **fields: Any) -> None:
     """
     Custom print function that supports indentation and top padding.
+    Records go through a queue to a background thread, so a slow stdout never blocks the event loop.
+    Extra keyword arguments and the fields of log_context() end up in the JSON output.
     """
-    for _ in range(padding_top):
-        print()
-    prefix = "  " * indent
-    print(f"{prefix}{message}")
+    if not LOGGER.isEnabledFor(level):
+        return
+    context = _context.get() or {}
+    LOGGER.log(
+        level,
+        message,
+        extra={"indent": indent, "padding_top": padding_top, "fields": {**context, **fields} if fields else context},
+    )
+
+
+@contextmanager
+def log_context(**fields: Any) -> Generator[None]:
+    """Attaches fields such as binding/post/channel to every log record emitted inside the block."""
+    token = _context.set({**(_context.get() or {}), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+class HumanFormatter(logging.Formatter):
+    """The emoji-friendly console format: indentation and blank lines, nothing else."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        padding = "\n" * getattr(record, "padding_top", 0)
+        prefix = "  " * getattr(record, "indent", 0)
+        text = f"{padding}{prefix}{record.getMessage()}"
+        if record.exc_info:
+            text += "\n" + self.formatException(record.exc_info)
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the level, the message and the binding/post/channel fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, UTC).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage().strip(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(level: str = "INFO", fmt: Literal["human", "json"] = "human", stream: TextIO | None = None) -> None:
+    """
+    Routes the app logger and the stdlib root logger through a queue to a writer thread.
+    `level` applies to the app logger; other libraries only report warnings and errors.
+    Safe to call again: the previous writer is flushed and replaced.
+    """
+    global _listener
+    stop_logging()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == "json" else HumanFormatter())
+    records: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    handler = QueueHandler(records)
+    _listener = QueueListener(records, output)
+    _listener.start()
+
+    LOGGER.handlers = [handler]
+    LOGGER.setLevel(logging.getLevelNamesMapping().get(level.upper(), logging.INFO))
+    LOGGER.propagate = False
+    # Third-party loggers stay at WARNING whatever the app level: httpx logs every request URL at INFO,
+    # and the VK token is part of it
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+def stop_logging() -> None:
+    """Flushes pending records and stops the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,266 @@
+"""
+Profiling of a running instance: per-cycle reports with hot functions per pipeline stage,
+slow event-loop callbacks and memory growth. Nothing is hooked in while it is off.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import logging
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from types import FrameType
+
+from .printer import log
+
+# The innermost of these functions on the stack names the stage a sample belongs to
+STAGES: dict[str, str] = {
+    "VKClientManager.get_vk_wall": "vk_fetch",
+    "normalize_links": "cleaner",
+    "VKClientManager.download_photo": "download",
+    "YtDlpManager.download_video": "download",
+    "VideoProcessor.process": "postprocess",
+    "TelegramClientManager.send_media": "upload",
+}
+TOP_FUNCTIONS = 15
+TOP_ALLOCATIONS = 15
+# The report groups by line; deeper tracebacks make every snapshot comparison several times slower
+TRACEMALLOC_FRAMES = 1
+# Allocations of the profiler itself
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+)
+
+Samples = tuple[Counter[str], dict[str, Counter[str]], dict[str, Counter[str]]]
+
+
+def _describe(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_qualname} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+def _take_snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+
+
+class _SlowCallbacks(logging.Handler):
+    """Collects asyncio's "Executing <Handle> took N seconds" debug-mode warnings."""
+
+    def __init__(self) -> None:
+        super().__init__(logging.WARNING)
+        self.records: list[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        message = record.getMessage()
+        if message.startswith("Executing"):
+            self.records.append(f"{datetime.fromtimestamp(record.created):%H:%M:%S} {message}")
+
+
+class StageSampler:
+    """
+    Samples the event-loop thread's stack from a background thread and counts, per stage,
+    the functions that were running (self) or on the stack (inclusive).
+    """
+
+    def __init__(self, thread_id: int, interval: float) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="postbridge-sampler", daemon=True)
+        self._samples: Samples = (Counter(), {}, {})
+
+    def collect(self) -> Samples:
+        """Returns the samples taken since the last call: counts per stage, self and inclusive hits per function."""
+        with self._lock:
+            samples, self._samples = self._samples, (Counter(), {}, {})
+        return samples
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)  # pyright: ignore[reportPrivateUsage]
+            if frame is not None:
+                self.record(frame)
+
+    def record(self, leaf: FrameType) -> None:
+        stage = "other"
+        stack: list[FrameType] = []
+        frame: FrameType | None = leaf
+        while frame is not None:
+            stack.append(frame)
+            if frame.f_code.co_qualname in STAGES:
+                # Frames above the stage entry are the same for every sample of it
+                stage = STAGES[frame.f_code.co_qualname]
+                break
+            frame = frame.f_back
+        if leaf.f_code.co_name == "select" and leaf.f_code.co_filename.endswith("selectors.py"):
+            stage = "idle"
+        functions = {_describe(f) for f in stack}
+        with self._lock:
+            counts, self_time, inclusive = self._samples
+            counts[stage] += 1
+            self_time.setdefault(stage, Counter())[_describe(leaf)] += 1
+            inclusive.setdefault(stage, Counter()).update(functions)
+
+
+class Profiler:
+    """
+    Writes a report per check cycle to `directory`: sampled hot functions per stage, asyncio callbacks
+    that blocked the loop for longer than `slow_callback_seconds`, and tracemalloc top allocators and growth
+    since the previous cycle; plus a cProfile dump of the cycle. Enabled by --profile or toggled with SIGUSR2.
+    """
+
+    def __init__(
+        self, directory: Path = Path("profiles"), sample_interval: float = 0.005, slow_callback_seconds: float = 0.1
+    ) -> None:
+        self.directory = directory
+        self.sample_interval = sample_interval
+        self.slow_callback_seconds = slow_callback_seconds
+        self.enabled = False
+        self._cycle = 0
+        self._cycle_started = 0.0
+        self._sampler: StageSampler | None = None
+        self._profile: cProfile.Profile | None = None
+        self._slow = _SlowCallbacks()
+        self._snapshot: tracemalloc.Snapshot | None = None
+        self._saved_slow_duration = 0.1
+        self._reporting = asyncio.Lock()
+
+    def enable(self) -> None:
+        if self.enabled:
+            return
+        loop = asyncio.get_running_loop()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._saved_slow_duration = loop.slow_callback_duration
+        loop.set_debug(True)
+        loop.slow_callback_duration = self.slow_callback_seconds
+        logging.getLogger("asyncio").addHandler(self._slow)
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        self._sampler = StageSampler(threading.get_ident(), self.sample_interval)
+        self._sampler.start()
+        self._start_profile()
+        self._cycle_started = time.monotonic()
+        self.enabled = True
+        log(f"🔬 Профилирование включено, отчёты в {self.directory}", indent=1)
+
+    async def disable(self) -> None:
+        """Writes a report for the data collected since the last cycle and removes every hook."""
+        async with self._reporting:
+            if not self.enabled:
+                return
+            await self._write_report()
+            self.enabled = False
+        assert self._sampler is not None
+        self._sampler.stop()
+        self._sampler = None
+        if self._profile:
+            self._profile.disable()
+            self._profile = None
+        tracemalloc.stop()
+        self._snapshot = None
+        logging.getLogger("asyncio").removeHandler(self._slow)
+        loop = asyncio.get_running_loop()
+        loop.set_debug(False)
+        loop.slow_callback_duration = self._saved_slow_duration
+        log("🔬 Профилирование выключено", indent=1)
+
+    def toggle(self) -> None:
+        """SIGUSR2 handler."""
+        if self.enabled:
+            asyncio.get_running_loop().create_task(self.disable())
+        else:
+            self.enable()
+
+    def cycle_started(self) -> None:
+        if self.enabled:
+            self._cycle_started = time.monotonic()
+
+    async def cycle_finished(self) -> None:
+        async with self._reporting:
+            if self.enabled:
+                await self._write_report()
+
+    async def _write_report(self) -> None:
+        assert self._sampler is not None
+        self._cycle += 1
+        profile, self._profile = self._profile, None
+        if profile:
+            profile.disable()
+        samples = self._sampler.collect()
+        slow, self._slow.records = self._slow.records, []
+        duration = time.monotonic() - self._cycle_started
+        previous = self._snapshot
+        self._snapshot = await asyncio.to_thread(_take_snapshot)
+        report = await asyncio.to_thread(self._report, self._cycle, duration, samples, slow, previous, self._snapshot)
+        if profile:
+            await asyncio.to_thread(profile.dump_stats, self.directory / f"cycle-{self._cycle:04d}.prof")
+        path = self.directory / f"cycle-{self._cycle:04d}.txt"
+        await asyncio.to_thread(path.write_text, report, "utf-8")
+        self._start_profile()
+        log(f"🔬 Отчёт профилирования: {path}", indent=1)
+
+    def _start_profile(self) -> None:
+        self._profile = cProfile.Profile()
+        try:
+            self._profile.enable()
+        except ValueError as e:
+            # Another profiler is attached to the process
+            log(f"⚠️ cProfile недоступен: {e}", indent=1, level=logging.WARNING)
+            self._profile = None
+
+    def _report(
+        self,
+        cycle: int,
+        duration: float,
+        samples: Samples,
+        slow: list[str],
+        previous: tracemalloc.Snapshot | None,
+        snapshot: tracemalloc.Snapshot,
+    ) -> str:
+        counts, self_time, inclusive = samples
+        lines = [f"Cycle {cycle}: {datetime.now():%Y-%m-%d %H:%M:%S}, {duration:.1f} s", ""]
+
+        total = sum(counts.values()) or 1
+        lines.append(f"== Hot functions by stage (sampled every {self.sample_interval * 1000:.0f} ms) ==")
+        for stage, count in counts.most_common():
+            lines.append(f"[{stage}] {count} samples, {count / total:.0%} of the cycle")
+            if stage == "idle":
+                continue
+            lines.append("   self   incl  function")
+            for function, hits in self_time[stage].most_common(TOP_FUNCTIONS):
+                lines.append(f"  {hits:5d}  {inclusive[stage][function]:5d}  {function}")
+            lines.append("  inclusive:")
+            for function, hits in inclusive[stage].most_common(TOP_FUNCTIONS):
+                lines.append(f"         {hits:5d}  {function}")
+        lines.append("")
+
+        lines.append(f"== Callbacks that blocked the loop for more than {self.slow_callback_seconds:.3f} s ==")
+        lines.extend(slow or ["none"])
+        lines.append("")
+
+        current, peak = tracemalloc.get_traced_memory()
+        lines.append(f"== Memory: {current / 2**20:.1f} MB traced, peak {peak / 2**20:.1f} MB ==")
+        lines.append("Top allocators:")
+        lines.extend(f"  {stat}" for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS])
+        if previous is not None:
+            lines.append("Growth since the previous report:")
+            growth = [s for s in snapshot.compare_to(previous, "lineno") if s.size_diff > 0]
+            lines.extend(f"  {stat}" for stat in growth[:TOP_ALLOCATIONS])
+        return "\n".join(lines) + "\n"
+
+
+profiler = Profiler()
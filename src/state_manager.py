@@ -1,5 +1,7 @@
 import asyncio
+import logging
 import os
+import weakref
 
 import aiofiles
 import yaml
@@ -8,6 +10,13 @@ from .config import settings
 from .dto import State
 from .printer import log
 
+# Lane workers commit positions while the poll loop reads them; one lock per event loop (tests run several)
+_locks: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock] = weakref.WeakKeyDictionary()
+
+
+def _state_lock() -> asyncio.Lock:
+    return _locks.setdefault(asyncio.get_running_loop(), asyncio.Lock())
+
 
 async def _load_state() -> State:
     """Loads the state from the YAML file."""
@@ -23,25 +32,34 @@ async def _load_state() -> State:
 
 
 async def _save_state(state: State) -> None:
-    """Saves the state to the YAML file."""
-    async with aiofiles.open(settings.app.state_file, "w") as f:
-        content = await asyncio.to_thread(yaml.dump, state.model_dump(mode="json"), indent=4)
+    """Saves the state to the YAML file, replacing it at once so that a reader never sees it half-written."""
+    content = await asyncio.to_thread(yaml.dump, state.model_dump(mode="json"), indent=4)
+    temp_path = f"{settings.app.state_file}.tmp"
+    async with aiofiles.open(temp_path, "w") as f:
         await f.write(content)
+    await asyncio.to_thread(os.replace, temp_path, settings.app.state_file)
 
 
 async def get_last_post_id(domain: str) -> int:
     """Reads the last processed post ID for a specific domain from the state file."""
-    log(f"💾 Читаю ID последнего поста для {domain} из {settings.app.state_file}...", indent=1, padding_top=1)
-    state = await _load_state()
+    log(
+        f"💾 Читаю ID последнего поста для {domain} из {settings.app.state_file}...",
+        indent=1,
+        padding_top=1,
+        level=logging.DEBUG,
+    )
+    async with _state_lock():
+        state = await _load_state()
     post_id = state.root.get(domain, 0)
-    log(f"✅ ID последнего поста для {domain}: {post_id}", indent=1)
+    log(f"✅ ID последнего поста для {domain}: {post_id}", indent=1, level=logging.DEBUG)
     return post_id
 
 
 async def set_last_post_id(domain: str, post_id: int) -> None:
     """Writes the last processed post ID for a specific domain to the state file."""
-    log(f"💾 Записываю ID последнего поста для {domain} в {settings.app.state_file}...", indent=3)
-    state = await _load_state()
-    state.root[domain] = post_id
-    await _save_state(state)
-    log(f"✅ ID последнего поста для {domain} обновлен: {post_id}", indent=3)
+    log(f"💾 Записываю ID последнего поста для {domain} в {settings.app.state_file}...", indent=3, level=logging.DEBUG)
+    async with _state_lock():
+        state = await _load_state()
+        state.root[domain] = post_id
+        await _save_state(state)
+    log(f"✅ ID последнего поста для {domain} обновлен: {post_id}", indent=3, level=logging.DEBUG)
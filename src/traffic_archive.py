@@ -0,0 +1,284 @@
+"""
+Capture and replay of VK traffic.
+
+In capture mode every request made by the VK client (wall.get and photo fetches) and every
+video downloaded by yt-dlp is written to a local archive together with its timing. In replay
+mode the archive is served back through the same client, so a real day of traffic can be
+reproduced and profiled offline.
+
+Imports nothing heavy: the replay video worker runs in a spawned process.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import hashlib
+import json
+import logging
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Protocol, cast
+
+import httpx
+
+from .printer import log
+
+INDEX_FILE = "index.jsonl"
+BODIES_DIR = "bodies"
+STATE_FILE = "state.yaml"
+BINDING_STORE_FILE = "bindings.db"
+SECRET_PARAMS = frozenset({"access_token"})
+# Only these are replayed; the rest describe the original connection
+KEPT_HEADERS = ("content-type", "content-encoding")
+CHUNK_SIZE = 1024 * 1024
+
+
+def request_key(method: str, url: httpx.URL) -> str:
+    """Identifies a request regardless of parameter order and without secrets."""
+    params = sorted((k, v) for k, v in url.params.multi_items() if k not in SECRET_PARAMS)
+    return f"{method} {url.copy_with(params=params)}"
+
+
+@dataclass(frozen=True)
+class Exchange:
+    """One recorded response: an HTTP request of the VK client or a video downloaded by yt-dlp."""
+
+    kind: str
+    key: str
+    at: float
+    duration: float
+    status: int
+    headers: dict[str, str]
+    size: int
+    body: str | None
+    name: str = ""
+
+
+class TrafficArchive:
+    """
+    A directory with an append-only index of exchanges and their bodies, stored once per content hash.
+    With `max_body_bytes` media bodies are cut to that size and padded back with zeros on replay;
+    API responses are always kept whole.
+    """
+
+    def __init__(self, path: Path, max_body_bytes: int = 0) -> None:
+        self.path = path
+        self.max_body_bytes = max_body_bytes
+        self._lock = threading.Lock()
+        (path / BODIES_DIR).mkdir(parents=True, exist_ok=True)
+
+    def record(
+        self,
+        kind: str,
+        key: str,
+        at: float,
+        duration: float,
+        status: int,
+        headers: dict[str, str],
+        body: bytes,
+    ) -> None:
+        size = len(body)
+        if self._cappable(headers):
+            body = body[: self.max_body_bytes]
+        digest = hashlib.sha256(body).hexdigest()
+        body_path = self.path / BODIES_DIR / digest
+        with self._lock:
+            if not body_path.exists():
+                body_path.write_bytes(body)
+            self._append(Exchange(kind, key, at, duration, status, headers, size, digest))
+
+    def record_video(self, url: str, path: Path, duration: float) -> None:
+        """Stores a video downloaded by yt-dlp; called from a worker thread once the file is complete."""
+        size = path.stat().st_size
+        remaining = self.max_body_bytes or size
+        digest = hashlib.sha256()
+        partial = self.path / BODIES_DIR / f".{path.name}.{threading.get_ident()}"
+        with open(path, "rb") as src, open(partial, "wb") as dst:
+            while remaining > 0 and (chunk := src.read(min(remaining, CHUNK_SIZE))):
+                digest.update(chunk)
+                dst.write(chunk)
+                remaining -= len(chunk)
+        body_path = self.path / BODIES_DIR / digest.hexdigest()
+        with self._lock:
+            if body_path.exists():
+                partial.unlink()
+            else:
+                partial.replace(body_path)
+            headers = {"content-type": "video/mp4"}
+            at = time.time() - duration
+            self._append(Exchange("video", url, at, duration, 200, headers, size, digest.hexdigest(), path.name))
+
+    def load(self) -> list[Exchange]:
+        index = self.path / INDEX_FILE
+        if not index.exists():
+            return []
+        with open(index, encoding="utf-8") as f:
+            return [Exchange(**json.loads(line)) for line in f if line.strip()]
+
+    def body(self, exchange: Exchange) -> bytes:
+        """The recorded bytes, padded with zeros to the original size if they were cut."""
+        if exchange.body is None:
+            return b""
+        data = (self.path / BODIES_DIR / exchange.body).read_bytes()
+        return data + b"\0" * (exchange.size - len(data))
+
+    def write_body(self, exchange: Exchange, path: Path) -> None:
+        """Like body(), streamed to a file so that a large video is never held in memory."""
+        with open(path, "wb") as dst:
+            if exchange.body is not None:
+                with open(self.path / BODIES_DIR / exchange.body, "rb") as src:
+                    shutil.copyfileobj(src, dst, CHUNK_SIZE)
+            padding = exchange.size - dst.tell()
+            while padding > 0:
+                dst.write(b"\0" * min(padding, CHUNK_SIZE))
+                padding -= CHUNK_SIZE
+
+    def save_state(self, state_file: Path) -> None:
+        """Keeps the position the capture started from, so that a replay sees the same posts as new."""
+        target = self.path / STATE_FILE
+        if state_file.exists() and not target.exists():
+            shutil.copyfile(state_file, target)
+
+    def restore_state(self, state_file: Path) -> None:
+        """Resets `state_file` to the captured starting position; every replay starts from the same point."""
+        source = self.path / STATE_FILE
+        if source.exists():
+            shutil.copyfile(source, state_file)
+        else:
+            state_file.unlink(missing_ok=True)
+
+    def save_binding_store(self, store_path: Path) -> None:
+        """Like save_state() for the binding store, which holds the positions when it is enabled."""
+        target = self.path / BINDING_STORE_FILE
+        if not store_path.exists() or target.exists():
+            return
+        # The backup API copies a consistent snapshot even while the store is in use
+        with closing(sqlite3.connect(store_path)) as source, closing(sqlite3.connect(target)) as copy:
+            source.backup(copy)
+
+    def restore_binding_store(self, store_path: Path) -> None:
+        """Like restore_state() for the binding store: its bindings and the captured positions."""
+        for leftover in (
+            store_path.with_name(f"{store_path.name}-wal"),
+            store_path.with_name(f"{store_path.name}-shm"),
+        ):
+            leftover.unlink(missing_ok=True)
+        source = self.path / BINDING_STORE_FILE
+        if source.exists():
+            shutil.copyfile(source, store_path)
+        else:
+            store_path.unlink(missing_ok=True)
+
+    def _cappable(self, headers: dict[str, str]) -> bool:
+        content_type = headers.get("content-type", "")
+        return bool(self.max_body_bytes) and "json" not in content_type and "content-encoding" not in headers
+
+    def _append(self, exchange: Exchange) -> None:
+        with open(self.path / INDEX_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(asdict(exchange), ensure_ascii=False) + "\n")
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """Passes requests to the network and writes each response to the archive."""
+
+    def __init__(self, archive: TrafficArchive, inner: httpx.AsyncBaseTransport | None = None) -> None:
+        self.archive = archive
+        self.inner = inner or httpx.AsyncHTTPTransport(http2=True)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        at = time.time()
+        started = time.perf_counter()
+        response = await self.inner.handle_async_request(request)
+        try:
+            # Raw bytes: the client decodes them, and a replay hands the same bytes to the same decoder
+            body = b"".join([chunk async for chunk in cast(httpx.AsyncByteStream, response.stream)])
+        finally:
+            await response.aclose()
+        duration = time.perf_counter() - started
+        headers = {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers}
+        key = request_key(request.method, request.url)
+        try:
+            await asyncio.to_thread(self.archive.record, "http", key, at, duration, response.status_code, headers, body)
+        except OSError as e:
+            log(f"⚠️ Не удалось записать ответ в архив: {e}", indent=3, level=logging.WARNING)
+        return httpx.Response(response.status_code, headers=headers, content=body, request=request)
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """
+    Serves the archive instead of the network. With `speed` > 0 recorded latencies are divided by it,
+    and a request gets the response that was current at the same point of the recorded timeline
+    (so new posts show up when they did, `speed` times faster). With `speed` 0 there are no delays
+    and repeated requests walk through the recorded responses one by one.
+    """
+
+    def __init__(self, archive: TrafficArchive, speed: float = 1.0) -> None:
+        self.archive = archive
+        self.speed = speed
+        self._by_key: dict[str, list[Exchange]] = {}
+        for exchange in sorted(archive.load(), key=lambda e: e.at):
+            if exchange.kind == "http":
+                self._by_key.setdefault(exchange.key, []).append(exchange)
+        self._origin = min((e[0].at for e in self._by_key.values()), default=0.0)
+        self._started: float | None = None
+        self._served: dict[str, int] = {}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = request_key(request.method, request.url)
+        exchange = self.pick(key)
+        if exchange is None:
+            return httpx.Response(404, text=f"Not in the archive: {key}", request=request)
+        if self.speed > 0 and exchange.duration:
+            await asyncio.sleep(exchange.duration / self.speed)
+        body = await asyncio.to_thread(self.archive.body, exchange)
+        return httpx.Response(exchange.status, headers=exchange.headers, content=body, request=request)
+
+    def pick(self, key: str) -> Exchange | None:
+        exchanges = self._by_key.get(key)
+        if not exchanges:
+            return None
+        if self.speed <= 0:
+            index = self._served.get(key, 0)
+            self._served[key] = index + 1
+            return exchanges[min(index, len(exchanges) - 1)]
+        if self._started is None:
+            self._started = time.monotonic()
+        clock = self._origin + (time.monotonic() - self._started) * self.speed
+        index = bisect.bisect_right([e.at for e in exchanges], clock) - 1
+        return exchanges[max(index, 0)]
+
+
+class _Sender(Protocol):
+    """The sending end of multiprocessing.Pipe (Connection, or PipeConnection on Windows)."""
+
+    def send(self, obj: Any) -> None: ...
+
+
+def replay_video(archive_path: str, speed: float, url: str, opts: dict[str, Any], out: _Sender) -> None:
+    """
+    Stands in for ytdlp_worker.download during a replay: recreates the recorded video next to `outtmpl`
+    after its recorded download time divided by `speed`. Exits without sending if the video was not captured.
+    """
+    archive = TrafficArchive(Path(archive_path))
+    recorded = [e for e in archive.load() if e.kind == "video" and e.key == url]
+    if not recorded:
+        return
+    exchange = recorded[-1]
+    delay = exchange.duration / speed if speed > 0 else 0.0
+    started = time.monotonic()
+    while (elapsed := time.monotonic() - started) < delay:
+        # Report progress like yt-dlp does, so the stall watchdog sees a long download moving
+        out.send(("progress", int(exchange.size * elapsed / delay), exchange.size))
+        time.sleep(min(1.0, delay - elapsed))
+    path = Path(str(opts["outtmpl"])).parent / exchange.name
+    archive.write_body(exchange, path)
+    out.send(("done", str(path)))
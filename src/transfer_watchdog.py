@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+from .config import settings
+from .metrics import TRANSFER_STALLS
+from .printer import log
+
+T = TypeVar("T")
+
+
+class TransferStalledError(RuntimeError):
+    """A download or upload made no progress for the stall window and was aborted."""
+
+
+class Transfer:
+    """Byte progress of one download or upload. progress() may be called from any thread."""
+
+    def __init__(self, kind: str, label: str) -> None:
+        self.kind = kind
+        self.label = label
+        self.current = 0
+        self.total = 0
+        self.last_progress = time.monotonic()
+
+    def progress(self, current: int, total: int = 0) -> None:
+        # Any change counts: yt-dlp restarts the count for every format it merges
+        if current != self.current:
+            self.current = current
+            self.last_progress = time.monotonic()
+        self.total = total or self.total
+
+
+class TransferWatchdog:
+    """
+    Aborts transfers that stop moving. watch() runs a transfer and cancels it with TransferStalledError when
+    no progress is reported for `stall_seconds`; callers treat that like any other failed attempt and retry.
+    It only wakes up when a transfer could have stalled, never on a fixed tick.
+    """
+
+    def __init__(self, stall_seconds: float | None = None) -> None:
+        self._stall_seconds = stall_seconds
+
+    @property
+    def stall_seconds(self) -> float:
+        return self._stall_seconds if self._stall_seconds is not None else settings.app.transfer_stall_seconds
+
+    async def watch(self, kind: str, label: str, start: Callable[[Transfer], Awaitable[T]]) -> T:  # noqa: UP047
+        """Runs `start(transfer)`; the transfer reports progress through `transfer.progress`."""
+        transfer = Transfer(kind, label)
+        stall_seconds = self.stall_seconds
+        if not stall_seconds:
+            return await start(transfer)
+
+        task = asyncio.ensure_future(start(transfer))
+        try:
+            while True:
+                deadline = transfer.last_progress + stall_seconds
+                await asyncio.wait({task}, timeout=max(deadline - time.monotonic(), 0.0))
+                if task.done():
+                    return task.result()
+                if time.monotonic() - transfer.last_progress >= stall_seconds:
+                    break
+        finally:
+            if not task.done():
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+
+        TRANSFER_STALLS.labels(kind=kind).inc()
+        done = f"{transfer.current / 2**20:.1f}" + (f"/{transfer.total / 2**20:.1f}" if transfer.total else "")
+        message = f"нет прогресса {stall_seconds:.0f} с ({done} МБ)"
+        log(f"⚠️ {label}: {message}, прерываю.", indent=4, level=logging.WARNING)
+        raise TransferStalledError(message)
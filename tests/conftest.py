@@ -0,0 +1,6 @@
+import os
+
+# src.config builds the settings at import time; give it credentials so modules that read them can be imported.
+os.environ.setdefault("VK_SERVICE_TOKEN", "test-token")
+os.environ.setdefault("TELEGRAM_API_ID", "1")
+os.environ.setdefault("TELEGRAM_API_HASH", "test-hash")
@@ -0,0 +1,85 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.binding_store import BindingStore, main
+from src.config import BindingConfig, settings
+from src.managers import binding_manager
+from src.managers.binding_manager import BindingManager
+
+
+def binding_json(domain: str, channel: str = "@news") -> str:
+    return BindingConfig.model_validate(
+        {
+            "vk": {"domain": domain, "post_count": 10, "post_source": "wall"},
+            "telegram": {"channel_ids": [channel]},
+        }
+    ).model_dump_json()
+
+
+def test_store_pages_bindings_and_indexes_their_channels(tmp_path: Path) -> None:
+    store = BindingStore(tmp_path / "bindings.db")
+    assert store.put("b", binding_json("b"), ["@news"], now=0)
+    assert store.put("a", binding_json("a"), ["@news", "@other"], now=0)
+    assert not store.put("a", binding_json("a", "@other"), ["@other"], now=1)
+
+    assert [domain for domain, _ in store.page("", 1)] == ["a"]
+    assert [domain for domain, _ in store.page("a", 10)] == ["b"]
+    assert store.domains_for_channel("@news") == ["b"]
+    assert store.domains_for_channel("@other") == ["a"]
+
+    assert store.remove("a") and not store.remove("a")
+    assert store.get("a") is None and store.count() == 1
+    store.close()
+
+
+def test_manager_iterates_every_page_and_skips_an_invalid_row(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(binding_manager, "PAGE_SIZE", 2)
+    store = BindingStore(tmp_path / "bindings.db")
+    for domain in ["a", "b", "d", "e"]:
+        store.put(domain, binding_json(domain), ["@news"], now=0)
+    store.put("c", '{"vk": {"domain": "c"}}', [], now=0)
+
+    async def scenario() -> list[str]:
+        manager = BindingManager(store)
+        return [binding.vk.domain async for binding in manager.iterate()]
+
+    assert asyncio.run(scenario()) == ["a", "b", "d", "e"]
+    store.close()
+
+
+def test_position_is_imported_from_the_state_file_once(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    state_file = tmp_path / "state.yaml"
+    state_file.write_text("durov: 41\n")
+    monkeypatch.setattr(settings.app, "state_file", str(state_file))
+    store = BindingStore(tmp_path / "bindings.db")
+
+    async def scenario() -> tuple[int, int]:
+        manager = BindingManager(store)
+        imported = await manager.last_post_id("durov")
+        await manager.set_last_post_id("durov", 42)
+        return imported, await manager.last_post_id("durov")
+
+    assert asyncio.run(scenario()) == (41, 42)
+    # state.yaml is left as it was
+    assert state_file.read_text() == "durov: 41\n"
+    store.close()
+
+
+def test_cli_adds_lists_and_removes_bindings(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    path = str(tmp_path / "bindings.db")
+    assert main(["--path", path, "add", "durov", "--channel", "@news", "--channel", "@other"]) == 0
+    assert main(["--path", path, "add", "bad", "--channel", "@news", "--post-count", "0"]) == 2
+    assert main(["--path", path, "list", "--channel", "@other"]) == 0
+    assert main(["--path", path, "remove", "durov", "missing"]) == 1
+
+    out = capsys.readouterr().out
+    assert "➕ Добавлен binding durov" in out
+    assert out.count("durov\t") == 1
+    store = BindingStore(Path(path))
+    assert store.count() == 0
+    store.close()
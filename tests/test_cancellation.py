@@ -0,0 +1,83 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.cancellation import run_with_grace, sleep_or_shutdown, until_shutdown, wait_event_or_shutdown
+
+
+def test_sleep_returns_after_the_delay_and_raises_on_shutdown() -> None:
+    async def scenario() -> None:
+        shutdown_event = asyncio.Event()
+        await sleep_or_shutdown(0.01, shutdown_event)
+
+        asyncio.get_running_loop().call_later(0.02, shutdown_event.set)
+        started = time.monotonic()
+        with pytest.raises(asyncio.CancelledError):
+            await sleep_or_shutdown(30, shutdown_event)
+        assert time.monotonic() - started < 1
+
+    asyncio.run(scenario())
+
+
+def test_until_shutdown_cancels_the_wrapped_work() -> None:
+    async def scenario() -> None:
+        shutdown_event = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def download() -> str:
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return "done"
+
+        assert await until_shutdown(asyncio.sleep(0, "ok"), shutdown_event) == "ok"
+
+        asyncio.get_running_loop().call_later(0.02, shutdown_event.set)
+        with pytest.raises(asyncio.CancelledError):
+            await until_shutdown(download(), shutdown_event)
+        assert cancelled.is_set()
+
+    asyncio.run(scenario())
+
+
+def test_wait_event_reports_whether_the_event_fired() -> None:
+    async def scenario() -> None:
+        shutdown_event = asyncio.Event()
+        changed = asyncio.Event()
+        assert not await wait_event_or_shutdown(changed, 0.01, shutdown_event)
+
+        asyncio.get_running_loop().call_later(0.01, changed.set)
+        assert await wait_event_or_shutdown(changed, 30, shutdown_event)
+
+        changed.clear()
+        shutdown_event.set()
+        with pytest.raises(asyncio.CancelledError):
+            await wait_event_or_shutdown(changed, 30, shutdown_event)
+
+    asyncio.run(scenario())
+
+
+def test_run_with_grace_lets_short_work_finish_and_cancels_the_rest() -> None:
+    async def work(seconds: float, finished: list[float]) -> None:
+        await asyncio.sleep(seconds)
+        finished.append(seconds)
+
+    async def scenario() -> None:
+        finished: list[float] = []
+        shutdown_event = asyncio.Event()
+        shutdown_event.set()
+        await run_with_grace(work(0.01, finished), shutdown_event, grace=1)
+        assert finished == [0.01]
+
+        started = time.monotonic()
+        await run_with_grace(work(30, finished), shutdown_event, grace=0.05)
+        assert finished == [0.01]
+        assert time.monotonic() - started < 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,93 @@
+import asyncio
+import os
+import random
+import sys
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.config import CircuitBreakerConfig
+from src.managers.circuit_breaker import CircuitBreaker
+from src.managers.vk_client_manager import VKAPIError, classify_error
+
+DELETED = VKAPIError(18, "User was deleted or banned")
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_breaker(tmp_path: Path, clock: Clock) -> CircuitBreaker:
+    config = CircuitBreakerConfig(
+        failure_threshold=2,
+        base_cooldown_seconds={"not_found": 100},
+        max_cooldown_seconds=300,
+        state_file=tmp_path / "breakers.json",
+    )
+    return CircuitBreaker(config, clock=clock, rng=random.Random(1))
+
+
+def test_errors_are_classified() -> None:
+    request = httpx.Request("GET", "https://api.vk.com/method/wall.get")
+    assert classify_error(VKAPIError(5, "User authorization failed")) == "auth"
+    assert classify_error(DELETED) == "not_found"
+    assert classify_error(VKAPIError(6, "Too many requests per second")) == "rate_limit"
+    assert classify_error(httpx.ConnectTimeout("timeout", request=request)) == "network"
+    response = httpx.Response(502, request=request)
+    assert classify_error(httpx.HTTPStatusError("bad gateway", request=request, response=response)) == "network"
+    assert classify_error(ValueError("bad json")) == "other"
+
+
+def test_circuit_opens_probes_and_backs_off(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        clock = Clock()
+        breaker = make_breaker(tmp_path, clock)
+        await breaker.start()
+
+        await breaker.record_failure("gone", DELETED)
+        assert breaker.allow("gone")
+        await breaker.record_failure("gone", DELETED)
+        assert not breaker.allow("gone")
+        assert breaker.allow("healthy")
+
+        # Cooldown is jittered between half and all of the base
+        clock.now += 49
+        assert not breaker.allow("gone")
+        clock.now += 52
+        assert breaker.allow("gone")
+
+        # A failed probe reopens at once with twice the cooldown
+        await breaker.record_failure("gone", DELETED)
+        clock.now += 99
+        assert not breaker.allow("gone")
+        clock.now += 102
+        assert breaker.allow("gone")
+
+        await breaker.record_success("gone")
+        await breaker.record_failure("gone", DELETED)
+        assert breaker.allow("gone")
+
+    asyncio.run(scenario())
+
+
+def test_open_circuit_survives_a_restart(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        clock = Clock()
+        breaker = make_breaker(tmp_path, clock)
+        await breaker.start()
+        await breaker.record_failure("gone", DELETED)
+        await breaker.record_failure("gone", DELETED)
+        await breaker.stop()
+
+        restarted = make_breaker(tmp_path, clock)
+        await restarted.start()
+        assert not restarted.allow("gone")
+        clock.now += 101
+        assert restarted.allow("gone")
+
+    asyncio.run(scenario())
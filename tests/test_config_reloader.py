@@ -0,0 +1,105 @@
+import asyncio
+import os
+import sys
+from collections.abc import Generator
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.config import BindingConfig, Settings, ShardingConfig, settings
+from src.config_reloader import ConfigReloader, diff_bindings
+
+
+def binding(domain: str, channels: list[str] | None = None, post_count: int = 10) -> BindingConfig:
+    return BindingConfig.model_validate(
+        {
+            "vk": {"domain": domain, "post_count": post_count, "post_source": "wall"},
+            "telegram": {"channel_ids": channels or ["@news"]},
+        }
+    )
+
+
+@pytest.fixture
+def restore_settings() -> Generator[None]:
+    saved = settings.model_copy()
+    yield
+    for name in Settings.model_fields:
+        setattr(settings, name, getattr(saved, name))
+
+
+def test_diff_bindings_by_domain() -> None:
+    old = [binding("kept"), binding("gone"), binding("edited", post_count=10)]
+    new = [binding("kept"), binding("edited", post_count=20), binding("fresh")]
+
+    diff = diff_bindings(old, new)
+
+    assert diff.added == ["fresh"]
+    assert diff.removed == ["gone"]
+    assert diff.changed == ["edited"]
+    assert not diff_bindings(old, old)
+
+
+@pytest.mark.usefixtures("restore_settings")
+def test_reload_applies_bindings_and_keeps_restart_only_fields() -> None:
+    session_name = settings.app.session_name
+    new = settings.model_copy(
+        update={
+            "bindings": [binding("fresh", ["@other"])],
+            "app": settings.app.model_copy(update={"wait_time_seconds": 5, "session_name": "another"}),
+            "parallel_upload": settings.parallel_upload.model_copy(update={"min_size_mb": 50, "connections": 2}),
+        }
+    )
+    reloader = ConfigReloader(asyncio.Event(), loader=lambda: new)
+
+    diff = asyncio.run(reloader.reload())
+
+    assert diff is not None and diff.added == ["fresh"]
+    assert [b.vk.domain for b in settings.bindings] == ["fresh"]
+    assert settings.app.wait_time_seconds == 5
+    assert settings.app.session_name == session_name
+    assert (settings.parallel_upload.min_size_mb, settings.parallel_upload.connections) == (50, 2)
+    assert reloader.changed.is_set()
+
+
+@pytest.mark.usefixtures("restore_settings")
+def test_invalid_config_keeps_running_one() -> None:
+    before = list(settings.bindings)
+
+    def broken() -> Settings:
+        return Settings.model_validate({**settings.model_dump(by_alias=True), "bindings": []})
+
+    reloader = ConfigReloader(asyncio.Event(), loader=broken)
+
+    assert asyncio.run(reloader.reload()) is None
+    assert settings.bindings == before
+    assert not reloader.changed.is_set()
+
+
+def test_best_effort_ordering_is_rejected_with_sharding() -> None:
+    raw = {
+        **settings.model_dump(by_alias=True),
+        "POSTBRIDGE_INSTANCE_ID": "node-1",
+        "sharding": {"enabled": True, "instances": ["node-1"]},
+    }
+    assert Settings.model_validate(raw).sharding.enabled
+    with pytest.raises(ValueError, match="strict"):
+        Settings.model_validate({**raw, "lanes": {"ordering": "best_effort"}})
+
+
+@pytest.mark.usefixtures("restore_settings")
+def test_reload_cannot_switch_a_sharded_process_to_best_effort() -> None:
+    settings.sharding = ShardingConfig(enabled=True, instances=["node-1"])
+    settings.instance_id = "node-1"
+    new = settings.model_copy(
+        update={
+            "sharding": ShardingConfig(enabled=False),
+            "lanes": settings.lanes.model_copy(update={"ordering": "best_effort", "slow_backlog": 9}),
+        }
+    )
+    reloader = ConfigReloader(asyncio.Event(), loader=lambda: new)
+
+    asyncio.run(reloader.reload())
+
+    assert settings.sharding.enabled
+    assert settings.lanes.ordering == "strict"
+    assert settings.lanes.slow_backlog == 9
@@ -0,0 +1,114 @@
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.config import DiskBudgetConfig, ShardingConfig, settings
+from src.managers.download_space_manager import DownloadSpaceManager
+
+
+def write(path: Path, size: int, age: float = 0.0) -> Path:
+    path.write_bytes(b"\0" * size)
+    if age:
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+def make_manager(tmp_path: Path, max_size_mb: int = 0) -> DownloadSpaceManager:
+    config = DiskBudgetConfig(max_size_mb=max_size_mb, orphan_max_age_seconds=60)
+    return DownloadSpaceManager(asyncio.Event(), directories=[tmp_path], config=config)
+
+
+def test_release_deletes_tracked_files(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        manager = make_manager(tmp_path)
+        photo = write(tmp_path / "a.jpg", 100)
+        thumb = write(tmp_path / "a.thumb.jpg", 10)
+        await manager.track("post", photo)
+        await manager.track("post", thumb)
+        assert manager.used_bytes == 110
+
+        await manager.release("post")
+
+        assert manager.used_bytes == 0
+        assert not photo.exists() and not thumb.exists()
+
+    asyncio.run(scenario())
+
+
+def test_sweep_removes_only_old_untracked_files(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        manager = make_manager(tmp_path)
+        tracked = write(tmp_path / "live.mp4", 10, age=3600)
+        orphan = write(tmp_path / "orphan.mp4", 10, age=3600)
+        fresh = write(tmp_path / "partial.mp4.part", 10)
+        await manager.track("post", tracked)
+
+        assert await manager.sweep() == 1
+
+        assert tracked.exists() and fresh.exists()
+        assert not orphan.exists()
+
+    asyncio.run(scenario())
+
+
+def test_sharded_instance_sweeps_only_its_own_files(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings.downloader, "output_path", "downloads")
+    monkeypatch.setattr(settings, "sharding", ShardingConfig(enabled=True, instances=["node-1", "node-2"]))
+    monkeypatch.setattr(settings, "instance_id", "node-1")
+
+    async def scenario() -> None:
+        config = DiskBudgetConfig(orphan_max_age_seconds=60)
+        manager = DownloadSpaceManager(asyncio.Event(), config=config)
+        assert manager.directories == [Path("downloads/node-1")]
+        for directory in (Path("downloads/node-1"), Path("downloads/node-2")):
+            directory.mkdir(parents=True)
+        own = write(Path("downloads/node-1/orphan.mp4"), 10, age=3600)
+        other = write(Path("downloads/node-2/in-progress.mp4.part"), 10, age=3600)
+
+        assert await manager.sweep() == 1
+
+        assert not own.exists() and other.exists()
+
+    asyncio.run(scenario())
+
+
+def test_downloads_wait_for_room_instead_of_failing(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        manager = make_manager(tmp_path, max_size_mb=1)
+        await manager.track("first", write(tmp_path / "big.mp4", 2 * 1024 * 1024))
+
+        # A post is not held back by its own files
+        await asyncio.wait_for(manager.wait_for_room("first"), timeout=1)
+
+        waiter = asyncio.create_task(manager.wait_for_room("second"))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+
+        await manager.release("first")
+        await asyncio.wait_for(waiter, timeout=1)
+
+    asyncio.run(scenario())
+
+
+def test_shutdown_interrupts_the_wait(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        manager = make_manager(tmp_path, max_size_mb=1)
+        await manager.start()
+        await manager.track("first", write(tmp_path / "big.mp4", 2 * 1024 * 1024))
+        waiter = asyncio.create_task(manager.wait_for_room("second"))
+        await asyncio.sleep(0.05)
+
+        manager.shutdown_event.set()
+
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(waiter, timeout=1)
+        await manager.stop()
+
+    asyncio.run(scenario())
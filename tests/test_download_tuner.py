@@ -0,0 +1,82 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.config import DownloadTuningConfig
+from src.managers.download_tuner import DownloadStats, DownloadTuner
+from src.managers.ytdlp_worker import media_host, with_connections
+
+MB = 2**20
+
+
+def make_tuner(tmp_path: Path) -> DownloadTuner:
+    config = DownloadTuningConfig(min_concurrency=1, max_concurrency=8, step=2, state_file=tmp_path / "tuning.json")
+    return DownloadTuner(config)
+
+
+def stats(concurrency: int, mb_per_second: float, retries: int = 0) -> DownloadStats:
+    return DownloadStats("cdn.example", concurrency, int(mb_per_second * 10 * MB), 10.0, 100, retries)
+
+
+def test_concurrency_grows_while_throughput_does_and_settles_on_the_best(tmp_path: Path) -> None:
+    async def scenario() -> list[int]:
+        tuner = make_tuner(tmp_path)
+        await tuner.start()
+        chosen: list[int] = []
+        for concurrency, speed in [(4, 10), (6, 14), (8, 12), (6, 14)]:
+            await tuner.record(stats(concurrency, speed))
+            chosen.append(tuner.table()["cdn.example"])
+        return chosen
+
+    # 8 was slower than 6, so 6 stays without probing 8 again
+    assert asyncio.run(scenario()) == [6, 8, 6, 6]
+
+
+def test_retries_cap_a_throttling_host(tmp_path: Path) -> None:
+    async def scenario() -> list[int]:
+        tuner = make_tuner(tmp_path)
+        await tuner.start()
+        await tuner.record(stats(4, 10))
+        await tuner.record(stats(6, 20, retries=30))
+        chosen = [tuner.table()["cdn.example"]]
+        # The faster 4 is not probed past the cap again
+        await tuner.record(stats(4, 10))
+        chosen.append(tuner.table()["cdn.example"])
+        return chosen
+
+    assert asyncio.run(scenario()) == [4, 4]
+
+
+def test_chosen_values_survive_a_restart(tmp_path: Path) -> None:
+    async def scenario() -> dict[str, int]:
+        tuner = make_tuner(tmp_path)
+        await tuner.start()
+        await tuner.record(stats(4, 10))
+        await tuner.stop()
+
+        restarted = make_tuner(tmp_path)
+        await restarted.start()
+        return restarted.table()
+
+    table = asyncio.run(scenario())
+    assert table["cdn.example"] == 6
+    assert set(table) == {"", "cdn.example"}
+
+
+def test_short_downloads_are_not_measured(tmp_path: Path) -> None:
+    async def scenario() -> dict[str, int]:
+        tuner = make_tuner(tmp_path)
+        await tuner.start()
+        await tuner.record(DownloadStats("cdn.example", 4, MB, 0.5, 0, 0))
+        return tuner.table()
+
+    assert "cdn.example" not in asyncio.run(scenario())
+
+
+def test_worker_applies_the_concurrency_to_aria2c_and_finds_the_host() -> None:
+    assert with_connections(["-x", "5", "--split=5", "-k", "1M"], 7) == ["-k", "1M", "-x", "7", "-s", "7"]
+    merged = {"requested_formats": [{"url": "https://vd1.cdn.example/v.mp4"}, {"url": "https://a.example/a.m4a"}]}
+    assert media_host(merged) == "vd1.cdn.example"
+    assert media_host({"url": "https://cdn.example/v.mp4"}) == "cdn.example"
@@ -0,0 +1,155 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.config import TelegramSessionConfig, settings
+from src.dto import VideoMeta
+from src.growing_file import GrowingFile, GrowingFileError
+from src.managers.fake_telegram_client import FakeTelegramClient
+from src.managers.telegram_client_manager import UPLOAD_PART_SIZE, TelegramClientManager
+from src.transfer_watchdog import TransferWatchdog
+
+
+@pytest.fixture(autouse=True)
+def peer_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings.peer_cache, "state_file", tmp_path / "peers.json")
+    monkeypatch.setattr(settings.peer_cache, "interval_seconds", 0)
+
+
+def append(path: Path, data: bytes) -> None:
+    with open(path, "ab") as f:
+        f.write(data)
+
+
+def finish(growing: GrowingFile, final: Path) -> None:
+    growing.path.replace(final)
+    growing.finish(final, final.stat().st_size)
+
+
+def test_read_waits_for_the_bytes_to_arrive(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        partial = tmp_path / "video.mp4.part"
+        partial.touch()
+        growing = GrowingFile(partial, 8, asyncio.get_running_loop())
+        reader = asyncio.create_task(growing.read(2, 4))
+
+        await asyncio.to_thread(append, partial, b"0123")
+        growing.advance(4)
+        await asyncio.sleep(0.01)
+        assert not reader.done()
+
+        await asyncio.to_thread(append, partial, b"4567")
+        growing.advance(8)
+        assert await reader == b"2345"
+
+        # yt-dlp renames the file once it is complete
+        await asyncio.to_thread(finish, growing, tmp_path / "video.mp4")
+        assert growing.name == "video.mp4"
+        assert await growing.read(6, 4) == b"67"
+
+    asyncio.run(scenario())
+
+
+def test_failed_download_fails_the_waiting_reader(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        partial = tmp_path / "video.mp4.part"
+        partial.touch()
+        growing = GrowingFile(partial, 8, asyncio.get_running_loop())
+        reader = asyncio.create_task(growing.read(0, 8))
+        await asyncio.sleep(0)
+
+        growing.fail("загрузка прервана")
+        with pytest.raises(GrowingFileError):
+            await reader
+
+    asyncio.run(scenario())
+
+
+def test_video_is_uploaded_while_it_downloads(tmp_path: Path) -> None:
+    client = FakeTelegramClient("main")
+
+    def factory(session: TelegramSessionConfig) -> FakeTelegramClient:
+        return client
+
+    async def scenario() -> None:
+        size = 3 * UPLOAD_PART_SIZE + 100
+        partial = tmp_path / "video.mp4.part"
+        partial.touch()
+        growing = GrowingFile(partial, size, asyncio.get_running_loop())
+        manager = TelegramClientManager(asyncio.Event(), client_factory=factory)
+        await manager.start()
+        meta: asyncio.Future[VideoMeta | None] = asyncio.get_running_loop().create_future()
+        upload = asyncio.create_task(manager.send_streamed_video("@films", growing, "caption", meta))
+
+        for offset in range(0, size, UPLOAD_PART_SIZE):
+            chunk = b"v" * min(UPLOAD_PART_SIZE, size - offset)
+            await asyncio.to_thread(append, partial, chunk)
+            growing.advance(offset + len(chunk))
+            await asyncio.sleep(0.01)
+        # Everything but the processing of the complete file is done before the download finishes
+        assert client.uploaded_bytes == size
+        assert not client.sent
+
+        final = tmp_path / "video.mp4"
+        await asyncio.to_thread(finish, growing, final)
+        meta.set_result(VideoMeta(path=final, width=320, height=240, duration=2))
+        assert await upload
+        assert [(m.chat_id, m.kind, m.caption) for m in client.sent] == [("@films", "video", "caption")]
+        await manager.stop()
+
+    asyncio.run(scenario())
+
+
+def test_remuxed_video_falls_back_to_a_regular_upload(tmp_path: Path) -> None:
+    client = FakeTelegramClient("main")
+
+    def factory(session: TelegramSessionConfig) -> FakeTelegramClient:
+        return client
+
+    async def scenario() -> None:
+        partial = tmp_path / "video.mp4.part"
+        await asyncio.to_thread(append, partial, b"v" * 100)
+        growing = GrowingFile(partial, 100, asyncio.get_running_loop())
+        growing.advance(100)
+        manager = TelegramClientManager(asyncio.Event(), client_factory=factory)
+        await manager.start()
+        final = tmp_path / "video.mp4"
+        await asyncio.to_thread(finish, growing, final)
+        meta: asyncio.Future[VideoMeta | None] = asyncio.get_running_loop().create_future()
+        meta.set_result(VideoMeta(path=final, width=320, height=240, duration=2, remuxed=True))
+
+        assert not await manager.send_streamed_video("@films", growing, "caption", meta)
+        assert not client.sent
+        await manager.stop()
+
+    asyncio.run(scenario())
+
+
+def test_stalled_streamed_upload_is_aborted(tmp_path: Path) -> None:
+    client = FakeTelegramClient("main")
+
+    def factory(session: TelegramSessionConfig) -> FakeTelegramClient:
+        return client
+
+    async def scenario() -> None:
+        partial = tmp_path / "video.mp4.part"
+        await asyncio.to_thread(append, partial, b"v" * UPLOAD_PART_SIZE)
+        growing = GrowingFile(partial, 2 * UPLOAD_PART_SIZE, asyncio.get_running_loop())
+        growing.advance(UPLOAD_PART_SIZE)
+        manager = TelegramClientManager(asyncio.Event(), client_factory=factory)
+        manager.watchdog = TransferWatchdog(0.05)
+        await manager.start()
+        meta: asyncio.Future[VideoMeta | None] = asyncio.get_running_loop().create_future()
+
+        # The download stops after the first part; the upload gives up instead of waiting forever
+        sent = manager.send_streamed_video("@films", growing, "caption", meta)
+        assert not await asyncio.wait_for(sent, timeout=5)
+        assert client.uploaded_bytes == UPLOAD_PART_SIZE
+        assert not client.sent
+        await manager.stop()
+
+    asyncio.run(scenario())
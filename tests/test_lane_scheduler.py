@@ -0,0 +1,197 @@
+import asyncio
+import os
+import sys
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+
+import pytest
+import yaml
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.config import LanesConfig, settings
+from src.dto import Attachment, Post, Video
+from src.lane_scheduler import LaneScheduler, PostJob, estimate_cost
+from src.managers.shard_manager import ShardManager
+
+
+def make_post(post_id: int, video_seconds: int | None = None) -> Post:
+    attachments: list[Attachment] = []
+    if video_seconds is not None:
+        video = Video(id=post_id, owner_id=-1, title="", duration=video_seconds)
+        attachments.append(Attachment(type="video", video=video))
+    return Post(id=post_id, owner_id=-1, from_id=-1, date=0, text="", attachments=attachments, is_pinned=None)
+
+
+class Publisher:
+    """Stands in for process_post: a post is ready once its event is set, then it is sent to every channel."""
+
+    def __init__(self) -> None:
+        self.ready: dict[int, asyncio.Event] = {}
+        self.failing: set[int] = set()
+        self.sent: list[tuple[str, int]] = []
+
+    def release(self, post_id: int) -> None:
+        self.ready.setdefault(post_id, asyncio.Event()).set()
+
+    async def __call__(self, job: PostJob, wait_turn: Callable[[str], Awaitable[None]]) -> None:
+        await self.ready.setdefault(job.post.id, asyncio.Event()).wait()
+        if job.post.id in self.failing:
+            raise RuntimeError("download failed")
+        for channel_id in job.channel_ids:
+            await wait_turn(channel_id)
+            self.sent.append((channel_id, job.post.id))
+
+
+@pytest.fixture
+def state_file(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    path = tmp_path / "state.yaml"
+    monkeypatch.setattr(settings.app, "state_file", path)
+    return path
+
+
+def make_scheduler(publisher: Publisher, ordering: str = "strict") -> LaneScheduler:
+    config = LanesConfig.model_validate({"ordering": ordering, "slow_backlog": 2})
+    return LaneScheduler(asyncio.Event(), ShardManager(asyncio.Event()), publisher, config)
+
+
+async def settle() -> None:
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+
+def read_position(state_file: Path, domain: str) -> int:
+    if not state_file.exists():
+        return 0
+    state: dict[str, int] = yaml.safe_load(state_file.read_text()) or {}
+    return state.get(domain, 0)
+
+
+async def position(state_file: Path, domain: str, expected: int) -> int:
+    """Waits for the state file, which is written from a thread, to reach the expected position."""
+    current = 0
+    for _ in range(200):
+        current = await asyncio.to_thread(read_position, state_file, domain)
+        if current == expected:
+            break
+        await asyncio.sleep(0.01)
+    return current
+
+
+def test_cost_estimate_sends_long_videos_to_the_slow_lane() -> None:
+    assert estimate_cost(make_post(1)) == 0
+    assert estimate_cost(make_post(1, video_seconds=60)) == 90
+    assert estimate_cost(make_post(1, video_seconds=1800)) > LanesConfig().slow_post_cost
+
+
+def test_cheap_post_of_another_binding_does_not_wait_for_a_long_video(state_file: Path) -> None:
+    async def scenario() -> None:
+        publisher = Publisher()
+        scheduler = make_scheduler(publisher)
+        await scheduler.start()
+        assert scheduler.submit("films", make_post(10, video_seconds=1800), ["@films"])
+        assert scheduler.submit("news", make_post(20), ["@news"])
+
+        publisher.release(20)
+        await settle()
+        assert publisher.sent == [("@news", 20)]
+        assert await position(state_file, "news", 20) == 20
+
+        publisher.release(10)
+        await scheduler.stop()
+        assert publisher.sent == [("@news", 20), ("@films", 10)]
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize(("ordering", "expected"), [("strict", [1, 2]), ("best_effort", [2, 1])])
+def test_channel_order_is_kept_only_in_strict_mode(state_file: Path, ordering: str, expected: list[int]) -> None:
+    async def scenario() -> None:
+        publisher = Publisher()
+        scheduler = make_scheduler(publisher, ordering)
+        await scheduler.start()
+        scheduler.submit("films", make_post(1, video_seconds=1800), ["@shared"])
+        scheduler.submit("news", make_post(2), ["@shared"])
+
+        publisher.release(2)
+        await settle()
+        publisher.release(1)
+        await scheduler.stop()
+        assert [post_id for _, post_id in publisher.sent] == expected
+
+    asyncio.run(scenario())
+
+
+class RecordingShardManager(ShardManager):
+    def __init__(self) -> None:
+        super().__init__(asyncio.Event())
+        self.events: list[tuple[str, int]] = []
+
+    async def begin_post(self, domain: str, post_id: int) -> None:
+        self.events.append(("begin", post_id))
+        await super().begin_post(domain, post_id)
+
+    async def commit_post(self, domain: str, post_id: int) -> None:
+        await super().commit_post(domain, post_id)
+        self.events.append(("commit", post_id))
+
+
+def test_next_post_of_a_binding_begins_after_the_previous_one_is_committed(state_file: Path) -> None:
+    async def scenario() -> list[tuple[str, int]]:
+        publisher = Publisher()
+        shard_manager = RecordingShardManager()
+        config = LanesConfig.model_validate({"ordering": "strict", "fast_workers": 2})
+        scheduler = LaneScheduler(asyncio.Event(), shard_manager, publisher, config)
+        await scheduler.start()
+        scheduler.submit("news", make_post(1), ["@news"])
+        scheduler.submit("news", make_post(2), ["@news"])
+
+        publisher.release(2)
+        publisher.release(1)
+        await scheduler.stop()
+        return shard_manager.events
+
+    assert asyncio.run(scenario()) == [("begin", 1), ("commit", 1), ("begin", 2), ("commit", 2)]
+
+
+def test_failed_post_holds_back_the_binding_position(state_file: Path) -> None:
+    async def scenario() -> None:
+        publisher = Publisher()
+        publisher.failing.add(2)
+        scheduler = make_scheduler(publisher, "best_effort")
+        await scheduler.start()
+        for post_id in (1, 2, 3):
+            scheduler.submit("news", make_post(post_id), ["@news"])
+
+        publisher.release(1)
+        publisher.release(3)
+        await settle()
+        publisher.release(2)
+        await settle()
+        # 3 went out ahead of 2, but the position stays before 2 until it is retried
+        assert await position(state_file, "news", 1) == 1
+        assert scheduler.held("news") == {3}
+
+        publisher.failing.clear()
+        scheduler.submit("news", make_post(2), ["@news"])
+        await scheduler.stop()
+        assert await asyncio.to_thread(read_position, state_file, "news") == 3
+        assert publisher.sent == [("@news", 1), ("@news", 3), ("@news", 2)]
+
+    asyncio.run(scenario())
+
+
+def test_full_slow_lane_rejects_posts_for_a_later_poll(state_file: Path) -> None:
+    async def scenario() -> None:
+        publisher = Publisher()
+        scheduler = make_scheduler(publisher)
+        await scheduler.start()
+        assert scheduler.submit("films", make_post(1, video_seconds=1800), ["@films"])
+        assert scheduler.submit("films", make_post(2, video_seconds=1800), ["@films"])
+        assert not scheduler.submit("films", make_post(3, video_seconds=1800), ["@films"])
+        assert scheduler.submit("news", make_post(4), ["@news"])
+
+        for post_id in (1, 2, 4):
+            publisher.release(post_id)
+        await scheduler.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,104 @@
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.config import BindingConfig
+from src.lease_store import LeaseStore
+from src.managers.shard_manager import owner_for
+
+TTL = 60.0
+
+
+def binding(domain: str, instance: str | None = None) -> BindingConfig:
+    return BindingConfig.model_validate(
+        {
+            "vk": {"domain": domain, "post_count": 10, "post_source": "wall"},
+            "telegram": {"channel_ids": ["@news"]},
+            "instance": instance,
+        }
+    )
+
+
+def test_lease_is_exclusive_until_it_expires(tmp_path: Path) -> None:
+    store = LeaseStore(tmp_path / "leases.db")
+    first = store.acquire("durov", "a", now=0, ttl=TTL)
+    assert first is not None
+
+    assert store.acquire("durov", "b", now=30, ttl=TTL) is None
+    assert store.acquire("durov", "a", now=30, ttl=TTL) == first
+
+    taken = store.acquire("durov", "b", now=200, ttl=TTL)
+    assert taken is not None and taken.token > first.token
+
+
+def test_stale_holder_cannot_commit_after_takeover(tmp_path: Path) -> None:
+    store = LeaseStore(tmp_path / "leases.db")
+    old = store.acquire("durov", "a", now=0, ttl=TTL)
+    assert old is not None
+    assert store.begin_post(old, "a", 5, now=1)
+    assert store.commit_post(old, "a", 5)
+
+    new = store.acquire("durov", "b", now=200, ttl=TTL)
+    assert new is not None
+
+    assert not store.begin_post(old, "a", 6, now=201)
+    assert not store.commit_post(old, "a", 6)
+    assert store.last_post_id("durov") == 5
+
+
+def test_post_in_flight_during_takeover_is_not_sent_again(tmp_path: Path) -> None:
+    store = LeaseStore(tmp_path / "leases.db")
+    store.seed_last_post_id("durov", 4)
+    old = store.acquire("durov", "a", now=0, ttl=TTL)
+    assert old is not None
+    assert store.begin_post(old, "a", 5, now=1)
+    # Instance "a" dies before it can commit post 5
+
+    new = store.acquire("durov", "b", now=200, ttl=TTL)
+
+    assert new is not None and new.skipped_post_id == 5
+    assert store.last_post_id("durov") == 5
+
+
+def test_commit_keeps_the_mark_of_a_later_post_in_flight(tmp_path: Path) -> None:
+    store = LeaseStore(tmp_path / "leases.db")
+    store.seed_last_post_id("durov", 4)
+    old = store.acquire("durov", "a", now=0, ttl=TTL)
+    assert old is not None
+    assert store.begin_post(old, "a", 5, now=1)
+    assert store.begin_post(old, "a", 6, now=2)
+    assert store.commit_post(old, "a", 5)
+    # Instance "a" dies while post 6 is being sent
+
+    new = store.acquire("durov", "b", now=200, ttl=TTL)
+
+    assert new is not None and new.skipped_post_id == 6
+    assert store.last_post_id("durov") == 6
+
+
+def test_aborted_post_is_retried_by_the_next_holder(tmp_path: Path) -> None:
+    store = LeaseStore(tmp_path / "leases.db")
+    store.seed_last_post_id("durov", 4)
+    old = store.acquire("durov", "a", now=0, ttl=TTL)
+    assert old is not None
+    assert store.begin_post(old, "a", 5, now=1)
+    store.abort_post(old, "a")
+    store.release(old, "a")
+
+    new = store.acquire("durov", "b", now=2, ttl=TTL)
+
+    assert new is not None and new.skipped_post_id is None
+    assert store.last_post_id("durov") == 4
+
+
+def test_owner_is_stable_and_moves_only_while_preferred_is_down() -> None:
+    instances = ["a", "b", "c"]
+    everyone = set(instances)
+    owners = {owner_for(binding(f"group{i}"), instances, everyone) for i in range(30)}
+    assert owners == everyone
+
+    explicit = binding("durov", instance="c")
+    assert owner_for(explicit, instances, everyone) == "c"
+    assert owner_for(explicit, instances, {"a", "b"}) in {"a", "b"}
+    assert owner_for(explicit, instances, {"a", "b", "c"}) == "c"
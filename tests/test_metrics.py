@@ -0,0 +1,80 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.metrics import MetricsRegistry, MetricsServer
+
+
+def test_counter_with_labels() -> None:
+    registry = MetricsRegistry()
+    requests = registry.counter("test_requests_total", "Requests.", ("domain",))
+    requests.labels(domain="durov").inc()
+    requests.labels(domain="durov").inc(2)
+    requests.labels(domain='we"ird').inc()
+
+    text = registry.render()
+    assert "# TYPE test_requests_total counter" in text
+    assert 'test_requests_total{domain="durov"} 3' in text
+    assert 'test_requests_total{domain="we\\"ird"} 1' in text
+
+
+def test_counter_rejects_wrong_labels_and_negative_increments() -> None:
+    registry = MetricsRegistry()
+    requests = registry.counter("test_requests_total", "Requests.", ("domain",))
+    with pytest.raises(ValueError):
+        requests.labels(channel="x")
+    with pytest.raises(ValueError):
+        requests.labels(domain="x").inc(-1)
+    with pytest.raises(ValueError):
+        registry.counter("test_requests_total", "Duplicate.")
+
+
+def test_gauge_without_labels() -> None:
+    registry = MetricsRegistry()
+    depth = registry.gauge("test_depth", "Depth.")
+    depth.set(5)
+    depth.dec()
+    depth.inc(0.5)
+    assert "test_depth 4.5" in registry.render()
+
+
+def test_histogram_buckets_are_cumulative() -> None:
+    registry = MetricsRegistry()
+    duration = registry.histogram("test_duration_seconds", "Duration.", buckets=(1, 5))
+    for value in (0.5, 1, 3, 10):
+        duration.observe(value)
+
+    text = registry.render()
+    assert 'test_duration_seconds_bucket{le="1"} 2' in text
+    assert 'test_duration_seconds_bucket{le="5"} 3' in text
+    assert 'test_duration_seconds_bucket{le="+Inf"} 4' in text
+    assert "test_duration_seconds_sum 14.5" in text
+    assert "test_duration_seconds_count 4" in text
+
+
+def test_server_serves_metrics() -> None:
+    registry = MetricsRegistry()
+    registry.counter("test_hits_total", "Hits.").inc()
+
+    async def scenario() -> tuple[bytes, bytes]:
+        server = MetricsServer("127.0.0.1", 0, registry)
+        await server.start()
+        assert server._server is not None  # type: ignore[reportPrivateUsage]
+        port = server._server.sockets[0].getsockname()[1]  # type: ignore[reportPrivateUsage]
+        responses: list[bytes] = []
+        for path in ("/metrics", "/missing"):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+            await writer.drain()
+            responses.append(await reader.read())
+            writer.close()
+        await server.stop()
+        return responses[0], responses[1]
+
+    ok, missing = asyncio.run(scenario())
+    assert ok.startswith(b"HTTP/1.1 200 OK")
+    assert b"test_hits_total 1" in ok
+    assert missing.startswith(b"HTTP/1.1 404")
@@ -0,0 +1,139 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from pyrogram.errors import FloodWait
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.config import ParallelUploadConfig, TelegramSessionConfig, settings
+from src.dto import VideoMeta
+from src.managers.fake_telegram_client import FakeTelegramClient
+from src.managers.parallel_uploader import UPLOAD_PART_SIZE, ParallelUploader
+from src.managers.telegram_client_manager import TelegramClientManager
+
+MB = 2**20
+
+
+@pytest.fixture(autouse=True)
+def peer_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings.peer_cache, "state_file", tmp_path / "peers.json")
+    monkeypatch.setattr(settings.peer_cache, "interval_seconds", 0)
+
+
+def write(path: Path, size: int) -> Path:
+    path.write_bytes(b"v" * size)
+    return path
+
+
+def make_uploader(sleep_log: list[float] | None = None) -> ParallelUploader:
+    async def sleep(seconds: float) -> None:
+        if sleep_log is not None:
+            sleep_log.append(seconds)
+
+    config = ParallelUploadConfig(min_size_mb=11, connections=3, workers=6, part_retries=2)
+    return ParallelUploader(config, sleep=sleep)
+
+
+def make_manager(client: FakeTelegramClient) -> TelegramClientManager:
+    def factory(session: TelegramSessionConfig) -> FakeTelegramClient:
+        return client
+
+    manager = TelegramClientManager(asyncio.Event(), client_factory=factory)
+    manager.uploader = make_uploader()
+    return manager
+
+
+def test_big_video_is_uploaded_over_several_connections(tmp_path: Path) -> None:
+    client = FakeTelegramClient("main")
+
+    async def scenario() -> None:
+        video = await asyncio.to_thread(write, tmp_path / "video.mp4", 12 * MB + 100)
+        manager = make_manager(client)
+        await manager.start()
+        meta = VideoMeta(path=video, width=320, height=240, duration=2)
+        await manager.send_media("@films", [video], "caption", video_meta={video: meta})
+        await manager.stop()
+
+    asyncio.run(scenario())
+    assert client.uploaded_bytes == 12 * MB + 100
+    assert [(m.chat_id, m.kind, m.caption) for m in client.sent] == [("@films", "video", "caption")]
+    assert len(client.sessions) == 3
+    assert all(s.requests and s.stopped for s in client.sessions)
+
+
+def test_small_video_keeps_pyrogram_upload(tmp_path: Path) -> None:
+    client = FakeTelegramClient("main")
+
+    async def scenario() -> None:
+        video = await asyncio.to_thread(write, tmp_path / "video.mp4", MB)
+        manager = make_manager(client)
+        await manager.start()
+        meta = VideoMeta(path=video, width=320, height=240, duration=2)
+        await manager.send_media("@films", [video], "caption", video_meta={video: meta})
+        await manager.stop()
+
+    asyncio.run(scenario())
+    assert not client.sessions
+    assert [(m.chat_id, m.kind) for m in client.sent] == [("@films", "video")]
+
+
+def test_big_album_video_is_saved_without_a_favorites_message(tmp_path: Path) -> None:
+    client = FakeTelegramClient("main")
+
+    async def scenario() -> None:
+        photo = await asyncio.to_thread(write, tmp_path / "a.jpg", 1000)
+        video = await asyncio.to_thread(write, tmp_path / "b.mp4", 12 * MB)
+        manager = make_manager(client)
+        await manager.start()
+        meta = VideoMeta(path=video, width=320, height=240, duration=2)
+        await manager.send_media("@films", [photo, video], "caption", video_meta={video: meta})
+        await manager.stop()
+
+    asyncio.run(scenario())
+    assert [(m.chat_id, m.kind) for m in client.sent] == [("me", "photo"), ("@films", "album"), ("@films", "album")]
+    assert client.deleted == [client.sent[0].id]
+
+
+def test_failed_part_is_retried_after_its_flood_wait(tmp_path: Path) -> None:
+    client = FakeTelegramClient("main", flood_waits=[7])
+    delays: list[float] = []
+
+    async def scenario() -> None:
+        video = await asyncio.to_thread(write, tmp_path / "video.mp4", 4 * UPLOAD_PART_SIZE)
+        uploaded = await make_uploader(delays).upload(client, video, lambda current, total: None)
+        assert uploaded.parts == 4
+
+    asyncio.run(scenario())
+    assert delays == [7.0]
+    assert client.uploaded_bytes == 4 * UPLOAD_PART_SIZE
+
+
+def test_part_out_of_retries_fails_the_upload_and_closes_the_connections(tmp_path: Path) -> None:
+    client = FakeTelegramClient("main", flood_waits=[1, 1, 1])
+
+    async def scenario() -> None:
+        video = await asyncio.to_thread(write, tmp_path / "video.mp4", UPLOAD_PART_SIZE)
+        with pytest.raises(FloodWait):
+            await make_uploader().upload(client, video, lambda current, total: None)
+
+    asyncio.run(scenario())
+    assert client.sessions and all(s.stopped for s in client.sessions)
+
+
+def test_flood_wait_of_a_part_ends_on_shutdown(tmp_path: Path) -> None:
+    client = FakeTelegramClient("main", flood_waits=[600])
+
+    async def scenario() -> None:
+        video = await asyncio.to_thread(write, tmp_path / "video.mp4", UPLOAD_PART_SIZE)
+        shutdown_event = asyncio.Event()
+        manager = TelegramClientManager(shutdown_event, client_factory=lambda session: client)
+        upload = asyncio.create_task(manager.uploader.upload(client, video, lambda current, total: None))
+        await asyncio.sleep(0.05)
+        shutdown_event.set()
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(upload, timeout=5)
+
+    asyncio.run(scenario())
+    assert all(s.stopped for s in client.sessions)
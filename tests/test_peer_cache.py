@@ -0,0 +1,100 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+from pyrogram.errors import FloodWait
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.config import PeerCacheConfig
+from src.managers.fake_telegram_client import FakeTelegramClient
+from src.managers.peer_cache import CHANNEL_ID_OFFSET, PeerCache
+from src.managers.telegram_pool import PooledClient
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def make_cache(tmp_path: Path, clock: Clock) -> PeerCache:
+    config = PeerCacheConfig(state_file=tmp_path / "peers.json", concurrency=4, interval_seconds=2)
+    return PeerCache(config, sleep=clock.sleep, clock=clock)
+
+
+def test_channels_are_resolved_once_and_reused_after_a_restart(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        main = PooledClient("main", FakeTelegramClient("main"))
+        news = PooledClient("news", FakeTelegramClient("news"), frozenset({"@news"}))
+        channels = ["@news", "@films", "-1001234"]
+
+        await make_cache(tmp_path, Clock()).start([main, news], channels)
+        assert main.client.resolves == 2
+        assert news.client.resolves == 1
+
+        # A restart with new clients: the cache file is loaded into their storage and nothing is resolved
+        main = PooledClient("main", FakeTelegramClient("main"))
+        cache = make_cache(tmp_path, Clock())
+        await cache.start([main], channels)
+        assert main.client.resolves == 0
+        films = await cache.chat_id(main, "@films")
+        assert isinstance(films, int) and films in main.client.storage.peers
+        assert await cache.chat_id(main, "-1001234") == "-1001234"
+        assert main.client.resolves == 0
+
+    asyncio.run(scenario())
+
+
+def test_rejected_peer_is_resolved_again(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        main = PooledClient("main", FakeTelegramClient("main"))
+        cache = make_cache(tmp_path, Clock())
+        await cache.start([main], ["@films"])
+
+        assert await cache.chat_id(main, "@films") == CHANNEL_ID_OFFSET - 1
+        await cache.invalidate(main, "@films")
+        assert await cache.chat_id(main, "@films") == CHANNEL_ID_OFFSET - 1
+        assert main.client.resolves == 2
+
+    asyncio.run(scenario())
+
+
+def test_resolutions_of_a_session_are_spaced_out(tmp_path: Path) -> None:
+    async def scenario() -> Clock:
+        clock = Clock()
+        main = PooledClient("main", FakeTelegramClient("main"))
+        news = PooledClient("news", FakeTelegramClient("news"))
+        await make_cache(tmp_path, clock).start([main, news], ["@a", "@b", "@c"])
+        return clock
+
+    clock = asyncio.run(scenario())
+    # Six lookups, three per session two seconds apart; the sessions do not wait for each other
+    assert clock.sleeps == [2.0, 2.0, 2.0, 2.0]
+
+
+def test_floodwait_leaves_the_rest_for_the_first_send(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        client = FakeTelegramClient("main")
+        main = PooledClient("main", client)
+
+        async def flooded(peer_id: int | str) -> object:
+            raise FloodWait(value=300)
+
+        original = client.resolve_peer
+        client.resolve_peer = flooded
+        cache = make_cache(tmp_path, Clock())
+        await cache.start([main], ["@a", "@b"])
+
+        client.resolve_peer = original
+        assert await cache.chat_id(main, "@b") == CHANNEL_ID_OFFSET - 1
+        assert client.resolves == 1
+
+    asyncio.run(scenario())
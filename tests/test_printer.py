@@ -0,0 +1,67 @@
+import io
+import json
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.printer import log, log_context, setup_logging, stop_logging
+
+
+def capture(level: str, fmt: str, emit: "list[tuple[str, dict[str, object]]]") -> str:
+    stream = io.StringIO()
+    setup_logging(level, "json" if fmt == "json" else "human", stream=stream)
+    try:
+        for message, kwargs in emit:
+            log(message, **kwargs)  # type: ignore[arg-type]
+    finally:
+        stop_logging()
+    return stream.getvalue()
+
+
+def test_human_format_keeps_indent_and_padding() -> None:
+    output = capture("INFO", "human", [("🚀 start", {}), ("📄 post", {"indent": 2, "padding_top": 1})])
+    assert output == "🚀 start\n\n    📄 post\n"
+
+
+def test_level_is_honoured() -> None:
+    output = capture(
+        "WARNING",
+        "human",
+        [
+            ("debug chatter", {"level": logging.DEBUG}),
+            ("info", {}),
+            ("⚠️ warning", {"level": logging.WARNING}),
+        ],
+    )
+    assert output == "⚠️ warning\n"
+
+
+def test_json_format_carries_context_fields() -> None:
+    stream = io.StringIO()
+    setup_logging("DEBUG", "json", stream=stream)
+    try:
+        with log_context(binding="durov"), log_context(post=42):
+            log("✅ sent", indent=4, channel="@news")
+        log("outside")
+    finally:
+        stop_logging()
+
+    first, second = (json.loads(line) for line in stream.getvalue().splitlines())
+    assert first["message"] == "✅ sent"
+    assert first["level"] == "INFO"
+    assert (first["binding"], first["post"], first["channel"]) == ("durov", 42, "@news")
+    assert "binding" not in second
+
+
+def test_third_party_info_is_not_logged_at_the_default_level() -> None:
+    stream = io.StringIO()
+    setup_logging(stream=stream)
+    try:
+        logging.getLogger("httpx").info("HTTP Request: GET https://api.vk.com/method/wall.get?access_token=secret")
+        logging.getLogger("pyrogram").info("connected")
+        logging.getLogger("httpx").warning("⚠️ retrying")
+        log("🚀 start")
+    finally:
+        stop_logging()
+    assert stream.getvalue() == "⚠️ retrying\n🚀 start\n"
@@ -0,0 +1,42 @@
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.cleaner import normalize_links
+from src.profiler import Profiler
+
+TEXT = "[club1|Наш клуб] и [https://example.com/page|ссылка] https://vk.com/wall-1_1 👍🏻\n" * 50
+
+
+def test_cycle_report_attributes_samples_to_stages(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        profiler = Profiler(tmp_path, sample_interval=0.001, slow_callback_seconds=0.05)
+        profiler.enable()
+        assert asyncio.get_running_loop().get_debug()
+
+        profiler.cycle_started()
+        # Debug mode times the loop's steps from the next one on
+        await asyncio.sleep(0)
+        deadline = time.monotonic() + 0.3
+        while time.monotonic() < deadline:
+            normalize_links(TEXT)
+        await asyncio.sleep(0)
+        await profiler.cycle_finished()
+
+        await profiler.disable()
+        assert not profiler.enabled
+        assert not asyncio.get_running_loop().get_debug()
+
+    asyncio.run(scenario())
+
+    report = (tmp_path / "cycle-0001.txt").read_text(encoding="utf-8")
+    assert "[cleaner]" in report
+    assert "normalize_links" in report
+    assert "blocked the loop" in report and "Executing" in report
+    assert "Top allocators:" in report
+    assert (tmp_path / "cycle-0001.prof").exists()
+    # disable() reports what was collected after the last cycle
+    assert (tmp_path / "cycle-0002.txt").exists()
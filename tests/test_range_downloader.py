@@ -0,0 +1,144 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.config import RangeDownloadConfig
+from src.managers.range_downloader import DirectSource, RangeDownloader
+from src.managers.ytdlp_worker import is_direct
+from src.transfer_watchdog import Transfer
+
+MB = 2**20
+CONTENT = bytes(range(256)) * (10 * MB // 256 + 7)
+URL = "https://vkvd.example/video.mp4"
+
+
+class Server:
+    """Serves CONTENT, honouring Range headers unless `ranges` is off; `truncate` cuts chosen responses short."""
+
+    def __init__(self, ranges: bool = True) -> None:
+        self.ranges = ranges
+        self.requests: list[str] = []
+        # Range header -> bytes to send before the connection drops
+        self.truncate: dict[str, int] = {}
+        self.forbidden: set[str] = set()
+        self.unavailable: set[str] = set()
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        header = request.headers.get("Range", "")
+        self.requests.append(header)
+        assert request.headers["Cookie"] == "remixsid=1"
+        if header in self.forbidden:
+            return httpx.Response(403)
+        if header in self.unavailable:
+            return httpx.Response(503)
+        if not self.ranges or not header:
+            return httpx.Response(200, content=CONTENT)
+        start, end = (int(n) for n in header.removeprefix("bytes=").split("-"))
+        body = CONTENT[start : end + 1][: self.truncate.pop(header, None)]
+        content_range = f"bytes {start}-{end}/{len(CONTENT)}"
+        return httpx.Response(206, content=body, headers={"Content-Range": content_range})
+
+
+def make_source(tmp_path: Path) -> DirectSource:
+    return DirectSource(URL, {"Cookie": "remixsid=1"}, tmp_path / "video.mp4", len(CONTENT))
+
+
+async def fetch(
+    server: Server, source: DirectSource, connections: int = 3, shutdown_event: asyncio.Event | None = None
+) -> Transfer:
+    config = RangeDownloadConfig(segment_size_mb=2, segment_retries=2)
+    downloader = RangeDownloader(shutdown_event or asyncio.Event(), config, transport=httpx.MockTransport(server))
+    await downloader.start()
+    transfer = Transfer("download", URL)
+    try:
+        await downloader.download(source, connections, transfer)
+    finally:
+        await downloader.stop()
+    return transfer
+
+
+def read(path: Path) -> bytes:
+    return path.read_bytes()
+
+
+def test_file_is_fetched_in_parallel_segments(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        server = Server()
+        source = make_source(tmp_path)
+        transfer = await fetch(server, source)
+
+        assert await asyncio.to_thread(read, source.path) == CONTENT
+        assert not source.partial.exists() and not source.progress_file.exists()
+        assert transfer.current == len(CONTENT)
+        # The probe and six segments of 2 MB, the last one short
+        assert server.requests[0] == "bytes=0-0"
+        assert sorted(server.requests[1:]) == sorted(
+            f"bytes={i * 2 * MB}-{min((i + 1) * 2 * MB, len(CONTENT)) - 1}" for i in range(6)
+        )
+
+    asyncio.run(scenario())
+
+
+def test_dropped_segment_resumes_where_it_stopped(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        server = Server()
+        server.truncate[f"bytes={2 * MB}-{4 * MB - 1}"] = 1000
+        source = make_source(tmp_path)
+        await fetch(server, source)
+
+        assert await asyncio.to_thread(read, source.path) == CONTENT
+        assert f"bytes={2 * MB + 1000}-{4 * MB - 1}" in server.requests
+
+    asyncio.run(scenario())
+
+
+def test_next_attempt_fetches_only_the_missing_segments(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        source = make_source(tmp_path)
+        failing = Server()
+        failing.forbidden.add(f"bytes={8 * MB}-{10 * MB - 1}")
+        with pytest.raises(httpx.HTTPStatusError):
+            await fetch(failing, source, connections=1)
+        assert source.partial.exists() and source.progress_file.exists()
+
+        server = Server()
+        await fetch(server, source)
+        assert await asyncio.to_thread(read, source.path) == CONTENT
+        assert server.requests[1:] == [f"bytes={8 * MB}-{10 * MB - 1}", f"bytes={10 * MB}-{len(CONTENT) - 1}"]
+
+    asyncio.run(scenario())
+
+
+def test_segment_backoff_ends_on_shutdown(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        server = Server()
+        server.unavailable.add(f"bytes={2 * MB}-{4 * MB - 1}")
+        shutdown_event = asyncio.Event()
+        asyncio.get_running_loop().call_later(0.1, shutdown_event.set)
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(fetch(server, make_source(tmp_path), shutdown_event=shutdown_event), timeout=1)
+
+    asyncio.run(scenario())
+
+
+def test_server_without_ranges_gets_a_single_request(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        server = Server(ranges=False)
+        source = make_source(tmp_path)
+        await fetch(server, source)
+
+        assert await asyncio.to_thread(read, source.path) == CONTENT
+        assert server.requests == ["bytes=0-0", ""]
+
+    asyncio.run(scenario())
+
+
+def test_only_single_progressive_files_are_direct() -> None:
+    assert is_direct({"url": URL, "protocol": "https", "ext": "mp4"})
+    assert not is_direct({"url": "https://vkvd.example/video.m3u8", "protocol": "m3u8_native"})
+    assert not is_direct({"protocol": "https", "requested_formats": [{"url": URL}, {"url": URL}]})
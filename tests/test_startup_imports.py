@@ -0,0 +1,24 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.startup import STARTUP_MODULES, parse_importtime, run_probe
+
+
+def test_startup_does_not_import_heavy_dependencies() -> None:
+    report, _ = run_probe(STARTUP_MODULES)
+    assert report["heavy"] == []
+
+
+def test_startup_modules_follow_main() -> None:
+    assert STARTUP_MODULES[0] == "main"
+    assert {"src.app", "src.cancellation", "src.managers.binding_manager", "src.profiler"} <= set(STARTUP_MODULES)
+    # Only imported with --record/--replay
+    assert "src.traffic_archive" not in STARTUP_MODULES
+
+
+def test_ytdlp_worker_module_imports_no_project_code() -> None:
+    report, stderr = run_probe(("src.managers.ytdlp_worker",), importtime=True)
+    project = {name for name, _, _ in parse_importtime(stderr) if name.split(".")[0] == "src"}
+    assert project == {"src", "src.managers", "src.managers.ytdlp_worker"}
+    assert report["heavy"] == []
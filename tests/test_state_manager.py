@@ -0,0 +1,24 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.config import settings
+from src.state_manager import get_last_post_id, set_last_post_id
+
+
+def test_concurrent_saves_and_reads_never_lose_a_position(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings.app, "state_file", str(tmp_path / "state.yaml"))
+
+    async def scenario() -> list[int]:
+        await set_last_post_id("news", 1)
+        writes = [set_last_post_id(f"domain{i}", i) for i in range(20)]
+        reads = [get_last_post_id("news") for _ in range(100)]
+        results = await asyncio.gather(*writes, *reads)
+        assert [await get_last_post_id(f"domain{i}") for i in range(20)] == list(range(20))
+        return [r for r in results if r is not None]
+
+    assert set(asyncio.run(scenario())) == {1}
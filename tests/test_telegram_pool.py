@@ -0,0 +1,91 @@
+import asyncio
+import os
+import sys
+
+import pytest
+from pyrogram.errors import FloodWait
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.managers.fake_telegram_client import FakeTelegramClient
+from src.managers.telegram_pool import ClientPool, NoEligibleClientError, PooledClient
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def make_pool(clock: FakeClock) -> ClientPool:
+    return ClientPool(
+        [
+            PooledClient("main", FakeTelegramClient("main")),
+            PooledClient("news", FakeTelegramClient("news"), frozenset({"@news"})),
+        ],
+        sleep=clock.sleep,
+        clock=clock,
+    )
+
+
+def test_routes_to_least_loaded_eligible_client() -> None:
+    clock = FakeClock()
+    pool = make_pool(clock)
+
+    async def scenario() -> list[str]:
+        first = await pool.acquire("@news")
+        second = await pool.acquire("@news")
+        third = await pool.acquire("@other")
+        pool.release(first)
+        fourth = await pool.acquire("@news")
+        return [first.name, second.name, third.name, fourth.name]
+
+    assert asyncio.run(scenario()) == ["main", "news", "main", "news"]
+
+
+def test_flooded_client_fails_over_then_waits() -> None:
+    clock = FakeClock()
+    pool = make_pool(clock)
+    main, news = pool.clients
+
+    async def scenario() -> list[str]:
+        pool.mark_flood(main, 30)
+        assert pool.has_alternative("@news", main)
+        assert not pool.has_alternative("@other", main)
+        async with pool.lease("@news") as pc:
+            failover = pc.name
+        pool.mark_flood(news, 10)
+        async with pool.lease("@news") as pc:
+            after_wait = pc.name
+        return [failover, after_wait]
+
+    assert asyncio.run(scenario()) == ["news", "news"]
+    assert clock.sleeps == [10]
+    assert main.active == news.active == 0
+
+
+def test_no_eligible_client() -> None:
+    pool = ClientPool([PooledClient("news", FakeTelegramClient("news"), frozenset({"@news"}))], sleep=FakeClock().sleep)
+    with pytest.raises(NoEligibleClientError):
+        asyncio.run(pool.acquire("@other"))
+
+
+def test_fake_client_records_sends_and_raises_floodwait() -> None:
+    client = FakeTelegramClient("main", flood_waits=[5])
+
+    async def scenario() -> None:
+        with pytest.raises(FloodWait):
+            await client.send_photo(chat_id="@news", photo="missing.jpg")
+        message = await client.send_video(chat_id="@news", video="missing.mp4", caption="hi")
+        assert message.video is not None
+        await client.delete_messages(chat_id="me", message_ids=[message.id])
+
+    asyncio.run(scenario())
+    assert [(m.chat_id, m.kind, m.caption) for m in client.sent] == [("@news", "video", "hi")]
+    assert client.deleted == [1]
@@ -0,0 +1,128 @@
+import asyncio
+import json
+import os
+import sys
+import time
+from multiprocessing import Pipe
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.binding_store import BindingStore
+from src.traffic_archive import RecordingTransport, ReplayTransport, TrafficArchive, replay_video
+
+WALL_URL = "https://api.vk.com/method/wall.get"
+PHOTO_URL = "https://sun9-1.userapi.com/durov/1.jpg"
+
+
+def capture(archive: TrafficArchive, walls: list[dict[str, object]]) -> None:
+    responses = iter(walls)
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith(".jpg"):
+            return httpx.Response(200, content=b"\xff" * 1000, headers={"Content-Type": "image/jpeg"})
+        return httpx.Response(200, json=next(responses))
+
+    async def scenario() -> None:
+        transport = RecordingTransport(archive, inner=httpx.MockTransport(handle))
+        async with httpx.AsyncClient(transport=transport) as client:
+            for _ in walls:
+                params = {"domain": "durov", "count": 10, "access_token": "secret"}
+                (await client.get(WALL_URL, params=params)).raise_for_status()
+            (await client.get(PHOTO_URL)).raise_for_status()
+
+    asyncio.run(scenario())
+
+
+def test_replay_serves_captured_responses_without_secrets(tmp_path: Path) -> None:
+    archive = TrafficArchive(tmp_path, max_body_bytes=100)
+    capture(archive, [{"response": {"items": [{"id": 1}]}}])
+
+    assert "secret" not in (tmp_path / "index.jsonl").read_text(encoding="utf-8")
+
+    async def scenario() -> None:
+        async with httpx.AsyncClient(transport=ReplayTransport(archive, speed=0)) as client:
+            # Parameter order and the token do not matter
+            wall = await client.get(WALL_URL, params={"access_token": "other", "count": 10, "domain": "durov"})
+            assert wall.json() == {"response": {"items": [{"id": 1}]}}
+
+            photo = await client.get(PHOTO_URL)
+            assert photo.headers["content-type"] == "image/jpeg"
+            assert photo.content == b"\xff" * 100 + b"\0" * 900
+
+            assert (await client.get("https://sun9-1.userapi.com/missing.jpg")).status_code == 404
+
+    asyncio.run(scenario())
+
+
+def test_replay_without_delays_walks_through_recorded_responses(tmp_path: Path) -> None:
+    archive = TrafficArchive(tmp_path)
+    capture(archive, [{"response": {"items": []}}, {"response": {"items": [{"id": 2}]}}])
+
+    async def scenario() -> None:
+        async with httpx.AsyncClient(transport=ReplayTransport(archive, speed=0)) as client:
+            params = {"domain": "durov", "count": 10}
+            seen = [(await client.get(WALL_URL, params=params)).json()["response"]["items"] for _ in range(3)]
+        assert seen == [[], [{"id": 2}], [{"id": 2}]]
+
+    asyncio.run(scenario())
+
+
+def test_replay_follows_the_recorded_timeline(tmp_path: Path) -> None:
+    archive = TrafficArchive(tmp_path)
+    for at, items in ((1000.0, []), (1600.0, [1])):
+        body = json.dumps({"items": items}).encode()
+        archive.record("http", "GET key", at, 0.0, 200, {"content-type": "application/json"}, body)
+
+    fast = ReplayTransport(archive, speed=1.0)
+    assert fast.pick("GET key") == archive.load()[0]
+
+    # Ten minutes of the capture pass in a moment
+    faster = ReplayTransport(archive, speed=1e6)
+    faster.pick("GET key")
+    time.sleep(0.01)
+    assert faster.pick("GET key") == archive.load()[1]
+
+
+def test_replay_video_recreates_the_captured_file(tmp_path: Path) -> None:
+    video = tmp_path / "downloaded" / "456.mp4"
+    video.parent.mkdir()
+    video.write_bytes(b"v" * 5000)
+    archive = TrafficArchive(tmp_path / "archive", max_body_bytes=1000)
+    archive.record_video("https://vk.com/video-1_456", video, 2.0)
+
+    receiver, sender = Pipe(duplex=False)
+    out_dir = tmp_path / "videos"
+    out_dir.mkdir()
+    opts = {"outtmpl": str(out_dir / "%(id)s.%(ext)s")}
+    replay_video(str(tmp_path / "archive"), 0, "https://vk.com/video-1_456", opts, sender)
+
+    kind, sent = receiver.recv()
+    path = Path(sent)
+    assert kind == "done"
+    assert path == out_dir / "456.mp4"
+    assert path.read_bytes() == b"v" * 1000 + b"\0" * 4000
+
+
+def test_replay_gets_its_own_copy_of_the_binding_store(tmp_path: Path) -> None:
+    real = BindingStore(tmp_path / "bindings.db")
+    real.put("durov", '{"vk": {"domain": "durov"}}', ["@news"], now=0)
+    real.set_last_post_id("durov", 5)
+    archive = TrafficArchive(tmp_path / "archive")
+    archive.save_binding_store(real.path)
+    real.set_last_post_id("durov", 9)
+
+    replay_path = tmp_path / "archive" / "replay-bindings.db"
+    archive.restore_binding_store(replay_path)
+    replay = BindingStore(replay_path)
+    replay.set_last_post_id("durov", 7)
+    replay.close()
+    # A second replay starts from the captured position again
+    archive.restore_binding_store(replay_path)
+    replay = BindingStore(replay_path)
+
+    assert replay.get("durov") is not None and replay.last_post_id("durov") == 5
+    assert real.last_post_id("durov") == 9
+    replay.close()
+    real.close()
@@ -0,0 +1,56 @@
+import asyncio
+import os
+import sys
+from multiprocessing import Pipe
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.managers.ytdlp_manager import _receive  # pyright: ignore[reportPrivateUsage]
+from src.transfer_watchdog import Transfer, TransferStalledError, TransferWatchdog
+
+
+def test_stalled_transfer_is_aborted() -> None:
+    async def scenario() -> None:
+        cancelled = asyncio.Event()
+
+        async def hang(transfer: Transfer) -> None:
+            transfer.progress(100, 1000)
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        with pytest.raises(TransferStalledError):
+            await asyncio.wait_for(TransferWatchdog(0.05).watch("upload", "a.mp4", hang), timeout=5)
+        assert cancelled.is_set()
+
+    asyncio.run(scenario())
+
+
+def test_slow_transfer_that_keeps_moving_completes() -> None:
+    async def scenario() -> None:
+        async def trickle(transfer: Transfer) -> str:
+            for done in range(1, 11):
+                await asyncio.sleep(0.02)
+                transfer.progress(done, 10)
+            return "sent"
+
+        # 0.2 s in total, well past the window, but never 0.05 s without progress
+        assert await TransferWatchdog(0.05).watch("upload", "a.mp4", trickle) == "sent"
+
+    asyncio.run(scenario())
+
+
+def test_ytdlp_messages_report_progress_then_the_file() -> None:
+    receiver, sender = Pipe(duplex=False)
+    transfer = Transfer("download", "video")
+    sender.send(("progress", 10, 100))
+    sender.send(("progress", 60, 100))
+    sender.send(("done", "videos/1.mp4"))
+    assert _receive(receiver, transfer.progress) == "videos/1.mp4"
+    assert (transfer.current, transfer.total) == (60, 100)
+
+    sender.close()
+    assert _receive(receiver, transfer.progress) is None
@@ -0,0 +1,69 @@
+import asyncio
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.growing_file import GrowingFile
+from src.managers.video_processor import (
+    _process_video,  # pyright: ignore[reportPrivateUsage]
+    _run_ffmpeg,  # pyright: ignore[reportPrivateUsage]
+    is_faststart_growing,
+    is_faststart_mp4,
+)
+
+
+def make_video(path: Path, *args: str) -> Path:
+    try:
+        _run_ffmpeg("-f", "lavfi", "-i", "testsrc=duration=2:size=320x240:rate=10", *args, str(path))
+    except (subprocess.SubprocessError, OSError) as e:
+        pytest.skip(f"ffmpeg is not available: {e}")
+    return path
+
+
+def test_faststart_detection(tmp_path: Path) -> None:
+    plain = make_video(tmp_path / "plain.mp4", "-c:v", "libx264")
+    faststart = make_video(tmp_path / "fast.mp4", "-c:v", "libx264", "-movflags", "+faststart")
+    assert not is_faststart_mp4(plain)
+    assert is_faststart_mp4(faststart)
+
+
+def test_faststart_detection_of_a_downloading_file(tmp_path: Path) -> None:
+    plain = make_video(tmp_path / "plain.mp4", "-c:v", "libx264")
+    faststart = make_video(tmp_path / "fast.mp4", "-c:v", "libx264", "-movflags", "+faststart")
+
+    async def check(path: Path, size: int) -> bool:
+        growing = GrowingFile(path, size, asyncio.get_running_loop())
+        growing.advance(size)
+        return await is_faststart_growing(growing)
+
+    assert not asyncio.run(check(plain, plain.stat().st_size))
+    assert asyncio.run(check(faststart, faststart.stat().st_size))
+
+
+def test_compliant_file_is_not_remuxed(tmp_path: Path) -> None:
+    source = make_video(tmp_path / "fast.mp4", "-c:v", "libx264", "-movflags", "+faststart")
+    mtime = source.stat().st_mtime_ns
+
+    result = _process_video(str(source), 160)
+
+    assert result["remuxed"] is False
+    assert result["path"] == str(source)
+    assert source.stat().st_mtime_ns == mtime
+    assert (result["width"], result["height"], result["duration"]) == (320, 240, 2)
+    assert result["thumb"] and Path(result["thumb"]).exists()
+
+
+def test_webm_is_remuxed_to_faststart_mp4(tmp_path: Path) -> None:
+    source = make_video(tmp_path / "clip.webm", "-c:v", "libvpx-vp9")
+
+    result = _process_video(str(source), 320)
+
+    remuxed = Path(result["path"])
+    assert result["remuxed"] is True
+    assert remuxed == tmp_path / "clip.mp4"
+    assert is_faststart_mp4(remuxed)
+    assert not source.exists()